@@ -1,5 +1,7 @@
 import os
 import time
+import logging
+import dataclasses
 import mistune  # Markdown to HTML conversion
 import sys
 from dotenv import load_dotenv
@@ -8,7 +10,9 @@ from langchain.schema.output_parser import StrOutputParser
 from langchain_google_genai import ChatGoogleGenerativeAI
 from dataclasses import dataclass, field
 from typing import List, Dict, Tuple, Optional
+from context_packing import ContextItem, count_tokens, count_prompt_tokens, get_context_packer
 
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 # Initialize AI Tutor Models
@@ -78,8 +82,8 @@ class ChatSessionManager:
         return False
 
 # Prompt templates with updated system messages and chat history context
-def create_shunya_prompt_with_history(session: ChatSession):
-    """Create a prompt template that includes chat history."""
+def create_shunya_prompt_with_history(session: ChatSession, history: Optional[List[Tuple[str, str]]] = None):
+    """Create a prompt template that includes chat history (or the packed subset given as history)."""
     return ChatPromptTemplate.from_messages([
         ("system", "You are an experienced AI Tutor named Mentorae."
                    "Your name is Mentorae."
@@ -92,14 +96,14 @@ def create_shunya_prompt_with_history(session: ChatSession):
                    "compassionately and encourage critical thinking. Adjust your teaching style based on "
                    "the student's responses and questions."
                    "Incorporate relevant web information when available to provide up-to-date and accurate information."),
-        *session.get_langchain_messages(),
+        *(session.get_langchain_messages() if history is None else history),
         ("human",  "User Query: {query}\n\n"
                   "Web Scraped Content: {scraped_content}\n\n"
                   "Please provide a helpful, educational response.")
     ])
 
         
-def create_pratham_prompt_with_history(session: ChatSession):
+def create_pratham_prompt_with_history(session: ChatSession, history: Optional[List[Tuple[str, str]]] = None):
     """Create a pratham prompt template with chat history for retrieval-based responses."""
     return ChatPromptTemplate.from_messages([
         ("system", "You are an AI Assistant that generates educational content based on retrieved information. "
@@ -110,14 +114,14 @@ def create_pratham_prompt_with_history(session: ChatSession):
                   "Identify key concepts, create logical connections between ideas, and ensure "
                   "the information is factually accurate based on the retrieved data."
                   "When using web-scraped information, prioritize recent and authoritative content."),
-        *session.get_langchain_messages(),
+        *(session.get_langchain_messages() if history is None else history),
         ("human", "User Query: {query}\n\n"
                   "Vector Database Retrieval Response: {retrieved}\n\n"
                   "Your Task: Generate a comprehensive topic explanation based on the retrieved information "
                   "while considering the conversation history and addressing the specific query.")
     ])
 
-def create_dviteey_prompt_with_history(session: ChatSession):
+def create_dviteey_prompt_with_history(session: ChatSession, history: Optional[List[Tuple[str, str]]] = None):
     """Create a dviteey prompt template with chat history for response verification."""
     return ChatPromptTemplate.from_messages([
         ("system", "You are an expert AI Tutor named Mentorae."
@@ -139,7 +143,7 @@ def create_dviteey_prompt_with_history(session: ChatSession):
                    "Your final output should appear as a direct response to the user with no indication "
                    "that any verification or refinement process occurred. The user should perceive your "
                    "response as coming directly from their tutor, not as a refined version of another system's output."),
-        *session.get_langchain_messages(),
+        *(session.get_langchain_messages() if history is None else history),
         ("human", "User Query: {query}\n\n"
                   "Draft Educational Content: {response}\n\n"
                   "Retrieved Reference Information: {retrieved}\n\n"
@@ -155,6 +159,27 @@ def format_response(response):
         return "No response from AI Tutor."
     return mistune.markdown(response)
 
+def _retrieval_items(retrieved_data) -> List[ContextItem]:
+    """Context items for retrieved text or a RetrievalResult, most relevant first."""
+    if isinstance(retrieved_data, str):
+        return [ContextItem(retrieved_data, "retrieved")]
+    return [
+        ContextItem(chunk.text, "retrieved", count_tokens(dataclasses.replace(chunk, text="").format(i)), chunk)
+        for i, chunk in enumerate(retrieved_data, 1)
+    ]
+
+def _format_retrieval_items(items: List[Tuple[ContextItem, str]]) -> str:
+    """Prompt text for packed retrieval items, renumbered after packing."""
+    if len(items) == 1 and items[0][0].payload is None:
+        return items[0][1]
+    return "\n".join(dataclasses.replace(item.payload, text=text).format(i)
+                     for i, (item, text) in enumerate(items, 1))
+
+def _record_token_usage(session: ChatSession, context_tokens: Dict[str, int], calls: Dict[str, int]) -> None:
+    """Keep the latest per-call input token counts on the session and log them."""
+    session.metadata["token_usage"] = {"context": context_tokens, "calls": calls}
+    logger.info(f"Input tokens per call: {calls}")
+
 # Function for standard response (without retrieval)
 def generate_response_without_retrieval(session_id: str, prompt: str,scraped_content: str, session_manager: ChatSessionManager):
     """Generates AI response using a single LLM (no retrieval) with chat history."""
@@ -165,12 +190,20 @@ def generate_response_without_retrieval(session_id: str, prompt: str,scraped_con
         # Add user message to history
         session.add_message("human", prompt)
         
-        # Create prompt with history and generate response
-        prompt_template = create_shunya_prompt_with_history(session)
-        shunya_response = (prompt_template | llm_naveen | StrOutputParser()).invoke({
+        # Fit history and web content into the token budget
+        packed = get_context_packer().pack(prompt, session.get_langchain_messages(),
+                                           [ContextItem(scraped_content, "web")])
+        variables = {
             "query": prompt,
-            "scraped_content": scraped_content,
-            })
+            "scraped_content": packed.items[0][1] if packed.items else "",
+        }
+        
+        # Create prompt with history and generate response
+        prompt_template = create_shunya_prompt_with_history(session, packed.history)
+        _record_token_usage(session, packed.tokens, {
+            "shunya": count_prompt_tokens(prompt_template.format_messages(**variables), llm_naveen),
+        })
+        shunya_response = (prompt_template | llm_naveen | StrOutputParser()).invoke(variables)
         
         # Add assistant response to history
         session.add_message("assistant", shunya_response)
@@ -180,8 +213,12 @@ def generate_response_without_retrieval(session_id: str, prompt: str,scraped_con
         return f"Error: {str(e)}"
 
 # Function for retrieval-based response (with verification)
-def generate_response_with_retrieval(session_id: str, prompt: str, retrieved_data: str, session_manager: ChatSessionManager):
-    """Generates AI response using two LLMs (retrieval-based verification) with chat history."""
+def generate_response_with_retrieval(session_id: str, prompt: str, retrieved_data, session_manager: ChatSessionManager):
+    """
+    Generates AI response using two LLMs (retrieval-based verification) with chat history.
+    retrieved_data is either context text or a RetrievalResult; it is packed into the
+    token budget together with the history before formatting.
+    """
     try:
         # Get or create session
         session = session_manager.get_or_create_session(session_id)
@@ -189,20 +226,31 @@ def generate_response_with_retrieval(session_id: str, prompt: str, retrieved_dat
         # Add user message to history
         session.add_message("human", prompt)
 
+        # Fit history and retrieved chunks into the token budget; both LLM calls share the result
+        packed = get_context_packer().pack(prompt, session.get_langchain_messages(),
+                                           _retrieval_items(retrieved_data))
+        retrieved_text = _format_retrieval_items(packed.items)
+        calls = {}
+
         # Step 1: Generate initial response with history
-        pratham_prompt = create_pratham_prompt_with_history(session)
-        pratham_response = (pratham_prompt | llm_dheeraj | StrOutputParser()).invoke({
+        pratham_prompt = create_pratham_prompt_with_history(session, packed.history)
+        pratham_variables = {
             "query": prompt,
-            "retrieved": retrieved_data,
-        })
+            "retrieved": retrieved_text,
+        }
+        calls["pratham"] = count_prompt_tokens(pratham_prompt.format_messages(**pratham_variables), llm_dheeraj)
+        pratham_response = (pratham_prompt | llm_dheeraj | StrOutputParser()).invoke(pratham_variables)
 
         # Step 2: Verify & refine response using retrieval data and history
-        dviteey_prompt = create_dviteey_prompt_with_history(session)
-        dviteey_response = (dviteey_prompt | llm_kishan | StrOutputParser()).invoke({
+        dviteey_prompt = create_dviteey_prompt_with_history(session, packed.history)
+        dviteey_variables = {
             "query": prompt,
-            "retrieved": retrieved_data,
+            "retrieved": retrieved_text,
             "response": pratham_response,
-        })
+        }
+        calls["dviteey"] = count_prompt_tokens(dviteey_prompt.format_messages(**dviteey_variables), llm_kishan)
+        _record_token_usage(session, packed.tokens, calls)
+        dviteey_response = (dviteey_prompt | llm_kishan | StrOutputParser()).invoke(dviteey_variables)
         
         # Add assistant response to history
         session.add_message("assistant", dviteey_response)
@@ -0,0 +1,214 @@
+import json
+import logging
+from array import array
+from typing import Dict, List, Optional, Tuple, Union, Any
+from langchain_core.documents import Document
+from langchain_community.docstore.base import AddableMixin, Docstore
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Metadata keys that are identical for every chunk of a file
+FILE_KEYS = ("file_name", "file_path", "total_pages", "file_hash", "upload_batch")
+# Integer metadata that differs for (almost) every chunk; kept in per-slot arrays so it is not interned
+SLOT_KEYS = ("chunk_offset", "page_end")
+# Marks a SLOT_KEYS field that the chunk does not have
+MISSING = -1
+
+def _intern_key(items: Dict[str, Any]) -> Union[Tuple, str]:
+    """
+    Hashable key for a metadata dict, falling back to JSON for unhashable values.
+    Value types are part of the key, so True, 1 and 1.0 stay distinct.
+    """
+    try:
+        key = tuple(sorted((name, type(value).__name__, value) for name, value in items.items()))
+        hash(key)
+        return key
+    except TypeError:
+        return json.dumps({name: [type(value).__name__, value] for name, value in items.items()},
+                          sort_keys=True, default=str)
+
+def _is_slot_value(value: Any) -> bool:
+    """True if a SLOT_KEYS value fits its per-slot array."""
+    return isinstance(value, int) and not isinstance(value, bool) and 0 <= value < 2 ** 63
+
+class CompactDocstore(Docstore, AddableMixin):
+    """
+    Memory-compact replacement for InMemoryDocstore.
+
+    Chunk text lives in one contiguous UTF-8 buffer addressed by (offset, length)
+    arrays. Metadata is interned: file-level fields are stored once per file,
+    page-level fields once per page, and each chunk only holds an integer page
+    record id plus its per-chunk integers (SLOT_KEYS) in typed arrays. Records
+    are reference-counted and freed for reuse once their last chunk is deleted.
+    Document objects are built on demand in search(), so only the hits of a
+    query are ever materialized.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._offsets = array("Q")
+        self._lengths = array("I")
+        self._page_ids = array("I")
+        self._slot_fields = {key: array("q") for key in SLOT_KEYS}
+        self._slots: Dict[str, int] = {}  # docstore id -> slot
+
+        # File records, referenced by page records
+        self._files: List[Optional[Dict[str, Any]]] = []
+        self._file_keys: List[Any] = []
+        self._file_refs = array("I")
+        self._file_ids: Dict[Union[Tuple, str], int] = {}
+        self._free_files: List[int] = []
+        # Page records (file record id, page-level fields), referenced by chunk slots
+        self._pages: List[Optional[Tuple[int, Dict[str, Any]]]] = []
+        self._page_keys: List[Any] = []
+        self._page_refs = array("I")
+        self._page_record_ids: Dict[Tuple[int, Union[Tuple, str]], int] = {}
+        self._free_pages: List[int] = []
+
+        self._dead_bytes = 0
+
+    def _intern_metadata(self, metadata: Dict[str, Any]) -> int:
+        """Return the page record id for a metadata dict, creating records as needed."""
+        file_fields = {key: metadata[key] for key in FILE_KEYS if key in metadata}
+        page_fields = {key: value for key, value in metadata.items()
+                       if key not in FILE_KEYS and not (key in SLOT_KEYS and _is_slot_value(value))}
+
+        file_key = _intern_key(file_fields)
+        file_id = self._file_ids.get(file_key)
+        if file_id is None:
+            file_id = self._new_record(self._files, self._file_keys, self._file_refs, self._free_files,
+                                       file_fields, file_key)
+            self._file_ids[file_key] = file_id
+
+        page_key = (file_id, _intern_key(page_fields))
+        page_id = self._page_record_ids.get(page_key)
+        if page_id is None:
+            page_id = self._new_record(self._pages, self._page_keys, self._page_refs, self._free_pages,
+                                       (file_id, page_fields), page_key)
+            self._page_record_ids[page_key] = page_id
+            self._file_refs[file_id] += 1
+        self._page_refs[page_id] += 1
+        return page_id
+
+    @staticmethod
+    def _new_record(records: List, keys: List, refs: array, free: List[int], record: Any, key: Any) -> int:
+        """Store a record with no references yet, reusing a freed id if there is one."""
+        if free:
+            record_id = free.pop()
+            records[record_id], keys[record_id], refs[record_id] = record, key, 0
+        else:
+            record_id = len(records)
+            records.append(record)
+            keys.append(key)
+            refs.append(0)
+        return record_id
+
+    def _release_page(self, page_id: int) -> None:
+        """Drop one chunk's reference to a page record, freeing it (and its file) when unused."""
+        self._page_refs[page_id] -= 1
+        if self._page_refs[page_id]:
+            return
+        file_id, _ = self._pages[page_id]
+        del self._page_record_ids[self._page_keys[page_id]]
+        self._pages[page_id] = self._page_keys[page_id] = None
+        self._free_pages.append(page_id)
+
+        self._file_refs[file_id] -= 1
+        if not self._file_refs[file_id]:
+            del self._file_ids[self._file_keys[file_id]]
+            self._files[file_id] = self._file_keys[file_id] = None
+            self._free_files.append(file_id)
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        """Add documents, keyed by docstore id."""
+        overlapping = set(texts).intersection(self._slots)
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+
+        for doc_id, doc in texts.items():
+            encoded = doc.page_content.encode("utf-8")
+            self._slots[doc_id] = len(self._offsets)
+            self._offsets.append(len(self._buffer))
+            self._lengths.append(len(encoded))
+            metadata = doc.metadata or {}
+            self._page_ids.append(self._intern_metadata(metadata))
+            for key, values in self._slot_fields.items():
+                value = metadata.get(key)
+                values.append(value if _is_slot_value(value) else MISSING)
+            self._buffer += encoded
+
+    def search(self, search: str) -> Union[str, Document]:
+        """Materialize the Document stored under a docstore id."""
+        slot = self._slots.get(search)
+        if slot is None:
+            return f"ID {search} not found."
+
+        offset = self._offsets[slot]
+        text = self._buffer[offset:offset + self._lengths[slot]].decode("utf-8")
+        return Document(id=search, page_content=text, metadata=self._slot_metadata(slot))
+
+    def metadata(self, doc_id: str) -> Dict[str, Any]:
+        """Metadata of a chunk without decoding its text."""
+        return self._slot_metadata(self._slots[doc_id])
+
+    def _slot_metadata(self, slot: int) -> Dict[str, Any]:
+        file_id, page_fields = self._pages[self._page_ids[slot]]
+        metadata = dict(self._files[file_id])
+        metadata.update(page_fields)
+        for key, values in self._slot_fields.items():
+            if values[slot] != MISSING:
+                metadata[key] = values[slot]
+        return metadata
+
+    def delete(self, ids: List) -> None:
+        """Delete documents by id; the text buffer is compacted once mostly dead."""
+        missing = [doc_id for doc_id in ids if doc_id not in self._slots]
+        if missing:
+            raise ValueError(f"Tried to delete ids that do not exist: {missing}")
+
+        for doc_id in ids:
+            slot = self._slots.pop(doc_id)
+            self._dead_bytes += self._lengths[slot]
+            self._release_page(self._page_ids[slot])
+
+        if self._dead_bytes > len(self._buffer) // 2:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rewrite the buffer and arrays without deleted slots."""
+        buffer = bytearray()
+        offsets, lengths, page_ids = array("Q"), array("I"), array("I")
+        slot_fields = {key: array("q") for key in SLOT_KEYS}
+        slots = {}
+        for doc_id, slot in sorted(self._slots.items(), key=lambda item: item[1]):
+            offset, length = self._offsets[slot], self._lengths[slot]
+            slots[doc_id] = len(offsets)
+            offsets.append(len(buffer))
+            lengths.append(length)
+            page_ids.append(self._page_ids[slot])
+            for key, values in slot_fields.items():
+                values.append(self._slot_fields[key][slot])
+            buffer += self._buffer[offset:offset + length]
+
+        logger.info(f"Compacted docstore: reclaimed {self._dead_bytes} bytes")
+        self._buffer, self._offsets, self._lengths, self._page_ids = buffer, offsets, lengths, page_ids
+        self._slot_fields = slot_fields
+        self._slots = slots
+        self._dead_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Approximate bytes held by each part of the store."""
+        return {
+            "chunks": len(self._slots),
+            "text_bytes": len(self._buffer),
+            "index_bytes": (self._offsets.itemsize * len(self._offsets)
+                            + self._lengths.itemsize * len(self._lengths)
+                            + self._page_ids.itemsize * len(self._page_ids)
+                            + sum(values.itemsize * len(values) for values in self._slot_fields.values())),
+            "file_records": len(self._files) - len(self._free_files),
+            "page_records": len(self._pages) - len(self._free_pages),
+        }
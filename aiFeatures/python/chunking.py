@@ -0,0 +1,299 @@
+import os
+import re
+import logging
+from bisect import bisect_right
+from dataclasses import dataclass
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# "structured" splits whole documents at headings and sentences; "recursive" keeps per-page character windows
+CHUNKER = os.environ.get("RAG_CHUNKER", "structured").lower()
+# Chunks shorter than this fraction of chunk_size are merged into a neighbour
+MIN_CHUNK_FRACTION = float(os.environ.get("RAG_MIN_CHUNK_FRACTION", "0.35"))
+# A merged chunk may exceed chunk_size by this fraction rather than leave a fragment behind
+MERGE_SLACK = 0.25
+
+# Short standalone lines that open a section: "Chapter 3 ...", "Part IV ...", "2.1 Title", "# Title", "INTRODUCTION".
+# Keywords must be capitalized and numbered, so wrapped lines like "part of the loss ..." are not headings
+HEADING_PATTERN = re.compile(
+    r"^[ \t]*(?:"
+    r"(?:Chapter|Section|Part|Unit|Lecture|Module|CHAPTER|SECTION|PART|UNIT|LECTURE|MODULE)[ \t]+"
+    r"(?:\d{1,3}(?:\.\d{1,3})*|[IVXLC]{1,6})\b[^\n]{0,80}"
+    r"|\d{1,2}(?:\.\d{1,2}){0,3}\.?[ \t]+[A-Z][^\n.!?]{0,80}"
+    r"|#{1,6}[ \t]+[^\n]{1,80}"
+    r"|[A-Z][A-Z0-9 \t,:&'()/-]{3,80}"
+    r")[ \t]*$",
+    re.MULTILINE,
+)
+# End of a sentence: terminal punctuation (plus closing quotes/brackets), whitespace, then a likely sentence start
+SENTENCE_END_PATTERN = re.compile(r"[.!?][\"')\]]*(?=\s+[\"'(\[]?[A-Z0-9])")
+PARAGRAPH_BREAK_PATTERN = re.compile(r"\n[ \t]*\n")
+# Words after which a full stop does not end the sentence
+ABBREVIATIONS = frozenset({"mr", "mrs", "ms", "dr", "prof", "st", "vs", "etc", "fig", "eq", "no", "vol",
+                           "e.g", "i.e", "cf", "al", "approx", "ch", "sec", "p", "pp"})
+
+@dataclass
+class Segment:
+    """A span of the document text that is never split further (a sentence or heading)."""
+    start: int
+    end: int
+    heading: bool = False
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start
+
+class DocumentChunker:
+    """
+    Splits a document's page stream into chunks that follow its structure.
+
+    The pages of a document are treated as one text (joined by newlines) so
+    chunks can cross page breaks. Boundaries are found with a few regex passes:
+    headings start a new chunk (once the current one is big enough), and
+    otherwise chunks are packed with whole sentences up to chunk_size. Overlap
+    is made of whole trailing sentences and never crosses a heading. Fragments
+    left at section or document ends are merged into their neighbour, and each
+    chunk records the pages it spans (page_index to page_end) and its offset
+    in the document text (chunk_offset). Pages are consumed as a stream; see
+    _DocumentSplitter.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, min_chunk_size: Optional[int] = None):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.min_chunk_size = int(chunk_size * MIN_CHUNK_FRACTION) if min_chunk_size is None else min_chunk_size
+        self.max_merged_size = int(chunk_size * (1 + MERGE_SLACK))
+
+    def _boundaries(self, text: str) -> Tuple[List[int], set]:
+        """Sorted segment boundary offsets, and the offsets where a heading starts."""
+        boundaries = {0, len(text)}
+        heading_starts = set()
+        for match in HEADING_PATTERN.finditer(text):
+            if match.group().strip():
+                heading_starts.add(match.start())
+                boundaries.update((match.start(), match.end()))
+        for match in PARAGRAPH_BREAK_PATTERN.finditer(text):
+            boundaries.add(match.start())
+        for match in SENTENCE_END_PATTERN.finditer(text):
+            word = text[max(match.start() - 8, 0):match.start()].rsplit(None, 1)
+            if word and word[-1].lower().lstrip("([\"'") in ABBREVIATIONS:
+                continue
+            boundaries.add(match.end())
+        return sorted(boundaries), heading_starts
+
+    def _split_span(self, text: str, start: int, end: int, heading: bool, base: int = 0) -> List[Segment]:
+        """Segments between two boundaries (document offsets) of a text starting at offset base."""
+        # Trim surrounding whitespace so lengths reflect content
+        while start < end and text[start - base].isspace():
+            start += 1
+        while end > start and text[end - 1 - base].isspace():
+            end -= 1
+        if start == end:
+            return []
+        segments = []
+        # Sentences longer than a chunk are cut at word boundaries
+        while end - start > self.chunk_size:
+            cut = text.rfind(" ", start - base, start - base + self.chunk_size) + base
+            if cut <= start:
+                cut = start + self.chunk_size
+            segments.append(Segment(start, cut, heading))
+            heading = False
+            start = cut + 1 if text[cut - base:cut - base + 1] == " " else cut
+        segments.append(Segment(start, end, heading))
+        return segments
+
+    def split_document(self, pages: Iterable[Tuple[str, Dict]]) -> List[Tuple[str, Dict]]:
+        """
+        Chunk one document.
+
+        Args:
+            pages: (text, metadata) pages of a single document, in page order
+
+        Returns:
+            (chunk, metadata) pairs; metadata is copied from the chunk's first
+            page, with page_end set to the index of its last page
+        """
+        return list(_DocumentSplitter(self).split(pages))
+
+    def split_pages(self, pages: Iterable[Tuple[str, Dict]]) -> Iterator[Tuple[str, Dict]]:
+        """
+        Chunk a stream of pages from one or more documents, one document at a time.
+
+        Chunks are yielded as soon as later pages can no longer change them, so
+        only the tail of the current document is held in memory.
+        """
+        for document, document_pages in groupby(pages, key=lambda page: page[1].get("file_path",
+                                                                                   page[1].get("file_name"))):
+            splitter = _DocumentSplitter(self)
+            chunk_count, chunk_chars = 0, 0
+            for chunk in splitter.split(document_pages):
+                chunk_count += 1
+                chunk_chars += len(chunk[0])
+                yield chunk
+            if chunk_count:
+                logger.info(f"Chunked {splitter.page_count} pages of {os.path.basename(str(document))} into "
+                            f"{chunk_count} chunks (mean {chunk_chars / chunk_count:.0f} chars)")
+
+class _DocumentSplitter:
+    """
+    DocumentChunker state for one document, fed a page at a time.
+
+    Boundaries only depend on their own line and the start of the next one, so
+    once a later line has content, everything before it is final: segments are
+    found up to there, packed as they arrive, and a closed chunk is emitted
+    once no later merge can change it. The buffer keeps only the text from the
+    oldest unemitted chunk (or the line being scanned) on, plus the pages it
+    covers. The chunks are the same as splitting the joined text in one go.
+    """
+
+    def __init__(self, chunker: DocumentChunker):
+        self.chunker = chunker
+        self.text = ""  # Document text from offset base on
+        self.base = 0
+        self.length = 0  # Document text length so far
+        self.pages: List[Tuple[int, int, Dict]] = []  # (document offset, page number, metadata) still needed
+        self.page_count = 0
+        self.scanned = 0  # Segments have been found up to this boundary
+        self.segments: List[Segment] = []  # Segment i is segments[i - segment_base]
+        self.segment_base = 0
+        # The open chunk: first segment, size so far, and the next segment to pack
+        self.first = 0
+        self.size = 0
+        self.next = 0
+        self.closed: List[Tuple[int, int]] = []  # (first segment, last segment + 1) of unemitted chunks
+        self.leading_checked = False
+
+    def split(self, pages: Iterable[Tuple[str, Dict]]) -> Iterator[Tuple[str, Dict]]:
+        for text, metadata in pages:
+            yield from self.add_page(text, metadata)
+        yield from self.finish()
+
+    def _segment(self, i: int) -> Segment:
+        return self.segments[i - self.segment_base]
+
+    def add_page(self, text: str, metadata: Dict) -> List[Tuple[str, Dict]]:
+        """Append a page; returns the chunks it made final."""
+        if self.page_count:
+            self.text += "\n"
+            self.length += 1
+        self.pages.append((self.length, self.page_count, metadata))
+        self.page_count += 1
+        text = text.strip()
+        self.text += text
+        self.length += len(text)
+
+        # Everything before the start of the last line with content is final
+        last_line = self.text.rfind("\n", 0, len(self.text.rstrip()))
+        if last_line >= 0:
+            self._scan(self.base + last_line + 1)
+        return self._emit(final=False)
+
+    def finish(self) -> List[Tuple[str, Dict]]:
+        """Chunks left at the end of the document."""
+        self._scan(None)
+        if self.next:
+            self._close(self.first, self.next)
+        return self._emit(final=True)
+
+    def _scan(self, limit: Optional[int]) -> None:
+        """Find the segments between the last scanned boundary and limit (None: the document end)."""
+        # Rescan from the start of the line, so headings and abbreviations see what they would in the whole text
+        window = self.text.rfind("\n", 0, self.scanned - self.base) + 1
+        offset = self.base + window
+        boundaries, heading_starts = self.chunker._boundaries(self.text[window:])
+        bounds = [offset + boundary for boundary in boundaries
+                  if offset + boundary >= self.scanned and (limit is None or offset + boundary < limit)]
+        for start, end in zip(bounds, bounds[1:]):
+            self.segments.extend(self.chunker._split_span(self.text, start, end,
+                                                          start - offset in heading_starts, self.base))
+        if len(bounds) > 1:
+            self.scanned = bounds[-1]
+        self._pack()
+
+    def _pack(self) -> None:
+        """Group newly found segments into chunks, closing chunks as they fill."""
+        chunker = self.chunker
+        while self.next < self.segment_base + len(self.segments):
+            i = self.next
+            segment = self._segment(i)
+            if i > self.first:
+                if segment.heading and self.size >= chunker.min_chunk_size:
+                    # New section: close the chunk without overlap
+                    self._close(self.first, i)
+                    self.first, self.size = i, 0
+                elif self.size + 1 + segment.length > chunker.chunk_size:
+                    self._close(self.first, i)
+                    # Carry whole trailing sentences of the closed chunk as overlap
+                    overlap_first, overlap = i, 0
+                    while (overlap_first - 1 > self.first and not self._segment(overlap_first).heading
+                           and overlap + self._segment(overlap_first - 1).length + 1 <= chunker.chunk_overlap):
+                        overlap_first -= 1
+                        overlap += self._segment(overlap_first).length + 1
+                    if overlap + segment.length > chunker.chunk_size:
+                        overlap_first, overlap = i, 0
+                    self.first, self.size = overlap_first, overlap
+            self.size += segment.length + (1 if self.size else 0)
+            self.next += 1
+
+    def _span(self, first: int, end: int) -> int:
+        return self._segment(end - 1).end - self._segment(first).start
+
+    def _close(self, first: int, end: int) -> None:
+        """Record a closed chunk, folding it into the previous one if undersized and the result fits."""
+        if self.closed and self._span(first, end) < self.chunker.min_chunk_size:
+            previous_first, previous_end = self.closed[-1]
+            if self._span(previous_first, end) <= self.chunker.max_merged_size:
+                self.closed[-1] = (previous_first, max(previous_end, end))
+                return
+        self.closed.append((first, end))
+
+    def _emit(self, final: bool) -> List[Tuple[str, Dict]]:
+        """Chunks no later segment can change: all but the last closed one, which may still absorb a fragment."""
+        closed = self.closed
+        if not self.leading_checked:
+            # The first chunk may still be folded into the second until a third is closed
+            if not final and len(closed) < 3:
+                return []
+            self.leading_checked = True
+            # A small leading chunk (e.g. a title page) goes into the chunk after it
+            if (len(closed) > 1 and self._span(*closed[0]) < self.chunker.min_chunk_size
+                    and self._span(closed[0][0], closed[1][1]) <= self.chunker.max_merged_size):
+                closed[:2] = [(closed[0][0], closed[1][1])]
+
+        ready = closed if final else closed[:-1]
+        chunks = [self._chunk(first, end) for first, end in ready]
+        self.closed = closed[len(ready):]
+        self._trim()
+        return chunks
+
+    def _chunk(self, first: int, end: int) -> Tuple[str, Dict]:
+        start, stop = self._segment(first).start, self._segment(end - 1).end
+        page_starts = [page_start for page_start, _, _ in self.pages]
+        first_page = bisect_right(page_starts, start) - 1
+        last_page = bisect_right(page_starts, stop - 1) - 1
+        _, last_number, last_metadata = self.pages[last_page]
+
+        metadata = dict(self.pages[first_page][2])
+        metadata["page_end"] = last_metadata.get("page_index", last_number)
+        # Offset within the joined document text; identifies the chunk together with the file hash
+        metadata["chunk_offset"] = start
+        if any(page_metadata.get("ocr") for _, _, page_metadata in self.pages[first_page:last_page + 1]):
+            metadata["ocr"] = True
+        return self.text[start - self.base:stop - self.base], metadata
+
+    def _trim(self) -> None:
+        """Drop segments, text and pages that no unemitted chunk or later scan needs."""
+        needed = self.closed[0][0] if self.closed else self.first
+        del self.segments[:needed - self.segment_base]
+        self.segment_base = needed
+
+        keep = self.base + self.text.rfind("\n", 0, self.scanned - self.base) + 1
+        if self.segments:
+            keep = min(keep, self.segments[0].start)
+        self.text = self.text[keep - self.base:]
+        self.base = keep
+        while len(self.pages) > 1 and self.pages[1][0] <= keep:
+            self.pages.pop(0)
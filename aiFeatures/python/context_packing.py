@@ -0,0 +1,162 @@
+import os
+import re
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Input tokens one request may spend on history plus retrieved/web context
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "6000"))
+# Share of the budget reserved for chat history before documents are packed
+HISTORY_SHARE = float(os.environ.get("CONTEXT_HISTORY_SHARE", "0.25"))
+# Ask the Gemini API for exact prompt sizes when reporting usage (one extra request per call)
+EXACT_TOKEN_COUNT = os.environ.get("CONTEXT_EXACT_TOKEN_COUNT", "false").lower() == "true"
+# Items are cut rather than dropped only if at least this many tokens remain for them
+MIN_TRUNCATED_TOKENS = 48
+
+# Gemini's SentencePiece vocabulary keeps most English words whole and splits
+# long or rare words into pieces of roughly 6 characters; punctuation and
+# symbols are mostly single tokens.
+_PIECE_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+GEMINI_CHARS_PER_WORD_PIECE = 6
+
+def count_tokens(text: str) -> int:
+    """Local estimate of the Gemini token count of text (no API call)."""
+    if not text:
+        return 0
+    tokens = 0
+    for piece in _PIECE_PATTERN.findall(text):
+        tokens += 1 + (len(piece) - 1) // GEMINI_CHARS_PER_WORD_PIECE
+    return tokens
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens, at a word boundary."""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    tokens = 0
+    for match in _PIECE_PATTERN.finditer(text):
+        tokens += 1 + (len(match.group()) - 1) // GEMINI_CHARS_PER_WORD_PIECE
+        if tokens > max_tokens:
+            return text[:match.start()].rstrip() + " ..."
+    return text
+
+@dataclass
+class ContextItem:
+    """A piece of prompt context competing for the token budget."""
+    text: str
+    kind: str  # "retrieved" or "web"
+    overhead_tokens: int = 0  # Citation/header tokens added around the text
+    payload: Any = None
+
+@dataclass
+class PackedContext:
+    """Result of packing: what was kept and how many tokens each part uses."""
+    history: List[Tuple[str, str]] = field(default_factory=list)
+    items: List[Tuple[ContextItem, str]] = field(default_factory=list)  # (item, possibly truncated text)
+    tokens: Dict[str, int] = field(default_factory=dict)
+    dropped: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self.tokens.values())
+
+class ContextPacker:
+    """
+    Fits chat history, retrieved chunks and web sources into a per-request
+    token budget.
+
+    History gets up to history_share of the budget, newest messages first.
+    Context items are taken in the order given (callers pass them most
+    relevant first) and the last one that does not fit is truncated. Budget
+    left over by the items goes back to older history.
+    """
+
+    def __init__(self, budget: int = CONTEXT_TOKEN_BUDGET, history_share: float = HISTORY_SHARE):
+        self.budget = budget
+        self.history_share = history_share
+
+    @staticmethod
+    def _message_tokens(message: Tuple[str, str]) -> int:
+        return count_tokens(message[1]) + 4  # Role and turn markers
+
+    def _fill_history(self, messages: Sequence[Tuple[str, str]], start: int, max_tokens: int) -> Tuple[int, int]:
+        """Walk back from index start; return (new start index, tokens used)."""
+        used = 0
+        while start > 0:
+            cost = self._message_tokens(messages[start - 1])
+            if used + cost > max_tokens:
+                break
+            used += cost
+            start -= 1
+        return start, used
+
+    def pack_items(self, items: Sequence[ContextItem], max_tokens: int) -> Tuple[List[Tuple[ContextItem, str]], int]:
+        """Greedily keep items in order, truncating the one that crosses the budget."""
+        selected, used = [], 0
+        for item in items:
+            remaining = max_tokens - used - item.overhead_tokens
+            cost = count_tokens(item.text)
+            if cost <= remaining:
+                selected.append((item, item.text))
+                used += cost + item.overhead_tokens
+            elif remaining >= MIN_TRUNCATED_TOKENS:
+                text = truncate_to_tokens(item.text, remaining)
+                selected.append((item, text))
+                used += count_tokens(text) + item.overhead_tokens
+        return selected, used
+
+    def pack(self, query: str, history: Sequence[Tuple[str, str]] = (),
+             items: Sequence[ContextItem] = (), fixed_tokens: int = 0) -> PackedContext:
+        """
+        Pack history and context items for one request.
+
+        Args:
+            query: The user query (always sent, counted against the budget)
+            history: (role, content) messages, oldest first
+            items: Context items, most relevant first
+            fixed_tokens: Other tokens already committed (e.g. pre-packed content)
+        """
+        query_tokens = count_tokens(query)
+        available = max(self.budget - query_tokens - fixed_tokens, 0)
+
+        history = list(history)
+        start, history_tokens = self._fill_history(history, len(history), int(available * self.history_share))
+        selected, item_tokens = self.pack_items(items, available - history_tokens)
+        # Hand unused budget back to older history
+        start, extra = self._fill_history(history, start, available - history_tokens - item_tokens)
+        history_tokens += extra
+
+        tokens = {"query": query_tokens, "history": history_tokens}
+        if fixed_tokens:
+            tokens["fixed"] = fixed_tokens
+        for item, text in selected:
+            tokens[item.kind] = tokens.get(item.kind, 0) + count_tokens(text) + item.overhead_tokens
+
+        packed = PackedContext(history=history[start:], items=selected, tokens=tokens,
+                               dropped=len(items) - len(selected))
+        logger.info(f"Packed context: {packed.total_tokens}/{self.budget} tokens {tokens}, "
+                    f"{len(history) - start}/{len(history)} history messages, {packed.dropped} items dropped")
+        return packed
+
+def count_prompt_tokens(messages: Sequence[Any], llm: Any = None) -> int:
+    """
+    Input tokens of a formatted prompt (langchain messages). Uses the model's
+    own count when CONTEXT_EXACT_TOKEN_COUNT is set, otherwise the local estimate.
+    """
+    if EXACT_TOKEN_COUNT and llm is not None:
+        try:
+            return llm.get_num_tokens_from_messages(list(messages))
+        except Exception as e:
+            logger.warning(f"Exact token count failed, using estimate: {str(e)}")
+    return sum(count_tokens(str(message.content)) + 4 for message in messages)
+
+# Global instance
+context_packer = ContextPacker()
+
+def get_context_packer() -> ContextPacker:
+    """Get the global context packer instance."""
+    return context_packer
@@ -0,0 +1,74 @@
+import os
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Relevance vs. novelty trade-off (1.0 = pure relevance order)
+MMR_LAMBDA = float(os.environ.get("RAG_MMR_LAMBDA", "0.7"))
+# Candidates at least this cosine-similar to an already selected chunk are dropped outright
+DUPLICATE_SIMILARITY = float(os.environ.get("RAG_DUPLICATE_SIMILARITY", "0.95"))
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def mmr_select(candidates: Sequence[Tuple[Any, float]], vectors: Dict[str, Sequence[float]], k: int,
+               lambda_mult: float = MMR_LAMBDA,
+               duplicate_similarity: Optional[float] = DUPLICATE_SIMILARITY) -> List[Tuple[Any, float]]:
+    """
+    Maximal marginal relevance selection over already-fetched candidates.
+
+    Relevance is 1 - each candidate's distance: cosine distance for dense
+    results, or the fusion distance of hybrid_search_with_score, so keyword
+    hits compete on their fused rank. Redundancy is the highest cosine
+    similarity to a chunk already selected, computed from the stored vectors.
+    Candidates without a vector are never considered redundant.
+
+    Args:
+        candidates: (document, distance) pairs, lower distance is better
+        vectors: Stored vector per document id
+        k: Number of results to select
+        lambda_mult: Weight of relevance against redundancy
+        duplicate_similarity: Similarity at which a candidate counts as a
+                              near-duplicate and is dropped (None keeps all)
+
+    Returns:
+        Up to k (document, distance) pairs in selection order
+    """
+    if len(candidates) <= 1:
+        return list(candidates[:k])
+
+    relevance = np.array([1.0 - score for _, score in candidates], dtype=np.float32)
+    rows = [vectors.get(getattr(doc, 'id', None)) for doc, _ in candidates]
+    has_vector = np.array([row is not None for row in rows])
+    dim = next(len(row) for row in rows if row is not None) if has_vector.any() else 1
+    matrix = np.zeros((len(rows), dim), dtype=np.float32)
+    for i, row in enumerate(rows):
+        if row is not None:
+            matrix[i] = row
+    matrix = _unit_rows(matrix)
+
+    max_similarity = np.zeros(len(candidates), dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    selected: List[int] = []
+    while len(selected) < k and available.any():
+        objective = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        objective[~available] = -np.inf
+        best = int(np.argmax(objective))
+        selected.append(best)
+        available[best] = False
+
+        if has_vector[best]:
+            similarity = matrix @ matrix[best]
+            np.maximum(max_similarity, similarity, out=max_similarity)
+            if duplicate_similarity is not None:
+                available &= ~(has_vector & (similarity >= duplicate_similarity))
+
+    dropped = len(candidates) - len(selected) - int(available.sum())
+    if dropped:
+        logger.info(f"Suppressed {dropped} near-duplicate candidates")
+    return [candidates[i] for i in selected]
@@ -0,0 +1,167 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+from typing import List, Dict, Optional, Sequence
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+def get_cache_dir() -> str:
+    """Directory for on-disk caches, overridable with MENTORAE_CACHE_DIR."""
+    cache_dir = os.environ.get("MENTORAE_CACHE_DIR",
+                               os.path.join(os.path.expanduser("~"), ".cache", "mentorae"))
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+def normalize_model_name(model: str) -> str:
+    """Treat "name" and "name:latest" as the same model."""
+    model = model.strip()
+    return model[:-len(":latest")] if model.endswith(":latest") else model
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding cache.
+
+    Vectors are keyed by sha256(normalized model name, chunk text) and stored
+    as packed float32 blobs in SQLite. The cache is bounded by total vector
+    bytes and evicts least-recently-used entries when it grows past the limit.
+    """
+
+    # SQLite limits the number of bound parameters per statement
+    _LOOKUP_BATCH = 500
+
+    def __init__(self, path: Optional[str] = None, max_size_mb: float = 512.0):
+        self.path = path or os.path.join(get_cache_dir(), "embeddings.sqlite3")
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings(last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, text: str) -> bytes:
+        """Content address of a chunk for a given embedding model."""
+        return hashlib.sha256(f"{normalize_model_name(model)}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        Look up vectors for texts, returning None for misses. Hits are marked as
+        recently used.
+        """
+        keys = [self.make_key(model, text) for text in texts]
+        found: Dict[bytes, bytes] = {}
+
+        with self._lock:
+            for i in range(0, len(keys), self._LOOKUP_BATCH):
+                batch = keys[i:i + self._LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?",
+                                       [(now, key) for key in found])
+                self._conn.commit()
+
+        results: List[Optional[List[float]]] = []
+        for key in keys:
+            blob = found.get(key)
+            if blob is None:
+                self.misses += 1
+                results.append(None)
+            else:
+                self.hits += 1
+                results.append(array("f", blob).tolist())
+        return results
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """Store vectors for texts, evicting least-recently-used entries if over budget."""
+        now = time.time()
+        rows = [(self.make_key(model, text), array("f", vector).tobytes(), now)
+                for text, vector in zip(texts, vectors)]
+
+        with self._lock:
+            for key, blob, _ in rows:
+                existing = self._conn.execute(
+                    "SELECT LENGTH(vector) FROM embeddings WHERE key = ?", (key,)).fetchone()
+                self._total_bytes += len(blob) - (existing[0] if existing else 0)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)", rows)
+            self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self) -> None:
+        """Drop least-recently-used entries until the cache is back under 90% of its budget."""
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        cursor = self._conn.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_access ASC")
+        victims = []
+        for key, size in cursor:
+            if self._total_bytes <= target:
+                break
+            victims.append((key,))
+            self._total_bytes -= size
+
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+        self.evictions += len(victims)
+        logger.info(f"Evicted {len(victims)} embeddings from cache")
+
+    def clear(self) -> None:
+        """Remove every cached vector."""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "size_mb": self._total_bytes / (1024 * 1024),
+            "max_size_mb": self.max_bytes / (1024 * 1024),
+        }
+
+# Global instance, created on first use so importing this module stays cheap
+_embedding_cache: Optional[EmbeddingCache] = None
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Get the global embedding cache instance.
+
+    Returns None when disabled with EMBEDDING_CACHE_ENABLED=0 or if the cache
+    database cannot be opened.
+    """
+    global _embedding_cache
+    if os.environ.get("EMBEDDING_CACHE_ENABLED", "1") == "0":
+        return None
+    if _embedding_cache is None:
+        try:
+            _embedding_cache = EmbeddingCache(
+                max_size_mb=float(os.environ.get("EMBEDDING_CACHE_MAX_MB", "512")))
+        except Exception as e:
+            logger.warning(f"Embedding cache unavailable: {str(e)}")
+            return None
+    return _embedding_cache
@@ -0,0 +1,130 @@
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from langchain_core.embeddings import Embeddings
+from langchain_ollama import OllamaEmbeddings
+from embedding_cache import EmbeddingCache, get_embedding_cache
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Defaults can be tuned per deployment without code changes
+DEFAULT_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "32"))
+DEFAULT_MAX_IN_FLIGHT = int(os.environ.get("EMBEDDING_MAX_IN_FLIGHT", "4"))
+DEFAULT_MAX_RETRIES = int(os.environ.get("EMBEDDING_MAX_RETRIES", "3"))
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that sends documents in fixed-size batches with a bounded
+    number of requests in flight, retrying failed batches with backoff.
+
+    When an EmbeddingCache is attached, documents are looked up there first and
+    only the misses are sent to the model.
+    """
+
+    def __init__(self, embeddings: Embeddings, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT, max_retries: int = DEFAULT_MAX_RETRIES,
+                 retry_backoff: float = 1.0, cache: Optional[EmbeddingCache] = None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.batch_size = max(1, batch_size)
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff = retry_backoff
+
+        # Running totals for throughput reporting
+        self.total_chunks = 0
+        self.total_seconds = 0.0
+
+    @property
+    def model(self) -> Optional[str]:
+        """Name of the wrapped embedding model, if it exposes one."""
+        return getattr(self.embeddings, "model", None)
+
+    @property
+    def throughput(self) -> float:
+        """Average embedding throughput in chunks/sec over the lifetime of this client."""
+        return self.total_chunks / self.total_seconds if self.total_seconds else 0.0
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        """Embed one batch, retrying transient failures with exponential backoff."""
+        attempt = 0
+        while True:
+            try:
+                return self.embeddings.embed_documents(batch)
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    logger.error(f"Embedding batch of {len(batch)} failed after {attempt + 1} attempts: {str(e)}")
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                attempt += 1
+                logger.warning(f"Embedding batch failed ({str(e)}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, serving cache hits locally and batching the misses."""
+        if not texts:
+            return []
+
+        model = self.model
+        if self.cache is None or model is None:
+            return self._embed_uncached(texts)
+
+        vectors = self.cache.get_many(model, texts)
+        # Deduplicate misses so repeated chunks are embedded once
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            fresh = dict(zip(missing, self._embed_uncached(missing)))
+            self.cache.put_many(model, missing, [fresh[text] for text in missing])
+            vectors = [fresh[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+
+        logger.info(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+        return vectors
+
+    def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents in batches, keeping at most max_in_flight requests outstanding."""
+        started = time.perf_counter()
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+        if len(batches) == 1 or self.max_in_flight == 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(batches))) as executor:
+                # map preserves input order
+                results = list(executor.map(self._embed_batch, batches))
+
+        elapsed = time.perf_counter() - started
+        self.total_chunks += len(texts)
+        self.total_seconds += elapsed
+        rate = len(texts) / elapsed if elapsed else 0.0
+        logger.info(f"Embedded {len(texts)} chunks in {len(batches)} batches in {elapsed:.2f}s "
+                    f"({rate:.1f} chunks/sec)")
+
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query."""
+        return self.embeddings.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed several queries in batched requests. Queries bypass the cache,
+        which holds chunk embeddings only.
+        """
+        if not texts:
+            return []
+        unique = list(dict.fromkeys(texts))
+        vectors = dict(zip(unique, self._embed_uncached(unique)))
+        return [vectors[text] for text in texts]
+
+def ensure_batched(embeddings: Embeddings) -> BatchedEmbeddings:
+    """Wrap embeddings in a BatchedEmbeddings client unless already wrapped."""
+    if isinstance(embeddings, BatchedEmbeddings):
+        return embeddings
+    return BatchedEmbeddings(embeddings)
+
+def get_embeddings(model: str = "mxbai-embed-large:latest") -> BatchedEmbeddings:
+    """Create the batched, cache-backed embedding client used by the RAG pipeline."""
+    return BatchedEmbeddings(OllamaEmbeddings(model=model), cache=get_embedding_cache())
@@ -0,0 +1,114 @@
+import os
+import json
+import logging
+import threading
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional
+from embedding_cache import get_cache_dir, normalize_model_name
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+@dataclass
+class EmbeddingModelInfo:
+    """Static properties of an embedding model."""
+    dimension: int
+    normalized: bool  # True if the model returns unit-length vectors
+
+# Well-known Ollama models, so a fresh install needs no probe for them.
+# Ollama's /api/embed endpoint returns L2-normalized vectors.
+BUILTIN_MODELS: Dict[str, EmbeddingModelInfo] = {
+    "mxbai-embed-large": EmbeddingModelInfo(dimension=1024, normalized=True),
+    "nomic-embed-text": EmbeddingModelInfo(dimension=768, normalized=True),
+    "all-minilm": EmbeddingModelInfo(dimension=384, normalized=True),
+    "snowflake-arctic-embed": EmbeddingModelInfo(dimension=1024, normalized=True),
+    "bge-m3": EmbeddingModelInfo(dimension=1024, normalized=True),
+}
+
+DEFAULT_EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "mxbai-embed-large:latest")
+
+class EmbeddingModelRegistry:
+    """
+    Resolves embedding model metadata once per process and persists it per install.
+
+    Lookup order: in-process memory, the on-disk registry file, the built-in
+    table, and finally a single probe request through the supplied embeddings.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(get_cache_dir(), "embedding_models.json")
+        self._models: Dict[str, EmbeddingModelInfo] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        """Load persisted model metadata, ignoring a missing or corrupt file."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._models = {name: EmbeddingModelInfo(**info) for name, info in data.items()}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable embedding model registry {self.path}: {str(e)}")
+
+    def _save_locked(self) -> None:
+        """Atomically persist the registry."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({name: asdict(info) for name, info in self._models.items()}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, model: str) -> Optional[EmbeddingModelInfo]:
+        """Return known metadata for a model without making any request."""
+        name = normalize_model_name(model)
+        return self._models.get(name) or BUILTIN_MODELS.get(name)
+
+    def resolve(self, model: str, embeddings=None) -> EmbeddingModelInfo:
+        """
+        Return metadata for a model, probing it through embeddings only if unknown.
+
+        Args:
+            model: Embedding model name
+            embeddings: Embeddings client used for the one-off probe
+
+        Returns:
+            EmbeddingModelInfo for the model
+        """
+        info = self.get(model)
+        if info is not None:
+            return info
+
+        if embeddings is None:
+            raise ValueError(f"Unknown embedding model '{model}' and no embeddings client to probe it")
+
+        with self._lock:
+            info = self.get(model)
+            if info is not None:
+                return info
+
+            vector = embeddings.embed_query("dimension probe")
+            norm = sum(x * x for x in vector) ** 0.5
+            info = EmbeddingModelInfo(dimension=len(vector), normalized=abs(norm - 1.0) < 1e-3)
+            self._models[normalize_model_name(model)] = info
+            logger.info(f"Resolved embedding model {model}: dimension={info.dimension}, "
+                        f"normalized={info.normalized}")
+            try:
+                self._save_locked()
+            except Exception as e:
+                logger.warning(f"Could not persist embedding model registry: {str(e)}")
+            return info
+
+# Global instance
+_model_registry: Optional[EmbeddingModelRegistry] = None
+
+def get_model_registry() -> EmbeddingModelRegistry:
+    """Get the global embedding model registry instance."""
+    global _model_registry
+    if _model_registry is None:
+        _model_registry = EmbeddingModelRegistry()
+    return _model_registry
+
+def get_embedding_dimension(model: str = DEFAULT_EMBEDDING_MODEL, embeddings=None) -> int:
+    """Shortcut for the embedding dimension of a model."""
+    return get_model_registry().resolve(model, embeddings).dimension
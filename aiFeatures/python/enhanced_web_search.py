@@ -12,6 +12,7 @@ from datetime import datetime
 import requests
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
+from context_packing import ContextItem, count_tokens, get_context_packer
 
 # Load environment variables
 load_dotenv()
@@ -588,39 +589,58 @@ class EnhancedWebSearcher:
         # This can be enhanced later with proper type annotations
         return []
     
-    def get_content_for_llm(self, response: SearchResponse, max_chars: int = 4000) -> str:
+    def get_content_for_llm(self, response: SearchResponse, max_chars: Optional[int] = None,
+                            max_tokens: Optional[int] = None) -> str:
         """
         Extract and format content for LLM consumption
         
+        Sources are packed most relevant first into a token budget; the source
+        that crosses the budget is truncated and the rest are left out.
+        
         Args:
             response: Search response
-            max_chars: Maximum characters to return
+            max_chars: Optional hard limit on characters returned
+            max_tokens: Token budget for the content (defaults to the share of the
+                        context budget not reserved for chat history)
         """
         if not response.results:
             return "No search results found."
         
-        # Start with AI answer if available
-        content_parts = []
+        packer = get_context_packer()
+        if max_tokens is None:
+            max_tokens = int(packer.budget * (1 - packer.history_share))
         
+        # Start with AI answer if available, then sources by relevance
+        items = []
         if response.answer:
-            content_parts.append(f"AI Summary: {response.answer}")
+            items.append(ContextItem(response.answer, "web", count_tokens("AI Summary: ")))
         
-        # Add source content with citations
-        for i, result in enumerate(response.results[:3], 1):  # Limit to top 3 results
+        ranked = sorted(response.results, key=lambda result: result.score, reverse=True)
+        for i, result in enumerate(ranked, 1):
             citation = f"[{i}] {result.title} ({result.domain})"
-            source_content = result.content[:800] if result.content else result.snippet
-            content_parts.append(f"\\n{citation}:\\n{source_content}")
+            items.append(ContextItem(result.content or result.snippet, "web", count_tokens(citation) + 2,
+                                     (citation, result)))
         
-        # Combine and truncate if necessary
-        full_content = "\\n\\n".join(content_parts)
+        selected, used = packer.pack_items(items, max_tokens)
+        
+        # Add source content with citations
+        content_parts = []
+        sources = []
+        for item, text in selected:
+            if item.payload is None:
+                content_parts.append(f"AI Summary: {text}")
+            else:
+                citation, result = item.payload
+                content_parts.append(f"{citation}:\n{text}")
+                sources.append(f"{citation.split(']')[0]}] {result.url}")
         
-        if len(full_content) > max_chars:
-            full_content = full_content[:max_chars] + "\\n\\n[Content truncated for brevity]"
+        full_content = "\n\n".join(content_parts)
+        if max_chars is not None and len(full_content) > max_chars:
+            full_content = full_content[:max_chars] + "\n\n[Content truncated for brevity]"
+        logger.info(f"Web context: {used} tokens from {len(sources)}/{len(ranked)} sources")
         
         # Add source URLs for reference
-        source_urls = "\\n\\nSources:\\n" + "\\n".join([
-            f"[{i}] {result.url}" for i, result in enumerate(response.results[:3], 1)
-        ])
+        source_urls = "\n\nSources:\n" + "\n".join(sources)
         
         return full_content + source_urls
 
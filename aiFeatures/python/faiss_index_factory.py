@@ -0,0 +1,298 @@
+import os
+import math
+import logging
+from dataclasses import dataclass
+from typing import Optional, List, Tuple, Union
+import numpy as np
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from chunk_store import CompactDocstore
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "hnsw", "ivf", "ivfpq")
+
+# Corpus sizes (in vectors) at which "auto" moves to the next index type
+FLAT_MAX_VECTORS = 20_000
+HNSW_MAX_VECTORS = 200_000
+IVF_MAX_VECTORS = 2_000_000
+
+@dataclass
+class IndexParams:
+    """Index selection plus the recall/latency knobs for each index type."""
+    index_type: str = os.environ.get("FAISS_INDEX_TYPE", "auto")
+    # "cosine" searches normalized vectors by inner product; "l2" is raw Euclidean
+    metric: str = os.environ.get("FAISS_METRIC", "cosine")
+    # IVF / IVF-PQ
+    nlist: Optional[int] = None  # Number of clusters; None derives it from corpus size
+    nprobe: int = 16  # Clusters visited per query; higher = better recall, slower
+    pq_m: Optional[int] = None  # PQ sub-quantizers; None derives it from dimension
+    pq_bits: int = 8
+    # HNSW
+    hnsw_m: int = 32  # Graph degree
+    ef_construction: int = 80
+    ef_search: int = 64  # Candidate list size per query; higher = better recall, slower
+    
+    @property
+    def faiss_metric(self) -> int:
+        return faiss.METRIC_INNER_PRODUCT if self.metric == "cosine" else faiss.METRIC_L2
+    
+    @property
+    def distance_strategy(self) -> DistanceStrategy:
+        return DistanceStrategy.MAX_INNER_PRODUCT if self.metric == "cosine" else DistanceStrategy.EUCLIDEAN_DISTANCE
+
+def choose_index_type(n_vectors: int) -> str:
+    """Pick an index type from corpus size."""
+    if n_vectors <= FLAT_MAX_VECTORS:
+        return "flat"
+    if n_vectors <= HNSW_MAX_VECTORS:
+        return "hnsw"
+    if n_vectors <= IVF_MAX_VECTORS:
+        return "ivf"
+    return "ivfpq"
+
+def resolve_index_type(params: IndexParams, n_vectors: int) -> str:
+    """Concrete index type for params, resolving "auto" from corpus size."""
+    if params.index_type == "auto":
+        return choose_index_type(n_vectors)
+    if params.index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type '{params.index_type}'. Expected one of {INDEX_TYPES} or 'auto'")
+    return params.index_type
+
+def _default_nlist(n_vectors: int) -> int:
+    return max(1, min(65536, int(4 * math.sqrt(max(n_vectors, 1)))))
+
+def _default_pq_m(dim: int) -> int:
+    """Largest divisor of dim that gives sub-vectors of at least 8 dimensions."""
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+def build_index(dim: int, index_type: str, params: Optional[IndexParams] = None,
+                n_vectors: int = 0) -> faiss.Index:
+    """
+    Create an empty FAISS index of the given type.
+
+    IVF types still need train() before vectors can be added.
+    """
+    params = params or IndexParams()
+    metric = params.faiss_metric
+
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dim) if metric == faiss.METRIC_INNER_PRODUCT else faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params.hnsw_m, metric)
+        index.hnsw.efConstruction = params.ef_construction
+    elif index_type in ("ivf", "ivfpq"):
+        nlist = params.nlist or _default_nlist(n_vectors)
+        quantizer = faiss.IndexFlatIP(dim) if metric == faiss.METRIC_INNER_PRODUCT else faiss.IndexFlatL2(dim)
+        if index_type == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, metric)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, params.pq_m or _default_pq_m(dim),
+                                     params.pq_bits, metric)
+    else:
+        raise ValueError(f"Unknown FAISS index type '{index_type}'")
+
+    apply_search_params(index, params)
+    return index
+
+def apply_search_params(index: faiss.Index, params: IndexParams) -> None:
+    """Apply query-time recall/latency parameters to an index."""
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(params.nprobe, index.nlist)
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = params.ef_search
+
+def get_index_type(index: faiss.Index) -> str:
+    """Name of an index's type as used by this module."""
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+def supports_remove(index: faiss.Index) -> bool:
+    """HNSW graphs cannot drop vectors in place."""
+    return not isinstance(index, faiss.IndexHNSW)
+
+def reconstruct_all(index: faiss.Index) -> np.ndarray:
+    """Return every stored vector in position order (lossy for IVF-PQ)."""
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    if index.ntotal == 0:
+        return np.empty((0, index.d), dtype="float32")
+    return index.reconstruct_n(0, index.ntotal)
+
+def reconstruct_positions(index: faiss.Index, positions: Union[List[int], np.ndarray]) -> np.ndarray:
+    """Return the stored vectors at the given positions in one batch call (lossy for IVF-PQ)."""
+    if isinstance(index, faiss.IndexIVF) and index.direct_map.type == faiss.DirectMap.NoMap:
+        index.make_direct_map()
+    if len(positions) == 0:
+        return np.empty((0, index.d), dtype="float32")
+    return index.reconstruct_batch(np.asarray(positions, dtype="int64"))
+
+def search_subset(index: faiss.Index, queries: np.ndarray, positions: np.ndarray, k: int,
+                  block_size: int = 8192) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact search restricted to the given positions, in blocks so memory stays
+    bounded. Cost grows with the number of positions, not the index size.
+    Returns (scores, positions) shaped like index.search.
+    """
+    inner_product = index.metric_type == faiss.METRIC_INNER_PRODUCT
+    n_queries = len(queries)
+    best_scores = np.full((n_queries, k), -np.inf if inner_product else np.inf, dtype="float32")
+    best_positions = np.full((n_queries, k), -1, dtype="int64")
+
+    for start in range(0, len(positions), block_size):
+        block = positions[start:start + block_size]
+        vectors = reconstruct_positions(index, block)
+        if inner_product:
+            scores = queries @ vectors.T
+        else:
+            scores = ((queries ** 2).sum(1)[:, None] + (vectors ** 2).sum(1)[None, :]
+                      - 2 * queries @ vectors.T)
+        merged_scores = np.hstack([best_scores, scores.astype("float32")])
+        merged_positions = np.hstack([best_positions, np.broadcast_to(block, scores.shape)])
+        order = np.argsort(-merged_scores if inner_product else merged_scores, axis=1)[:, :k]
+        best_scores = np.take_along_axis(merged_scores, order, axis=1)
+        best_positions = np.take_along_axis(merged_positions, order, axis=1)
+
+    best_positions[~np.isfinite(best_scores)] = -1
+    return best_scores, best_positions
+
+def selector_search_params(index: faiss.Index, positions: np.ndarray) -> faiss.SearchParameters:
+    """Search parameters restricting a search to positions, keeping the index's nprobe/efSearch."""
+    selector = faiss.IDSelectorBatch(positions)
+    if isinstance(index, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+    elif isinstance(index, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    params.selector_ref = selector  # The C++ object holds only a raw pointer
+    return params
+
+def build_trained_index(vectors: np.ndarray, index_type: str, params: Optional[IndexParams] = None) -> faiss.Index:
+    """Create an index of the given type, train it if needed, and add vectors in order."""
+    params = params or IndexParams()
+    n_vectors, dim = vectors.shape
+    index = build_index(dim, index_type, params, n_vectors)
+
+    if not index.is_trained:
+        # 256 samples per cluster is plenty for k-means; sample deterministically
+        max_train = 256 * index.nlist
+        train_vectors = vectors
+        if n_vectors > max_train:
+            rng = np.random.default_rng(0)
+            train_vectors = vectors[rng.choice(n_vectors, max_train, replace=False)]
+        index.train(train_vectors)
+
+    if n_vectors:
+        index.add(vectors)
+    return index
+
+def rebuild_index(index: faiss.Index, index_type: str, params: Optional[IndexParams] = None,
+                  keep: Optional[List[int]] = None) -> faiss.Index:
+    """
+    Rebuild an index as index_type from its own stored vectors.
+
+    Args:
+        index: Source index
+        index_type: Target index type
+        params: Index parameters
+        keep: Positions to keep (None keeps all), in the order they should appear
+
+    Returns:
+        New index whose positions follow the source order (or keep order)
+    """
+    vectors = reconstruct_all(index)
+    if keep is not None:
+        vectors = vectors[np.asarray(keep, dtype="int64")] if keep else vectors[:0]
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+
+    # k-means needs at least one training point per cluster (and PQ 2^bits);
+    # fall back to flat for corpora too small to train on
+    params = params or IndexParams()
+    if index_type in ("ivf", "ivfpq"):
+        min_points = params.nlist or _default_nlist(len(vectors))
+        if index_type == "ivfpq":
+            min_points = max(min_points, 2 ** params.pq_bits)
+        if len(vectors) < min_points:
+            index_type = "flat"
+    return build_trained_index(vectors, index_type, params)
+
+def optimize_faiss_store(faiss_store, params: Optional[IndexParams] = None) -> str:
+    """
+    Move a langchain FAISS store to the index type params call for, if it differs.
+
+    Positions are preserved, so index_to_docstore_id stays valid.
+
+    Returns:
+        Index type in use after optimization
+    """
+    params = params or IndexParams()
+    index = faiss_store.index
+    current = get_index_type(index)
+    target = resolve_index_type(params, index.ntotal)
+
+    if target != current:
+        logger.info(f"Rebuilding FAISS index with {index.ntotal} vectors: {current} -> {target}")
+        faiss_store.index = rebuild_index(index, target, params)
+        current = get_index_type(faiss_store.index)
+    else:
+        apply_search_params(index, params)
+    return current
+
+def make_faiss_store(embeddings, index: faiss.Index, docstore, index_to_docstore_id,
+                     distance_strategy: DistanceStrategy, normalize_L2: bool) -> FAISS:
+    """
+    Wrap an index in a langchain FAISS store.
+
+    langchain warns whenever normalize_L2 is combined with inner-product
+    scoring, yet inner product over unit vectors is exactly cosine similarity.
+    So the store is created without the flag, which is then switched on so
+    langchain still normalizes vectors on add and queries on search.
+    """
+    faiss_store = FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+        normalize_L2=False,
+        distance_strategy=distance_strategy,
+    )
+    faiss_store._normalize_L2 = normalize_L2
+    return faiss_store
+
+def new_faiss_store(embeddings, embedding_dim: int, params: Optional[IndexParams] = None,
+                    index: Optional[faiss.Index] = None) -> FAISS:
+    """Create an empty langchain FAISS store whose scoring matches params.metric."""
+    params = params or IndexParams()
+    return make_faiss_store(
+        embeddings,
+        index if index is not None else build_index(embedding_dim, "flat", params),
+        CompactDocstore(),
+        {},
+        distance_strategy=params.distance_strategy,
+        normalize_L2=params.metric == "cosine",
+    )
+
+def to_cosine_distance(faiss_store: FAISS, score: float) -> float:
+    """
+    Convert a raw langchain FAISS score to cosine distance (1 - cosine similarity).
+    
+    This is the score contract shared by every store: lower is more similar,
+    0 is identical, and it matches what PineconeStore returns. Inner-product
+    scores on normalized vectors are cosine similarities; squared L2 distances
+    between unit vectors equal 2 - 2 * cosine similarity (Ollama embeddings are
+    normalized).
+    """
+    if faiss_store.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT:
+        return 1.0 - float(score)
+    return float(score) / 2.0
@@ -0,0 +1,222 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+import faiss
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from chunk_store import CompactDocstore
+from faiss_index_factory import make_faiss_store
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.sqlite3"
+
+class SQLiteDocstore(Docstore):
+    """
+    Read-only docstore backed by a SQLite file, read lazily one chunk per search hit.
+
+    The same table also records each chunk's FAISS position, so it can serve
+    as langchain's index_to_docstore_id through id_map(). Both only describe
+    the index file saved next to them, so the store is never written to;
+    make_writable() moves everything into RAM before the first change.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "doc_id TEXT PRIMARY KEY, position INTEGER UNIQUE, text TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+    def search(self, search: str) -> Union[str, Document]:
+        """Fetch one chunk by docstore id."""
+        with self._lock:
+            row = self._conn.execute("SELECT text, metadata FROM chunks WHERE doc_id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def positions_matching(self, search_filter) -> List[int]:
+        """FAISS positions of chunks whose metadata passes a SearchFilter."""
+        where, params = search_filter.to_sql()
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT position FROM chunks WHERE position IS NOT NULL AND {where} ORDER BY position", params)
+            return [row[0] for row in rows]
+
+    def iter_chunks(self, batch_size: int = 1000) -> Iterator[List[Tuple[int, str, str, str]]]:
+        """All (position, doc_id, text, metadata JSON) rows in position order, in batches."""
+        last_position = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT position, doc_id, text, metadata FROM chunks WHERE position > ? "
+                    "ORDER BY position LIMIT ?", (last_position, batch_size)).fetchall()
+            if not rows:
+                return
+            yield rows
+            last_position = rows[-1][0]
+
+    def get_info(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM info WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_info(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)", (key, value))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def id_map(self) -> "SQLiteIdMap":
+        """Lazy FAISS position -> docstore id mapping over the same table."""
+        return SQLiteIdMap(self)
+
+class SQLiteIdMap(Mapping):
+    """Read-only index_to_docstore_id view that looks positions up in SQLite on demand."""
+
+    def __init__(self, docstore: SQLiteDocstore):
+        self._docstore = docstore
+
+    def __getitem__(self, position: int) -> str:
+        store = self._docstore
+        with store._lock:
+            row = store._conn.execute("SELECT doc_id FROM chunks WHERE position = ?", (int(position),)).fetchone()
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def __iter__(self) -> Iterator[int]:
+        store = self._docstore
+        with store._lock:
+            positions = [row[0] for row in store._conn.execute(
+                "SELECT position FROM chunks WHERE position IS NOT NULL ORDER BY position")]
+        return iter(positions)
+
+    def __len__(self) -> int:
+        store = self._docstore
+        with store._lock:
+            return store._conn.execute("SELECT COUNT(*) FROM chunks WHERE position IS NOT NULL").fetchone()[0]
+
+def is_mmap_format(path: str) -> bool:
+    """True if path holds an index saved by save_faiss_store."""
+    return os.path.exists(os.path.join(path, INDEX_FILE)) and os.path.exists(os.path.join(path, CHUNKS_FILE))
+
+def save_faiss_store(faiss_store: FAISS, path: str, batch_size: int = 1000) -> None:
+    """
+    Persist a langchain FAISS store as a raw FAISS index plus a SQLite chunk table.
+
+    Unlike FAISS.save_local, nothing is pickled, so the index can be memory-mapped
+    and chunks read lazily on load.
+    """
+    os.makedirs(path, exist_ok=True)
+    chunks_path = os.path.join(path, CHUNKS_FILE)
+    tmp_chunks_path = f"{chunks_path}.tmp"
+    if os.path.exists(tmp_chunks_path):
+        os.remove(tmp_chunks_path)
+
+    docstore = SQLiteDocstore(tmp_chunks_path)
+    items = sorted(faiss_store.index_to_docstore_id.items())
+    for i in range(0, len(items), batch_size):
+        rows = []
+        for position, doc_id in items[i:i + batch_size]:
+            doc = faiss_store.docstore.search(doc_id)
+            rows.append((doc_id, position, doc.page_content, json.dumps(doc.metadata)))
+        with docstore._lock:
+            docstore._conn.executemany(
+                "INSERT INTO chunks (doc_id, position, text, metadata) VALUES (?, ?, ?, ?)", rows)
+            docstore._conn.commit()
+
+    docstore.set_info("distance_strategy", faiss_store.distance_strategy.value)
+    docstore.set_info("normalize_L2", json.dumps(bool(faiss_store._normalize_L2)))
+    docstore._conn.close()
+
+    index_path = os.path.join(path, INDEX_FILE)
+    faiss.write_index(faiss_store.index, f"{index_path}.tmp")
+    os.replace(f"{index_path}.tmp", index_path)
+    os.replace(tmp_chunks_path, chunks_path)
+    logger.info(f"Saved {len(items)} chunks to {path}")
+
+def load_faiss_store(path: str, embeddings, mmap: bool = True) -> FAISS:
+    """
+    Open a store saved by save_faiss_store.
+
+    With mmap=True the FAISS index is memory-mapped (IO_FLAG_MMAP), so opening
+    is near-instant and pages are shared between processes; the index is then
+    read-only until copied (see make_writable). Chunk text and metadata stay
+    in SQLite and are read per hit.
+    """
+    index_path = os.path.join(path, INDEX_FILE)
+    index = None
+    if mmap:
+        try:
+            index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except Exception as e:
+            logger.warning(f"Memory-mapping not supported for this index, reading into RAM: {str(e)}")
+            mmap = False
+    if index is None:
+        index = faiss.read_index(index_path)
+
+    docstore = SQLiteDocstore(os.path.join(path, CHUNKS_FILE))
+    distance_strategy = DistanceStrategy(
+        docstore.get_info("distance_strategy", DistanceStrategy.EUCLIDEAN_DISTANCE.value))
+    normalize_L2 = json.loads(docstore.get_info("normalize_L2", "false"))
+
+    faiss_store = make_faiss_store(embeddings, index, docstore, docstore.id_map(),
+                                   distance_strategy=distance_strategy, normalize_L2=normalize_L2)
+    faiss_store.is_mmapped = mmap
+    faiss_store.index_path = index_path
+    logger.info(f"Opened index at {path} ({index.ntotal} vectors, mmap={mmap})")
+    return faiss_store
+
+def make_writable(faiss_store: FAISS) -> None:
+    """
+    Prepare a store opened by load_faiss_store for adds and deletes.
+
+    A memory-mapped index is read again from its file into RAM (the on-disk
+    inverted lists of a mapped IVF index cannot be cloned), and the SQLite
+    chunk table is copied into a CompactDocstore with a plain position -> id
+    dict, so changes
+    never touch the saved files and langchain's position bookkeeping (which
+    renumbers on delete) stays in step with the index. Call save_faiss_store
+    to persist the result.
+    """
+    if getattr(faiss_store, "is_mmapped", False):
+        index = faiss.read_index(faiss_store.index_path)
+        if index.ntotal != faiss_store.index.ntotal:
+            raise RuntimeError(f"{faiss_store.index_path} changed on disk since it was opened")
+        if isinstance(index, faiss.IndexIVF):
+            index.nprobe = faiss_store.index.nprobe
+        elif isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efSearch = faiss_store.index.hnsw.efSearch
+        faiss_store.index = index
+        faiss_store.is_mmapped = False
+
+    sqlite_docstore = faiss_store.docstore
+    if not isinstance(sqlite_docstore, SQLiteDocstore):
+        return
+    docstore = CompactDocstore()
+    index_to_docstore_id: Dict[int, str] = {}
+    for rows in sqlite_docstore.iter_chunks():
+        docstore.add({doc_id: Document(id=doc_id, page_content=text, metadata=json.loads(metadata))
+                      for _, doc_id, text, metadata in rows})
+        index_to_docstore_id.update((position, doc_id) for position, doc_id, _, _ in rows)
+    faiss_store.docstore = docstore
+    faiss_store.index_to_docstore_id = index_to_docstore_id
+    sqlite_docstore.close()
+    logger.info(f"Copied {len(docstore)} chunks from {sqlite_docstore.path} into memory for writing")
@@ -1,12 +1,29 @@
 import os
-import uuid
+import time
 import logging
+import weakref
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Tuple, Union, Optional, Any
 from abc import ABC, abstractmethod
 import faiss
+import numpy as np
 from langchain_community.vectorstores import FAISS
-from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores.utils import DistanceStrategy
 from langchain_ollama import OllamaEmbeddings
+from embedding_client import ensure_batched
+from chunk_store import CompactDocstore
+from sparse_index import BM25Index, reciprocal_rank_fusion
+from query_cache import QueryCache
+from search_filters import SearchFilter
+from pinecone_upload import PipelinedUploader, chunk_vector_id, find_existing_ids, refresh_metadata
+from pinecone_namespaces import DEFAULT_NAMESPACE, get_namespace_manager
+from faiss_index_factory import (IndexParams, build_index, resolve_index_type, optimize_faiss_store,
+                                 rebuild_index, get_index_type, apply_search_params, new_faiss_store,
+                                 to_cosine_distance, reconstruct_positions, search_subset,
+                                 selector_search_params)
+from faiss_persistence import (SQLiteDocstore, SQLiteIdMap, save_faiss_store, load_faiss_store, is_mmap_format,
+                               make_writable)
 
 # Try to import Pinecone (will be available after installing requirements)
 try:
@@ -19,6 +36,19 @@ except ImportError:
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Query cache lifetimes per backend, in seconds
+LOCAL_QUERY_CACHE_TTL = float(os.environ.get("LOCAL_QUERY_CACHE_TTL", "600"))
+PINECONE_QUERY_CACHE_TTL = float(os.environ.get("PINECONE_QUERY_CACHE_TTL", "120"))
+
+# Concurrent Pinecone queries issued by batch_similarity_search
+PINECONE_QUERY_CONCURRENCY = int(os.environ.get("PINECONE_QUERY_CONCURRENCY", "8"))
+
+# Chunk text stored in Pinecone metadata is cut to this many characters
+PINECONE_METADATA_TEXT_CHARS = 1000
+
+# Filtered local searches over at most this many chunks scan them exactly instead of the ANN index
+FILTER_EXACT_MAX = int(os.environ.get("FAISS_FILTER_EXACT_MAX", "50000"))
+
 class VectorStore(ABC):
     """Abstract base class for vector stores."""
     
@@ -28,146 +58,484 @@ class VectorStore(ABC):
         pass
     
     @abstractmethod
-    def similarity_search_with_score(self, query: str, k: int = 3) -> List[Tuple[Any, float]]:
-        """Search for similar texts with scores."""
+    def similarity_search_with_score(self, query: str, k: int = 3,
+                                     search_filter: Optional[SearchFilter] = None) -> List[Tuple[Any, float]]:
+        """
+        Search for similar texts with scores, optionally restricted by metadata.
+        
+        Every store returns cosine distance (1 - cosine similarity): lower is
+        more similar, so scores are comparable across backends.
+        """
         pass
     
     @abstractmethod
     def delete(self, ids: Optional[List[str]] = None) -> bool:
         """Delete vectors from the store."""
         pass
+    
+    # BM25 keyword index over the same chunks, kept in sync by add_texts/delete
+    sparse_index: Optional[BM25Index] = None
+    # Search result cache; entries are tied to the store version below
+    query_cache: Optional[QueryCache] = None
+    # Incremented on every add/delete so cached results never outlive a change
+    version: int = 0
+    
+    def _mark_changed(self) -> None:
+        self.version += 1
+    
+    @abstractmethod
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 3,
+                                               search_filter: Optional[SearchFilter] = None) -> List[Tuple[Any, float]]:
+        """Search with a precomputed query embedding, returning cosine distances."""
+        pass
+    
+    @abstractmethod
+    def similarity_search_with_vectors(self, embedding: List[float], k: int = 3,
+                                       search_filter: Optional[SearchFilter] = None) -> List[Tuple[Any, float, List[float]]]:
+        """Search with a query embedding, also returning each hit's stored vector."""
+        pass
+    
+    def batch_similarity_search(self, queries: List[str], k: int = 3,
+                                search_filter: Optional[SearchFilter] = None) -> List[List[Tuple[Any, float]]]:
+        """
+        Search several queries at once, embedding them in a single batch.
+        
+        Returns:
+            One list of (document, cosine distance) pairs per query, in input order
+        """
+        if not queries:
+            return []
+        embeddings = self.embeddings.embed_queries(queries)
+        return [self.similarity_search_by_vector_with_score(embedding, k, search_filter) for embedding in embeddings]
+    
+    def get_documents(self, ids: List[str]) -> List[Any]:
+        """Fetch documents by chunk id, skipping ids that are not found."""
+        return []
+    
+    def hybrid_search_with_score(self, query: str, k: int = 3, fetch_k: int = 20,
+                                 rrf_k: int = 60, embedding: Optional[List[float]] = None,
+                                 dense: Optional[List[Tuple[Any, float]]] = None,
+                                 search_filter: Optional[SearchFilter] = None) -> List[Tuple[Any, float]]:
+        """
+        Dense + BM25 search merged by reciprocal rank fusion.
+        
+        Results are ordered by fused rank and scored as a fusion distance,
+        1 - fused / best possible fused score: 0 for a chunk ranked first by
+        both searches, so lower is better as with cosine distance and keyword-
+        only hits are scored by their own rank rather than the dense scores.
+        Dense results already fetched by the caller can be passed in as dense.
+        The dense search is filtered by the store; keyword hits are checked
+        against search_filter once fetched.
+        """
+        if dense is None and embedding is not None:
+            dense = self.similarity_search_by_vector_with_score(embedding, k=fetch_k, search_filter=search_filter)
+        elif dense is None:
+            dense = self.similarity_search_with_score(query, k=fetch_k, search_filter=search_filter)
+        if self.sparse_index is None or not len(self.sparse_index):
+            return dense[:k]
+        
+        sparse_ids = [doc_id for doc_id, _ in self.sparse_index.search(query, fetch_k)]
+        dense_by_id = {getattr(doc, 'id', None) or doc.page_content: doc for doc, _ in dense}
+        rankings = [list(dense_by_id), sparse_ids]
+        fused = reciprocal_rank_fusion(rankings, k=rrf_k)
+        best_fused = len(rankings) / (rrf_k + 1)
+        if search_filter is None:
+            fused = fused[:k]
+        
+        missing = [doc_id for doc_id, _ in fused if doc_id not in dense_by_id]
+        fetched = {getattr(doc, 'id', None): doc for doc in self.get_documents(missing)} if missing else {}
+        if search_filter is not None:
+            fetched = {doc_id: doc for doc_id, doc in fetched.items() if search_filter.matches(doc.metadata)}
+        
+        results = []
+        for doc_id, fused_score in fused:
+            doc = dense_by_id.get(doc_id) or fetched.get(doc_id)
+            if doc is not None:
+                results.append((doc, 1.0 - fused_score / best_fused))
+            if len(results) == k:
+                break
+        return results
 
 class LocalFAISSStore(VectorStore):
-    """Local FAISS vector store wrapper."""
+    """
+    Local FAISS vector store wrapper.
     
-    def __init__(self, embeddings, embedding_dim: int):
-        self.embeddings = embeddings
-        index = faiss.IndexFlatL2(embedding_dim)
-        self.vector_store = FAISS(
-            embedding_function=embeddings,
-            index=index,
-            docstore=InMemoryDocstore(),
-            index_to_docstore_id={},
-        )
+    The FAISS index type (flat, HNSW, IVF, IVF-PQ) follows index_params; with
+    "auto" the index is rebuilt into a faster type as the corpus grows. IVF
+    types are trained on the stored vectors when the store switches to them.
+    """
+    
+    def __init__(self, embeddings, embedding_dim: int, index_params: Optional[IndexParams] = None):
+        self.embeddings = ensure_batched(embeddings)
+        self.index_params = index_params or IndexParams()
+        # IVF indexes need training data, so start flat and rebuild once vectors arrive
+        index_type = resolve_index_type(self.index_params, 0)
+        index = build_index(embedding_dim, "flat" if index_type in ("ivf", "ivfpq") else index_type,
+                            self.index_params)
+        self.vector_store = new_faiss_store(self.embeddings, embedding_dim, self.index_params, index)
+        self._sparse_lock = threading.Lock()
+        self.sparse_index = BM25Index()
+        self.query_cache = QueryCache(ttl_seconds=LOCAL_QUERY_CACHE_TTL)
+        self._postings = None  # Per-file/per-page position index, see _filter_postings
+        self._postings_version = -1
         self.store_type = "local"
     
+    @property
+    def sparse_index(self) -> Optional[BM25Index]:
+        """BM25 index over the stored chunks; after load_local it is built from the docstore on first use."""
+        if self._sparse_index_pending:
+            with self._sparse_lock:
+                if self._sparse_index_pending:
+                    self._sparse_index = self._build_sparse_index()
+                    self._sparse_index_pending = False
+        return self._sparse_index
+    
+    @sparse_index.setter
+    def sparse_index(self, value: Optional[BM25Index]) -> None:
+        self._sparse_index = value
+        self._sparse_index_pending = False
+    
+    def _build_sparse_index(self) -> BM25Index:
+        """Index the text of every stored chunk for keyword search."""
+        started = time.perf_counter()
+        sparse_index = BM25Index()
+        docstore = self.vector_store.docstore
+        if isinstance(docstore, SQLiteDocstore):
+            for rows in docstore.iter_chunks():
+                sparse_index.add([doc_id for _, doc_id, _, _ in rows], [text for _, _, text, _ in rows])
+        else:
+            for doc_id in self.vector_store.index_to_docstore_id.values():
+                doc = docstore.search(doc_id)
+                if not isinstance(doc, str):
+                    sparse_index.add([doc_id], [doc.page_content])
+        logger.info(f"Built keyword index over {len(sparse_index)} chunks in {time.perf_counter() - started:.2f}s")
+        return sparse_index
+    
+    @property
+    def index_type(self) -> str:
+        """Type of the FAISS index currently backing the store."""
+        return get_index_type(self.vector_store.index)
+    
     def add_texts(self, texts: List[str], metadatas: Optional[List[Dict]] = None) -> List[str]:
         """Add texts to FAISS store."""
-        return self.vector_store.add_texts(texts, metadatas)
+        make_writable(self.vector_store)
+        ids = self.vector_store.add_texts(texts, metadatas)
+        if self.sparse_index is not None:
+            self.sparse_index.add(ids, texts)
+        self.optimize_index()
+        self._mark_changed()
+        return ids
+    
+    def optimize_index(self) -> str:
+        """Switch to the index type suited to the current corpus size, if it changed."""
+        return optimize_faiss_store(self.vector_store, self.index_params)
+    
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+        """Tune query-time recall/latency for IVF (nprobe) and HNSW (ef_search) indexes."""
+        if nprobe is not None:
+            self.index_params.nprobe = nprobe
+        if ef_search is not None:
+            self.index_params.ef_search = ef_search
+        apply_search_params(self.vector_store.index, self.index_params)
     
-    def similarity_search_with_score(self, query: str, k: int = 3) -> List[Tuple[Any, float]]:
-        """Search in FAISS store."""
-        return self.vector_store.similarity_search_with_score(query, k)
+    def similarity_search_with_score(self, query: str, k: int = 3,
+                                     search_filter: Optional[SearchFilter] = None) -> List[Tuple[Any, float]]:
+        """Search in FAISS store, returning cosine distances."""
+        if search_filter is not None:
+            return self.similarity_search_by_vector_with_score(self.embeddings.embed_query(query), k, search_filter)
+        results = self.vector_store.similarity_search_with_score(query, k)
+        return [(doc, to_cosine_distance(self.vector_store, score)) for doc, score in results]
+    
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 3,
+                                               search_filter: Optional[SearchFilter] = None) -> List[Tuple[Any, float]]:
+        """Search in FAISS store with a precomputed query embedding."""
+        if search_filter is not None:
+            return [(self._document_at(position), score)
+                    for position, score in self._search_positions([embedding], k, search_filter)[0]]
+        results = self.vector_store.similarity_search_with_score_by_vector(embedding, k)
+        return [(doc, to_cosine_distance(self.vector_store, score)) for doc, score in results]
+    
+    def _filter_postings(self) -> Dict[Tuple, np.ndarray]:
+        """
+        Per-file, per-page index: FAISS positions grouped by the metadata a
+        SearchFilter looks at. Rebuilt lazily after the store changes.
+        """
+        if self._postings is not None and self._postings_version == self.version:
+            return self._postings
+        store = self.vector_store
+        if isinstance(store.docstore, CompactDocstore):
+            metadata_of = store.docstore.metadata  # Skips decoding chunk text
+        else:
+            metadata_of = lambda doc_id: store.docstore.search(doc_id).metadata
+        
+        groups: Dict[Tuple, List[int]] = {}
+        for position, doc_id in store.index_to_docstore_id.items():
+            metadata = metadata_of(doc_id)
+            groups.setdefault(tuple(metadata.get(key) for key in SearchFilter.KEYS), []).append(position)
+        self._postings = {key: np.array(positions, dtype="int64") for key, positions in groups.items()}
+        self._postings_version = self.version
+        return self._postings
+    
+    def _filtered_positions(self, search_filter: SearchFilter) -> np.ndarray:
+        """Sorted FAISS positions of the chunks passing a filter."""
+        store = self.vector_store
+        # The SQLite chunk table's positions only hold while it still backs the untouched
+        # loaded index; make_writable swaps in an in-memory docstore before any change
+        if isinstance(store.docstore, SQLiteDocstore) and isinstance(store.index_to_docstore_id, SQLiteIdMap):
+            return np.array(store.docstore.positions_matching(search_filter), dtype="int64")
+        matched = [positions for key, positions in self._filter_postings().items()
+                   if search_filter.matches(dict(zip(SearchFilter.KEYS, key)))]
+        return np.sort(np.concatenate(matched)) if matched else np.empty(0, dtype="int64")
+    
+    def _search_positions(self, embeddings: List[List[float]], k: int,
+                          search_filter: Optional[SearchFilter] = None) -> List[List[Tuple[int, float]]]:
+        """
+        One FAISS matrix search, returning (position, cosine distance) hits per query.
+        
+        Filtered searches only visit matching chunks: small selections (and
+        any selection on a flat index) are scanned exactly, so they get faster
+        as the filter narrows; larger ones go through the ANN index with an ID
+        selector.
+        """
+        store = self.vector_store
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if store._normalize_L2:
+            faiss.normalize_L2(vectors)
+        if search_filter is None:
+            scores, positions = store.index.search(vectors, k)
+        else:
+            allowed = self._filtered_positions(search_filter)
+            if not len(allowed):
+                return [[] for _ in range(len(vectors))]
+            if self.index_type == "flat" or len(allowed) <= FILTER_EXACT_MAX:
+                scores, positions = search_subset(store.index, vectors, allowed, k)
+            else:
+                scores, positions = store.index.search(vectors, k, params=selector_search_params(store.index, allowed))
+                # Graph/cluster traversal can run out of matching neighbours; scan exactly instead
+                if (positions[:, :min(k, len(allowed))] == -1).any():
+                    scores, positions = search_subset(store.index, vectors, allowed, k)
+        # -1 marks empty slots when the index holds fewer than k vectors
+        return [[(int(position), to_cosine_distance(store, float(score)))
+                 for score, position in zip(row_scores, row_positions) if position != -1]
+                for row_scores, row_positions in zip(scores, positions)]
+    
+    def _document_at(self, position: int) -> Any:
+        store = self.vector_store
+        return store.docstore.search(store.index_to_docstore_id[position])
+    
+    def similarity_search_with_vectors(self, embedding: List[float], k: int = 3,
+                                       search_filter: Optional[SearchFilter] = None) -> List[Tuple[Any, float, List[float]]]:
+        """Search in FAISS store, reconstructing the stored vector of each hit."""
+        hits = self._search_positions([embedding], k, search_filter)[0]
+        vectors = reconstruct_positions(self.vector_store.index, [position for position, _ in hits])
+        return [(self._document_at(position), score, vector)
+                for (position, score), vector in zip(hits, vectors)]
+    
+    def batch_similarity_search(self, queries: List[str], k: int = 3,
+                                search_filter: Optional[SearchFilter] = None) -> List[List[Tuple[Any, float]]]:
+        """Search several queries with one batched embedding call and one FAISS matrix search."""
+        if not queries:
+            return []
+        results = self._search_positions(self.embeddings.embed_queries(queries), k, search_filter)
+        return [[(self._document_at(position), score) for position, score in hits] for hits in results]
+    
+    def get_documents(self, ids: List[str]) -> List[Any]:
+        """Fetch documents from the local docstore."""
+        docs = [self.vector_store.docstore.search(doc_id) for doc_id in ids]
+        return [doc for doc in docs if not isinstance(doc, str)]
     
     def delete(self, ids: Optional[List[str]] = None) -> bool:
-        """Delete is not directly supported in FAISS, return False."""
-        logger.warning("Delete operation not supported for local FAISS storage")
-        return False
+        """Delete vectors by id, or everything when no ids are given."""
+        try:
+            make_writable(self.vector_store)
+            if self.sparse_index is not None:
+                if ids:
+                    self.sparse_index.delete(ids)
+                else:
+                    self.sparse_index.clear()
+            if ids and self.index_type == "flat":
+                # Flat indexes compact positions on removal, matching langchain's bookkeeping
+                self.vector_store.delete(ids)
+            elif ids:
+                self._delete_by_rebuild(ids)
+            else:
+                self.vector_store.index.reset()
+                self.vector_store.docstore = CompactDocstore()
+                self.vector_store.index_to_docstore_id = {}
+            self._mark_changed()
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting from local FAISS store: {str(e)}")
+            return False
+    
+    def _delete_by_rebuild(self, ids: List[str]) -> None:
+        """
+        Delete from indexes that cannot remove in place (HNSW) or that keep
+        sparse ids after removal (IVF) by rebuilding from the remaining vectors.
+        """
+        store = self.vector_store
+        to_delete = set(ids)
+        remaining = [(position, doc_id) for position, doc_id in sorted(store.index_to_docstore_id.items())
+                     if doc_id not in to_delete]
+        
+        store.index = rebuild_index(store.index, self.index_type, self.index_params,
+                                    keep=[position for position, _ in remaining])
+        store.docstore.delete(list(to_delete))
+        store.index_to_docstore_id = {i: doc_id for i, (_, doc_id) in enumerate(remaining)}
     
     def save_local(self, path: str):
-        """Save FAISS index locally."""
-        self.vector_store.save_local(path)
+        """Save FAISS index locally as a raw index file plus a SQLite chunk table."""
+        save_faiss_store(self.vector_store, path)
     
     @classmethod
-    def load_local(cls, path: str, embeddings):
-        """Load FAISS index from local path."""
-        vector_store = FAISS.load_local(path, embeddings)
+    def load_local(cls, path: str, embeddings, mmap: bool = True, index_params: Optional[IndexParams] = None):
+        """
+        Load FAISS index from local path.
+        
+        Indexes written by save_local are memory-mapped and their chunks are read
+        lazily; older pickle-based saves are still loaded through langchain.
+        index_params governs later adds and deletes (by default only the metric
+        is taken from the saved index).
+        """
+        embeddings = ensure_batched(embeddings)
+        if is_mmap_format(path):
+            vector_store = load_faiss_store(path, embeddings, mmap=mmap)
+        else:
+            vector_store = FAISS.load_local(path, embeddings)
         # Create wrapper instance
         instance = cls.__new__(cls)
         instance.embeddings = embeddings
         instance.vector_store = vector_store
+        instance._sparse_lock = threading.Lock()
+        instance._sparse_index = None
+        instance._sparse_index_pending = True  # Rebuilt from the docstore when keyword search first needs it
+        instance.query_cache = QueryCache(ttl_seconds=LOCAL_QUERY_CACHE_TTL)
+        instance.version = 0
+        instance._postings = None
+        instance._postings_version = -1
+        instance.index_params = index_params or IndexParams(
+            metric="cosine" if vector_store.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT else "l2")
         instance.store_type = "local"
         return instance
 
 class PineconeStore(VectorStore):
-    """Pinecone vector store wrapper."""
+    """
+    Pinecone vector store wrapper. All reads and writes are confined to one
+    namespace (per session, user or course; see pinecone_namespaces), so a
+    query only searches the caller's documents.
+    """
     
-    def __init__(self, embeddings):
+    def __init__(self, embeddings, namespace: Optional[str] = None):
         if not PINECONE_AVAILABLE:
             raise ImportError("Pinecone is not available. Please install pinecone-client.")
         
-        self.embeddings = embeddings
+        self.embeddings = ensure_batched(embeddings)
         self.pinecone_config = get_pinecone_config()
         self.index = self.pinecone_config.get_index()
         self.store_type = "pinecone"
-        self.namespace = "default"  # You can customize this per session/user
+        self.namespace = namespace or DEFAULT_NAMESPACE
+        self.namespaces = get_namespace_manager()
+        self.namespaces.create(self.namespace)
+        # Keep the namespace from being expired while this store is alive
+        self.namespaces.hold(self.namespace)
+        weakref.finalize(self, self.namespaces.release, self.namespace)
+        self.sparse_index = BM25Index()  # Covers the chunks this process uploaded
+        # Shorter TTL: the shared index can also change outside this process
+        self.query_cache = QueryCache(ttl_seconds=PINECONE_QUERY_CACHE_TTL)
     
     def add_texts(self, texts: List[str], metadatas: Optional[List[Dict]] = None) -> List[str]:
-        """Add texts to Pinecone index with batch processing."""
+        """
+        Add texts to the Pinecone index. Embedding and upserting are pipelined:
+        requests for one slice of texts are sent while the next is embedded.
+        
+        Vector ids are derived from the chunk's source (file hash, page, offset)
+        and text, so re-adding a document overwrites rather than duplicates it,
+        and chunks already in the namespace are not embedded or sent again.
+        If the same content was stored under another file name, the file name
+        and path are updated; skipped chunks keep their original upload batch.
+        """
         try:
-            # Generate embeddings for all texts
-            embeddings = self.embeddings.embed_documents(texts)
+            metadatas = [metadatas[i] if metadatas and i < len(metadatas) else {} for i in range(len(texts))]
+            ids = [chunk_vector_id(text, metadata) for text, metadata in zip(texts, metadatas)]
             
-            # Prepare vectors for upsert
-            vectors = []
-            ids = []
+            existing = find_existing_ids(self.index, ids, self.namespace)
+            # Upload each new id once, even if a chunk repeats within this call
+            pending = {}
+            for i, vector_id in enumerate(ids):
+                if vector_id not in existing and vector_id not in pending:
+                    pending[vector_id] = i
+            if existing:
+                logger.info(f"Skipping {len(texts) - len(pending)} chunks already in namespace '{self.namespace}'")
+                # Same content, but possibly under a new file name
+                stored = {}
+                for vector_id, metadata in zip(ids, metadatas):
+                    if vector_id in existing:
+                        stored.setdefault(vector_id, metadata)
+                refresh_metadata(self.index, stored, self.namespace)
             
-            for i, (text, embedding) in enumerate(zip(texts, embeddings)):
-                vector_id = str(uuid.uuid4())
-                ids.append(vector_id)
-                
-                metadata = metadatas[i] if metadatas and i < len(metadatas) else {}
-                
-                # Limit text size in metadata to avoid Pinecone size limits
-                # Pinecone has a 4MB limit per request, so limit text to reasonable size
-                max_text_length = 1000  # Limit to 1KB per text in metadata
-                text_for_metadata = text[:max_text_length] if len(text) > max_text_length else text
-                metadata['text'] = text_for_metadata
-                
-                vectors.append({
-                    'id': vector_id,
-                    'values': embedding,
-                    'metadata': metadata
-                })
-            
-            # Process in batches to avoid size limits
-            batch_size = 100  # Process 100 vectors at a time
-            total_batches = (len(vectors) + batch_size - 1) // batch_size
+            positions = list(pending.values())
             
-            for i in range(0, len(vectors), batch_size):
-                batch = vectors[i:i + batch_size]
-                batch_num = (i // batch_size) + 1
-                
-                logger.info(f"Uploading batch {batch_num}/{total_batches} ({len(batch)} vectors)")
-                
-                # Upsert batch to Pinecone
-                self.index.upsert(vectors=batch, namespace=self.namespace)
+            def make_metadata(i: int, text: str) -> Dict:
+                # Copy so the caller's metadata dicts are not modified
+                metadata = dict(metadatas[positions[i]])
+                # Limit text size in metadata to avoid Pinecone size limits
+                metadata['text'] = text[:PINECONE_METADATA_TEXT_CHARS]
+                return metadata
             
-            logger.info(f"Successfully added {len(vectors)} vectors to Pinecone in {total_batches} batches")
+            if positions:
+                uploader = PipelinedUploader(self.index, self.namespace)
+                uploader.upload([texts[i] for i in positions], list(pending), self.embeddings.embed_documents,
+                                make_metadata)
             
+            self.sparse_index.add(ids, texts)
+            self.namespaces.touch(self.namespace)
+            self._mark_changed()
             return ids
             
         except Exception as e:
             logger.error(f"Error adding texts to Pinecone: {str(e)}")
             raise
     
-    def similarity_search_with_score(self, query: str, k: int = 3) -> List[Tuple[Any, float]]:
+    def similarity_search_with_score(self, query: str, k: int = 3,
+                                     search_filter: Optional[SearchFilter] = None) -> List[Tuple[Any, float]]:
         """Search in Pinecone index."""
+        return self.similarity_search_by_vector_with_score(self.embeddings.embed_query(query), k, search_filter)
+    
+    def similarity_search_by_vector_with_score(self, query_embedding: List[float], k: int = 3,
+                                               search_filter: Optional[SearchFilter] = None) -> List[Tuple[Any, float]]:
+        """Search in Pinecone index with a precomputed query embedding."""
+        return [(doc, score) for doc, score, _ in self._query(query_embedding, k, False, search_filter)]
+    
+    def similarity_search_with_vectors(self, embedding: List[float], k: int = 3,
+                                       search_filter: Optional[SearchFilter] = None) -> List[Tuple[Any, float, List[float]]]:
+        """Search in Pinecone index, returning each match's stored values."""
+        return self._query(embedding, k, True, search_filter)
+    
+    def _query(self, query_embedding: List[float], k: int, include_values: bool,
+               search_filter: Optional[SearchFilter] = None) -> List[Tuple[Any, float, Optional[List[float]]]]:
         try:
-            # Generate query embedding
-            query_embedding = self.embeddings.embed_query(query)
-            
-            # Search in Pinecone
+            # Search in Pinecone; metadata filters are applied inside the index
             results = self.index.query(
                 vector=query_embedding,
                 top_k=k,
                 include_metadata=True,
+                include_values=include_values,
+                filter=search_filter.to_pinecone() if search_filter else None,
                 namespace=self.namespace
             )
+            self.namespaces.touch(self.namespace)
             
             # Convert results to the expected format
             formatted_results = []
             for match in results['matches']:
                 # Create a document-like object
-                doc = type('Document', (), {
-                    'page_content': match['metadata'].get('text', ''),
-                    'metadata': {k: v for k, v in match['metadata'].items() if k != 'text'}
-                })()
+                doc = self._to_document(match['id'], match['metadata'])
                 
                 # Pinecone returns similarity scores (higher = more similar)
                 # Convert to distance-like score (lower = more similar) for consistency
                 distance_score = 1.0 - match['score']
-                formatted_results.append((doc, distance_score))
+                values = match['values'] if include_values else None
+                formatted_results.append((doc, distance_score, values))
             
             return formatted_results
             
@@ -175,16 +543,53 @@ class PineconeStore(VectorStore):
             logger.error(f"Error searching in Pinecone: {str(e)}")
             raise
     
+    def batch_similarity_search(self, queries: List[str], k: int = 3,
+                                search_filter: Optional[SearchFilter] = None) -> List[List[Tuple[Any, float]]]:
+        """Embed all queries in one batch, then issue the Pinecone queries concurrently."""
+        if not queries:
+            return []
+        embeddings = self.embeddings.embed_queries(queries)
+        with ThreadPoolExecutor(max_workers=min(PINECONE_QUERY_CONCURRENCY, len(embeddings))) as executor:
+            # map preserves input order
+            return list(executor.map(
+                lambda embedding: self.similarity_search_by_vector_with_score(embedding, k, search_filter),
+                embeddings))
+    
+    @staticmethod
+    def _to_document(vector_id: str, metadata: Dict) -> Any:
+        """Create a document-like object from a Pinecone vector's metadata."""
+        return type('Document', (), {
+            'id': vector_id,
+            'page_content': metadata.get('text', ''),
+            'metadata': {k: v for k, v in metadata.items() if k != 'text'}
+        })()
+    
+    def get_documents(self, ids: List[str]) -> List[Any]:
+        """Fetch documents from Pinecone by vector id."""
+        docs = []
+        for i in range(0, len(ids), 100):
+            response = self.index.fetch(ids=ids[i:i + 100], namespace=self.namespace)
+            for vector_id, vector in response.vectors.items():
+                metadata = getattr(vector, 'metadata', None) or {}
+                docs.append(self._to_document(vector_id, metadata))
+        return docs
+    
     def delete(self, ids: Optional[List[str]] = None) -> bool:
         """Delete vectors from Pinecone."""
         try:
             if ids:
-                self.index.delete(ids=ids, namespace=self.namespace)
+                self.sparse_index.delete(ids)
+                # Pinecone accepts at most 1000 ids per delete call
+                for i in range(0, len(ids), 1000):
+                    self.index.delete(ids=ids[i:i + 1000], namespace=self.namespace)
             else:
-                # Delete all vectors in namespace
+                # Delete all vectors in this store's namespace only
+                self.sparse_index.clear()
                 self.index.delete(delete_all=True, namespace=self.namespace)
+                self.namespaces.forget(self.namespace)
             
-            logger.info(f"Deleted vectors from Pinecone")
+            logger.info(f"Deleted vectors from Pinecone namespace '{self.namespace}'")
+            self._mark_changed()
             return True
             
         except Exception as e:
@@ -197,9 +602,10 @@ class HybridVectorStore:
     based on document size and complexity.
     """
     
-    def __init__(self, embeddings, embedding_dim: int = 1024):
+    def __init__(self, embeddings, embedding_dim: int = 1024, namespace: Optional[str] = None):
         self.embeddings = embeddings
         self.embedding_dim = embedding_dim
+        self.namespace = namespace  # Pinecone namespace, if Pinecone is chosen
         self.store = None
         self.store_type = None
         
@@ -227,6 +633,10 @@ class HybridVectorStore:
         logger.info(f"Document analysis: {size_mb:.2f}MB, {total_pages} pages")
         logger.info(f"Storage decision: {'Pinecone' if use_pinecone else 'Local FAISS'}")
         
+        if use_pinecone and PINECONE_AVAILABLE and get_pinecone_config().healthy is False:
+            # Known to be down: do not make the request wait on a failing index
+            logger.warning("Pinecone is failing health checks, using local storage")
+            return False
         return use_pinecone and PINECONE_AVAILABLE
     
     def create_store(self, texts_with_metadata: List[Tuple[str, Dict]]) -> VectorStore:
@@ -243,10 +653,26 @@ class HybridVectorStore:
         total_text_size = sum(len(text.encode('utf-8')) for text, _ in texts_with_metadata)
         total_pages = len(set(metadata.get('page_index', 0) for _, metadata in texts_with_metadata))
         
+        return self.create_store_for_size(total_text_size, total_pages)
+    
+    def create_store_for_size(self, total_text_size: int, total_pages: int) -> VectorStore:
+        """
+        Create appropriate vector store from precomputed (or estimated) document size.
+        
+        Used by streaming ingestion, which has to pick a store before any text
+        has been extracted.
+        
+        Args:
+            total_text_size: Total size of text in bytes
+            total_pages: Total number of pages
+            
+        Returns:
+            VectorStore instance
+        """
         # Decide storage type
         if self.should_use_pinecone(total_text_size, total_pages):
             try:
-                self.store = PineconeStore(self.embeddings)
+                self.store = PineconeStore(self.embeddings, self.namespace)
                 self.store_type = "pinecone"
                 logger.info("Using Pinecone vector store")
             except Exception as e:
@@ -260,6 +686,13 @@ class HybridVectorStore:
         
         return self.store
     
+    def batch_similarity_search(self, queries: List[str], k: int = 3,
+                                search_filter: Optional[SearchFilter] = None) -> List[List[Tuple[Any, float]]]:
+        """Batched search against the current vector store."""
+        if not self.store:
+            raise ValueError("No vector store created yet")
+        return self.store.batch_similarity_search(queries, k, search_filter)
+    
     def get_store(self) -> Optional[VectorStore]:
         """Get the current vector store."""
         return self.store
@@ -269,7 +702,7 @@ class HybridVectorStore:
         return self.store_type
     
     def clear_store(self) -> bool:
-        """Clear the current vector store."""
+        """Clear the current vector store (for Pinecone, only its namespace)."""
         if self.store:
             return self.store.delete()
         return False
\ No newline at end of file
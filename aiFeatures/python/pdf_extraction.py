@@ -0,0 +1,322 @@
+import os
+import sqlite3
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional, Tuple
+from pypdf import PdfReader
+from embedding_cache import get_cache_dir
+
+# Try to import PyMuPDF (C-backed extraction; pypdf is used without it)
+try:
+    import fitz
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+# Pillow is only needed to hand page images to OCR
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+PDF_BACKEND = os.environ.get("PDF_BACKEND", "pypdf")
+PAGE_CACHE_ENABLED = os.environ.get("PDF_PAGE_CACHE_ENABLED", "true").lower() == "true"
+
+def file_sha256(path: str, block_size: int = 1024 * 1024) -> str:
+    """Content hash of a file, read in blocks so large PDFs are not loaded at once."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class PdfDocument(ABC):
+    """An open PDF as seen by an extraction backend."""
+
+    @property
+    @abstractmethod
+    def page_count(self) -> int:
+        pass
+
+    @abstractmethod
+    def extract_page(self, page_index: int) -> str:
+        """Text of one page ("" if it has none)."""
+        pass
+
+    def render_page(self, page_index: int, dpi: int = 200) -> Optional["Image.Image"]:
+        """Image of one page for OCR, or None if the backend cannot produce one."""
+        return None
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "PdfDocument":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class PypdfDocument(PdfDocument):
+    """Pure-Python extraction with pypdf (the default)."""
+
+    def __init__(self, pdf_path: str):
+        self._reader = PdfReader(pdf_path)
+        self._page_count = len(self._reader.pages)
+
+    @property
+    def page_count(self) -> int:
+        return self._page_count
+
+    def extract_page(self, page_index: int) -> str:
+        return self._reader.pages[page_index].extract_text() or ""
+
+    def render_page(self, page_index: int, dpi: int = 200) -> Optional["Image.Image"]:
+        # pypdf cannot rasterize; scanned pages are a single embedded image, so use the largest one
+        images = [image.image for image in self._reader.pages[page_index].images if image.image is not None]
+        if not images:
+            return None
+        return max(images, key=lambda image: image.width * image.height)
+
+class PyMuPDFDocument(PdfDocument):
+    """
+    C-backed extraction with PyMuPDF, typically several times faster than
+    pypdf. Text blocks are sorted into reading order, so multi-column slides
+    and textbooks come out line by line rather than interleaved.
+    """
+
+    def __init__(self, pdf_path: str):
+        self._doc = fitz.open(pdf_path)
+
+    @property
+    def page_count(self) -> int:
+        return self._doc.page_count
+
+    def extract_page(self, page_index: int) -> str:
+        return self._doc.load_page(page_index).get_text("text", sort=True)
+
+    def render_page(self, page_index: int, dpi: int = 200) -> Optional["Image.Image"]:
+        if not PIL_AVAILABLE:
+            return None
+        pixmap = self._doc.load_page(page_index).get_pixmap(dpi=dpi)
+        return Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+
+    def close(self) -> None:
+        self._doc.close()
+
+# Backend name -> document class
+PDF_BACKENDS = {
+    "pypdf": PypdfDocument,
+}
+if PYMUPDF_AVAILABLE:
+    PDF_BACKENDS["pymupdf"] = PyMuPDFDocument
+
+def get_pdf_backend(name: Optional[str] = None) -> str:
+    """Resolve a backend name (default PDF_BACKEND), falling back to pypdf if unavailable."""
+    name = (name or PDF_BACKEND).lower()
+    if name not in PDF_BACKENDS:
+        logger.warning(f"PDF backend '{name}' not available, using pypdf")
+        return "pypdf"
+    return name
+
+def open_pdf(pdf_path: str, backend: Optional[str] = None) -> PdfDocument:
+    """Open a PDF with the given extraction backend."""
+    return PDF_BACKENDS[get_pdf_backend(backend)](pdf_path)
+
+class PageTextCache:
+    """
+    On-disk cache of extracted page text, keyed by (file hash, backend, page
+    index). The page count of each file is stored too, so a fully cached PDF
+    is never opened again. Pages without text are cached as empty strings.
+    OCR output is kept separately, keyed by a hash of the page image, so the
+    same scan is recognized once even under another file name.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(get_cache_dir(), "page_text.sqlite3")
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        # Extraction workers in other processes share the file
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "file_hash TEXT NOT NULL, backend TEXT NOT NULL, page_index INTEGER NOT NULL, text TEXT NOT NULL, "
+            "PRIMARY KEY (file_hash, backend, page_index))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "file_hash TEXT NOT NULL, backend TEXT NOT NULL, page_count INTEGER NOT NULL, "
+            "PRIMARY KEY (file_hash, backend))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_pages ("
+            "page_hash TEXT NOT NULL, lang TEXT NOT NULL, text TEXT NOT NULL, "
+            "PRIMARY KEY (page_hash, lang))"
+        )
+        self._conn.commit()
+
+    def get_page_count(self, file_hash: str, backend: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute("SELECT page_count FROM files WHERE file_hash = ? AND backend = ?",
+                                     (file_hash, backend)).fetchone()
+        return row[0] if row else None
+
+    def get_pages(self, file_hash: str, backend: str, start: int, end: int) -> Dict[int, str]:
+        """Cached text of pages [start, end), by page index."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT page_index, text FROM pages WHERE file_hash = ? AND backend = ? "
+                "AND page_index >= ? AND page_index < ?", (file_hash, backend, start, end)).fetchall()
+        pages = dict(rows)
+        self.hits += len(pages)
+        self.misses += (end - start) - len(pages)
+        return pages
+
+    def put_pages(self, file_hash: str, backend: str, page_count: int, pages: Dict[int, str]) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO files (file_hash, backend, page_count) VALUES (?, ?, ?)",
+                               (file_hash, backend, page_count))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pages (file_hash, backend, page_index, text) VALUES (?, ?, ?, ?)",
+                [(file_hash, backend, page_index, text) for page_index, text in pages.items()])
+            self._conn.commit()
+
+    def get_ocr_text(self, page_hash: str, lang: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM ocr_pages WHERE page_hash = ? AND lang = ?",
+                                     (page_hash, lang)).fetchone()
+        return row[0] if row else None
+
+    def put_ocr_text(self, page_hash: str, lang: str, text: str) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO ocr_pages (page_hash, lang, text) VALUES (?, ?, ?)",
+                               (page_hash, lang, text))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM pages")
+            self._conn.execute("DELETE FROM files")
+            self._conn.execute("DELETE FROM ocr_pages")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+# Global instance (one per process, created on first use)
+_page_cache: Optional[PageTextCache] = None
+_page_cache_pid: Optional[int] = None
+
+def get_page_cache() -> Optional[PageTextCache]:
+    """Get the process-wide page text cache, or None if disabled."""
+    global _page_cache, _page_cache_pid
+    if not PAGE_CACHE_ENABLED:
+        return None
+    # SQLite connections must not cross fork() into extraction workers
+    if _page_cache is None or _page_cache_pid != os.getpid():
+        try:
+            _page_cache = PageTextCache()
+            _page_cache_pid = os.getpid()
+        except Exception as e:
+            logger.warning(f"Page text cache unavailable, extracting without it: {str(e)}")
+            return None
+    return _page_cache
+
+def count_pages(pdf_path: str, file_hash: Optional[str] = None, backend: Optional[str] = None) -> int:
+    """Page count of a PDF, from the cache when the file has been extracted before."""
+    backend = get_pdf_backend(backend)
+    cache = get_page_cache()
+    if cache is not None and file_hash is not None:
+        page_count = cache.get_page_count(file_hash, backend)
+        if page_count is not None:
+            return page_count
+    with open_pdf(pdf_path, backend) as doc:
+        return doc.page_count
+
+def extract_pages(pdf_path: str, start: int = 0, end: Optional[int] = None, file_hash: Optional[str] = None,
+                  backend: Optional[str] = None) -> Tuple[List[Tuple[int, str]], int]:
+    """
+    Extract the text of pages [start, end) of a PDF, serving cached pages
+    without opening the file.
+
+    Args:
+        pdf_path: Path to the PDF file
+        start: Index of the first page
+        end: Index one past the last page (None for the last page)
+        file_hash: Content hash of the file if already known (computed otherwise)
+        backend: Extraction backend name (defaults to PDF_BACKEND)
+
+    Returns:
+        Tuple of ((page index, text) list in page order, total page count)
+    """
+    backend = get_pdf_backend(backend)
+    cache = get_page_cache()
+    if cache is None:
+        with open_pdf(pdf_path, backend) as doc:
+            total_pages = doc.page_count
+            end = total_pages if end is None else min(end, total_pages)
+            return [(i, doc.extract_page(i)) for i in range(start, end)], total_pages
+
+    file_hash = file_hash or file_sha256(pdf_path)
+    total_pages = cache.get_page_count(file_hash, backend)
+    pages: Dict[int, str] = {}
+    if total_pages is not None:
+        end = total_pages if end is None else min(end, total_pages)
+        pages = cache.get_pages(file_hash, backend, start, end)
+
+    if total_pages is None or len(pages) < end - start:
+        with open_pdf(pdf_path, backend) as doc:
+            total_pages = doc.page_count
+            end = total_pages if end is None else min(end, total_pages)
+            extracted = {i: doc.extract_page(i) for i in range(start, end) if i not in pages}
+        cache.put_pages(file_hash, backend, total_pages, extracted)
+        pages.update(extracted)
+
+    return sorted(pages.items()), total_pages
+
+def iter_pages(pdf_path: str, file_hash: Optional[str] = None, backend: Optional[str] = None,
+               pages_per_read: int = 16) -> Iterator[Tuple[int, str, int]]:
+    """
+    Yield (page index, text, total pages) for every page of a PDF. The file is
+    opened at most once, and only if some page is missing from the cache.
+    """
+    backend = get_pdf_backend(backend)
+    cache = get_page_cache()
+    if cache is None:
+        with open_pdf(pdf_path, backend) as doc:
+            total_pages = doc.page_count
+            for page_index in range(total_pages):
+                yield page_index, doc.extract_page(page_index), total_pages
+        return
+
+    file_hash = file_hash or file_sha256(pdf_path)
+    total_pages = cache.get_page_count(file_hash, backend)
+    doc = None
+    try:
+        if total_pages is None:
+            doc = open_pdf(pdf_path, backend)
+            total_pages = doc.page_count
+        for start in range(0, total_pages, pages_per_read):
+            end = min(start + pages_per_read, total_pages)
+            pages = cache.get_pages(file_hash, backend, start, end)
+            missing = [i for i in range(start, end) if i not in pages]
+            if missing:
+                if doc is None:
+                    doc = open_pdf(pdf_path, backend)
+                extracted = {i: doc.extract_page(i) for i in missing}
+                cache.put_pages(file_hash, backend, total_pages, extracted)
+                pages.update(extracted)
+            for page_index in range(start, end):
+                yield page_index, pages[page_index], total_pages
+    finally:
+        if doc is not None:
+            doc.close()
@@ -0,0 +1,180 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, Iterable, Optional, Tuple
+from pdf_extraction import PdfDocument, open_pdf, get_page_cache
+
+# Try to import pytesseract; without it textless pages are skipped as before
+try:
+    import pytesseract
+    TESSERACT_AVAILABLE = True
+except ImportError:
+    TESSERACT_AVAILABLE = False
+    pytesseract = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+OCR_ENABLED = os.environ.get("PDF_OCR_ENABLED", "true").lower() == "true"
+# Tesseract processes running at once; OCR is CPU-bound, so keep this below the core count
+OCR_WORKERS = int(os.environ.get("PDF_OCR_WORKERS", "2"))
+# Wall-clock seconds one document may spend on OCR before its remaining pages are skipped
+OCR_BUDGET_SECONDS = float(os.environ.get("PDF_OCR_BUDGET_SECONDS", "60"))
+# Hard limit for a single Tesseract call (also bounds pages already running when the budget ends)
+OCR_PAGE_TIMEOUT = float(os.environ.get("PDF_OCR_PAGE_TIMEOUT", "30"))
+OCR_DPI = int(os.environ.get("PDF_OCR_DPI", "200"))
+OCR_LANG = os.environ.get("PDF_OCR_LANG", "eng")
+
+# Worker-side handle on the last PDF opened, so a document's pages do not reparse it each time
+_worker_doc: Optional[Tuple[Tuple[str, float], PdfDocument]] = None
+
+def _open_in_worker(pdf_path: str) -> PdfDocument:
+    global _worker_doc
+    key = (pdf_path, os.path.getmtime(pdf_path))
+    if _worker_doc is None or _worker_doc[0] != key:
+        if _worker_doc is not None:
+            _worker_doc[1].close()
+        _worker_doc = (key, open_pdf(pdf_path))
+    return _worker_doc[1]
+
+def _ocr_page(pdf_path: str, page_index: int, dpi: int = OCR_DPI, lang: str = OCR_LANG) -> str:
+    """
+    Rasterize one page and run Tesseract on it, using the OCR cache keyed by
+    the hash of the page image. Top-level so it can run in worker processes.
+    """
+    image = _open_in_worker(pdf_path).render_page(page_index, dpi)
+    if image is None:
+        return ""
+
+    page_hash = hashlib.sha256(f"{image.mode}{image.size}".encode("utf-8") + image.tobytes()).hexdigest()
+    cache = get_page_cache()
+    if cache is not None:
+        cached = cache.get_ocr_text(page_hash, lang)
+        if cached is not None:
+            return cached
+
+    try:
+        text = pytesseract.image_to_string(image, lang=lang, timeout=OCR_PAGE_TIMEOUT)
+    except RuntimeError as e:
+        # pytesseract signals its timeout with RuntimeError; do not cache, a later run may finish
+        logger.warning(f"OCR timed out on page {page_index + 1} of {os.path.basename(pdf_path)}: {str(e)}")
+        return ""
+    if cache is not None:
+        cache.put_ocr_text(page_hash, lang, text)
+    return text
+
+class OcrFallback:
+    """
+    Runs OCR for pages without extractable text in a bounded process pool.
+
+    Pages are submitted as soon as they are found to be empty, so recognition
+    overlaps with extraction of the rest of the document. Each document has a
+    time budget measured from its first submitted page; pages not finished by
+    then are cancelled and left out of the index.
+    """
+
+    def __init__(self, max_workers: int = OCR_WORKERS, budget_seconds: float = OCR_BUDGET_SECONDS):
+        self.max_workers = max_workers
+        self.budget_seconds = budget_seconds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._binary_found: Optional[bool] = None
+
+    @property
+    def available(self) -> bool:
+        if not (OCR_ENABLED and TESSERACT_AVAILABLE):
+            return False
+        if self._binary_found is None:
+            # pytesseract imports fine without the tesseract executable; check once
+            try:
+                pytesseract.get_tesseract_version()
+                self._binary_found = True
+            except Exception as e:
+                logger.warning(f"Tesseract not usable, OCR fallback disabled: {str(e)}")
+                self._binary_found = False
+        return self._binary_found
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def submit(self, pdf_path: str, page_index: int) -> Optional[Future]:
+        """Queue OCR of one page; None if OCR is unavailable."""
+        if not self.available:
+            return None
+        return self._get_executor().submit(_ocr_page, pdf_path, page_index)
+
+    def deadline(self) -> float:
+        """Monotonic deadline for a document whose OCR starts now."""
+        return time.monotonic() + self.budget_seconds
+
+    def result(self, pdf_path: str, page_index: int, future: Future, deadline: float) -> Optional[str]:
+        """
+        Wait for one submitted page until the deadline.
+
+        Returns:
+            Recognized text ("" if recognition failed), or None if the deadline
+            passed first, in which case the page is cancelled
+        """
+        try:
+            return future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeoutError:
+            future.cancel()
+            return None
+        except Exception as e:
+            logger.error(f"OCR failed on page {page_index + 1} of {os.path.basename(pdf_path)}: {str(e)}")
+            return ""
+
+    def log_summary(self, pdf_path: str, submitted: int, recovered: int, skipped: int) -> None:
+        if skipped:
+            logger.warning(f"OCR budget of {self.budget_seconds:.0f}s exhausted for {os.path.basename(pdf_path)}, "
+                           f"skipped {skipped} of {submitted} pages")
+        logger.info(f"OCR recovered text on {recovered} of {submitted} pages of {os.path.basename(pdf_path)}")
+
+    def collect(self, pdf_path: str, futures: Dict[int, Future], deadline: float) -> Dict[int, str]:
+        """
+        Wait for submitted pages until the deadline.
+
+        Returns:
+            Recognized text by page index; pages that failed, timed out or
+            produced only whitespace are omitted
+        """
+        texts: Dict[int, str] = {}
+        skipped = 0
+        for page_index, future in sorted(futures.items()):
+            text = self.result(pdf_path, page_index, future, deadline)
+            if text is None:
+                skipped += 1
+            elif text.strip():
+                texts[page_index] = text
+        self.log_summary(pdf_path, len(futures), len(texts), skipped)
+        return texts
+
+    def ocr_pages(self, pdf_path: str, page_indices: Iterable[int]) -> Dict[int, str]:
+        """OCR the given pages of one document within its time budget."""
+        if not self.available:
+            return {}
+        deadline = self.deadline()
+        futures = {page_index: self.submit(pdf_path, page_index) for page_index in page_indices}
+        if not futures:
+            return {}
+        return self.collect(pdf_path, futures, deadline)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+# Global instance
+ocr_fallback = OcrFallback()
+
+def get_ocr_fallback() -> OcrFallback:
+    """Get the global OCR fallback instance."""
+    return ocr_fallback
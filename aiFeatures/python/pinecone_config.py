@@ -1,8 +1,11 @@
 import os
+import time
 import logging
+import threading
 from typing import Optional, Dict, Any
 from pinecone import Pinecone, ServerlessSpec
 from dotenv import load_dotenv
+from embedding_models import DEFAULT_EMBEDDING_MODEL, get_embedding_dimension
 
 # Load environment variables
 load_dotenv()
@@ -10,8 +13,26 @@ load_dotenv()
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# One pooled client is shared by all requests; size it for concurrent queries and upserts
+POOL_THREADS = int(os.environ.get("PINECONE_POOL_THREADS", "8"))
+CONNECTION_POOL_MAXSIZE = int(os.environ.get("PINECONE_CONNECTION_POOL_MAXSIZE", "16"))
+# Seconds between background health checks, which also keep pooled connections alive
+HEALTH_CHECK_INTERVAL = float(os.environ.get("PINECONE_HEALTH_CHECK_INTERVAL", "30"))
+
+class PineconeNotReady(Exception):
+    """The index is not connected yet; callers should fall back to local storage."""
+    pass
+
 class PineconeConfig:
-    """Configuration and management class for Pinecone vector database."""
+    """
+    Configuration and management class for Pinecone vector database.
+    
+    Connecting is split in two: opening an index handle from the configured
+    host is local and cheap, while verifying it and discovering or creating
+    the index by name needs several API calls. Request paths only ever do the
+    former (get_index); the latter runs in warmup() at startup and in the
+    background health checker, which reuses the same pooled client.
+    """
     
     def __init__(self):
         self.api_key = os.environ.get("PINECONE_API_KEY")
@@ -31,8 +52,10 @@ class PineconeConfig:
         if not self.host:
             self.host = "https://ai-tutor-x-cgn8neb.svc.aped-4627-b74a.pinecone.io"
             
+        # Control-plane host override, for Pinecone Local or a test server
+        self.controller_host = os.environ.get("PINECONE_CONTROLLER_HOST")
         self.index_name = os.environ.get("PINECONE_INDEX_NAME", "ai-tutor-documents")
-        self.dimension = 1024  # Dimension for mxbai-embed-large model
+        self.embedding_model = DEFAULT_EMBEDDING_MODEL
         self.metric = "cosine"  # Similarity metric
         self.cloud = "aws"  # Cloud provider
         self.region = "us-east-1"  # Region for serverless
@@ -40,68 +63,173 @@ class PineconeConfig:
         self.pc = None
         self.index = None
         
+        # Health as seen by the last check (None until one has run)
+        self.healthy: Optional[bool] = None
+        self.last_health_check: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._background: Optional[threading.Thread] = None
+    
+    @property
+    def dimension(self) -> int:
+        """Index dimension, taken from the embedding model registry."""
+        return get_embedding_dimension(self.embedding_model)
+        
+    def _client(self) -> Pinecone:
+        """The shared Pinecone client, created once."""
+        if self.pc is None:
+            kwargs = {"api_key": self.api_key, "pool_threads": POOL_THREADS}
+            if self.controller_host:
+                kwargs["host"] = self.controller_host
+            self.pc = Pinecone(**kwargs)
+            logger.info("Pinecone client initialized successfully")
+        return self.pc
+    
+    def _open_index(self, host: str = "", name: str = ""):
+        """Index handle on the shared client; no request is made until it is used."""
+        client = self._client()
+        try:
+            return client.Index(name=name, host=host, pool_threads=POOL_THREADS,
+                                connection_pool_maxsize=CONNECTION_POOL_MAXSIZE)
+        except TypeError:
+            # Clients that size the pool from pool_threads alone reject the extra keyword
+            return client.Index(name=name, host=host, pool_threads=POOL_THREADS)
+    
+    def connect(self) -> bool:
+        """Open the index handle from the configured host without any network calls."""
+        if not self.api_key:
+            # Expected on local-only setups; stores fall back to FAISS
+            logger.debug("PINECONE_API_KEY environment variable not set")
+            return False
+        if not (self.host and self.host.startswith(("https://", "http://"))):
+            return False
+        with self._lock:
+            if self.index is None:
+                self.index = self._open_index(host=self.host)
+        return True
+    
+    def _discover_index(self):
+        """Find the index by name, creating it if needed (slow; never on a request path)."""
+        pc = self._client()
+        existing_indexes = pc.list_indexes().names()
+        logger.info(f"Available indexes: {existing_indexes}")
+        
+        if self.index_name not in existing_indexes:
+            logger.info(f"Creating new Pinecone index: {self.index_name}")
+            pc.create_index(
+                name=self.index_name,
+                dimension=self.dimension,
+                metric=self.metric,
+                spec=ServerlessSpec(
+                    cloud=self.cloud,
+                    region=self.region
+                )
+            )
+            logger.info(f"Index {self.index_name} created successfully")
+        else:
+            logger.info(f"Using existing Pinecone index: {self.index_name}")
+        
+        # Remember the resolved host so later connects skip discovery
+        self.host = pc.describe_index(self.index_name).host
+        if not self.host.startswith(("https://", "http://")):
+            self.host = f"https://{self.host}"
+        return self._open_index(host=self.host)
+    
+    def check_health(self) -> bool:
+        """Ping the index with describe_index_stats and record the outcome."""
+        index = self.index
+        if index is None:
+            return False
+        try:
+            index.describe_index_stats()
+            self.healthy, self.last_error = True, None
+        except Exception as e:
+            if self.healthy is not False:
+                logger.warning(f"Pinecone health check failed: {str(e)}")
+            self.healthy, self.last_error = False, str(e)
+        self.last_health_check = time.time()
+        return self.healthy
+    
     def initialize_pinecone(self) -> bool:
-        """Initialize Pinecone client and create/connect to index."""
+        """
+        Connect and verify the index, discovering (or creating) it by name if
+        the configured host does not answer. Blocking; runs at warmup, in the
+        health checker and in scripts.
+        """
         try:
-            if not self.api_key:
-                logger.error("PINECONE_API_KEY environment variable not set")
-                return False
-                
-            # Initialize Pinecone client
-            self.pc = Pinecone(api_key=self.api_key)
-            logger.info("Pinecone client initialized successfully")
-            
-            # Try to connect using host URL first
-            if self.host and self.host.startswith("https://"):
-                try:
-                    logger.info(f"Attempting to connect using host: {self.host}")
-                    self.index = self.pc.Index(host=self.host)
-                    
-                    # Test the connection
-                    stats = self.index.describe_index_stats()
-                    logger.info(f"Successfully connected to index via host. Stats: {stats}")
+            if self.connect():
+                logger.info(f"Attempting to connect using host: {self.host}")
+                if self.check_health():
+                    logger.info("Successfully connected to index via host")
                     return True
-                except Exception as host_error:
-                    logger.warning(f"Failed to connect via host URL: {host_error}")
-                    logger.info("Falling back to index name-based connection...")
-            
-            # Fallback: Check if index exists by name, create if not
-            existing_indexes = self.pc.list_indexes().names()
-            logger.info(f"Available indexes: {existing_indexes}")
-            
-            if self.index_name not in existing_indexes:
-                logger.info(f"Creating new Pinecone index: {self.index_name}")
-                self.pc.create_index(
-                    name=self.index_name,
-                    dimension=self.dimension,
-                    metric=self.metric,
-                    spec=ServerlessSpec(
-                        cloud=self.cloud,
-                        region=self.region
-                    )
-                )
-                logger.info(f"Index {self.index_name} created successfully")
-            else:
-                logger.info(f"Using existing Pinecone index: {self.index_name}")
-            
-            # Connect to the index by name
-            self.index = self.pc.Index(self.index_name)
-            
-            # Get index stats
-            stats = self.index.describe_index_stats()
-            logger.info(f"Index stats: {stats}")
+                logger.warning(f"Failed to connect via host URL: {self.last_error}")
+                logger.info("Falling back to index name-based connection...")
+            elif not self.api_key:
+                return False
             
-            return True
+            index = self._discover_index()
+            with self._lock:
+                self.index = index
+            return self.check_health()
             
         except Exception as e:
             logger.error(f"Failed to initialize Pinecone: {str(e)}")
+            self.healthy, self.last_error = False, str(e)
             return False
     
+    def _run_background(self) -> None:
+        started = time.perf_counter()
+        if self.initialize_pinecone():
+            logger.info(f"Pinecone warmed up in {time.perf_counter() - started:.2f}s")
+        while not self._stop.wait(HEALTH_CHECK_INTERVAL):
+            if not self.check_health():
+                # Reconnect, rediscovering the index if its host changed
+                self.initialize_pinecone()
+    
+    def warmup(self) -> None:
+        """
+        Connect in the background and keep checking the index afterwards, so
+        the first request finds a verified, already-open connection. Does
+        nothing without an API key (local-only setups).
+        """
+        if not self.api_key:
+            logger.debug("PINECONE_API_KEY not set, skipping Pinecone warmup")
+            return
+        with self._lock:
+            if self._background is not None and self._background.is_alive():
+                return
+            self._stop.clear()
+            self._background = threading.Thread(target=self._run_background, name="pinecone-health", daemon=True)
+            self._background.start()
+    
+    def stop(self) -> None:
+        """Stop the background health checker."""
+        self._stop.set()
+    
+    @property
+    def ready(self) -> bool:
+        """Whether request paths should use Pinecone (connected and not known to be failing)."""
+        return self.index is not None and self.healthy is not False
+    
+    def status(self) -> Dict[str, Any]:
+        """Connection and health summary."""
+        return {
+            "connected": self.index is not None,
+            "healthy": self.healthy,
+            "last_health_check": self.last_health_check,
+            "last_error": self.last_error,
+        }
+    
     def get_index(self):
-        """Get the Pinecone index instance."""
-        if not self.index:
-            if not self.initialize_pinecone():
-                raise Exception("Failed to initialize Pinecone")
+        """
+        Get the Pinecone index instance. Never makes network calls: if the
+        index still has to be discovered, discovery is started in the
+        background and PineconeNotReady is raised.
+        """
+        if self.index is None and not self.connect():
+            self.warmup()
+            raise PineconeNotReady("Pinecone index is not connected yet")
         return self.index
     
     def delete_index(self) -> bool:
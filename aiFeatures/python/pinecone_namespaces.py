@@ -0,0 +1,193 @@
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from embedding_cache import get_cache_dir
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Namespace used when no session, user or course scope is given; never expired
+DEFAULT_NAMESPACE = os.environ.get("PINECONE_NAMESPACE", "default")
+# Namespaces unused for this long are removed by expire_idle
+NAMESPACE_IDLE_SECONDS = float(os.environ.get("PINECONE_NAMESPACE_IDLE_HOURS", "72")) * 3600
+# Activity is written to disk at most this often per namespace
+TOUCH_INTERVAL_SECONDS = 60
+# Namespace deletions issued at once by expire_idle
+DELETE_CONCURRENCY = 4
+
+def namespace_for(session_id: Optional[str] = None, user_id: Optional[str] = None,
+                  course_id: Optional[str] = None) -> str:
+    """
+    Namespace for a scope: a course is shared by its students, otherwise
+    documents belong to one user or one session.
+    """
+    for kind, value in (("course", course_id), ("user", user_id), ("session", session_id)):
+        if value:
+            return f"{kind}-{re.sub(r'[^A-Za-z0-9_-]', '-', str(value))[:64]}"
+    return DEFAULT_NAMESPACE
+
+def _namespace_counts(stats: Any) -> Dict[str, int]:
+    """Vector count per namespace from describe_index_stats (object or dict response)."""
+    namespaces = getattr(stats, "namespaces", None)
+    if namespaces is None and isinstance(stats, dict):
+        namespaces = stats.get("namespaces")
+    counts = {}
+    for name, summary in (namespaces or {}).items():
+        count = getattr(summary, "vector_count", None)
+        if count is None and isinstance(summary, dict):
+            count = summary.get("vector_count")
+        counts[name] = int(count or 0)
+    return counts
+
+class NamespaceManager:
+    """
+    Lifecycle of the Pinecone namespaces documents are stored in.
+
+    Pinecone creates a namespace on its first upsert and has no notion of when
+    one was last used, so creation and activity are recorded in a small SQLite
+    registry. Listing combines the registry with the index's vector counts;
+    idle namespaces can be expired in bulk. The default namespace and
+    namespaces held by a live store in this process (see hold) are never
+    expired.
+
+    The registry is a local SQLite file, so it only records activity on this
+    host. With several hosts writing to one index, a namespace busy elsewhere
+    looks idle here: expire only from a host that serves every namespace.
+    """
+
+    def __init__(self, index_provider: Optional[Callable[[], Any]] = None, path: Optional[str] = None):
+        self._index_provider = index_provider or _default_index
+        self.path = path or os.path.join(get_cache_dir(), "namespaces.sqlite3")
+        self._lock = threading.Lock()
+        self._last_written: Dict[str, float] = {}
+        self._held: Dict[str, int] = {}  # namespace -> live stores using it
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS namespaces ("
+            "name TEXT PRIMARY KEY, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @property
+    def index(self) -> Any:
+        return self._index_provider()
+
+    def create(self, namespace: str) -> str:
+        """Register a namespace (Pinecone materializes it on the first upsert)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO namespaces (name, created_at, last_used) VALUES (?, ?, ?)",
+                               (namespace, now, now))
+            self._conn.commit()
+            self._last_written[namespace] = now
+        return namespace
+
+    def touch(self, namespace: str) -> None:
+        """Record activity in a namespace; cheap enough to call on every query."""
+        now = time.time()
+        if now - self._last_written.get(namespace, 0.0) < TOUCH_INTERVAL_SECONDS:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO namespaces (name, created_at, last_used) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET last_used = excluded.last_used", (namespace, now, now))
+            self._conn.commit()
+            self._last_written[namespace] = now
+
+    def hold(self, namespace: str) -> None:
+        """Mark a namespace as in use by a live store, protecting it from expire_idle."""
+        with self._lock:
+            self._held[namespace] = self._held.get(namespace, 0) + 1
+
+    def release(self, namespace: str) -> None:
+        """Undo one hold() once its store is gone."""
+        with self._lock:
+            count = self._held.get(namespace, 0) - 1
+            if count > 0:
+                self._held[namespace] = count
+            else:
+                self._held.pop(namespace, None)
+
+    def forget(self, namespace: str) -> None:
+        """Drop a namespace from the registry (after its vectors were deleted)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM namespaces WHERE name = ?", (namespace,))
+            self._conn.commit()
+            self._last_written.pop(namespace, None)
+
+    def list_namespaces(self) -> List[Dict[str, Any]]:
+        """Known namespaces with their vector counts, most recently used first."""
+        counts = _namespace_counts(self.index.describe_index_stats())
+        with self._lock:
+            rows = self._conn.execute("SELECT name, created_at, last_used FROM namespaces").fetchall()
+        registered = {name: (created_at, last_used) for name, created_at, last_used in rows}
+
+        namespaces = []
+        for name in set(counts) | set(registered):
+            created_at, last_used = registered.get(name, (None, None))
+            namespaces.append({
+                "namespace": name,
+                "vector_count": counts.get(name, 0),
+                "created_at": created_at,
+                "last_used": last_used,
+            })
+        namespaces.sort(key=lambda item: item["last_used"] or 0.0, reverse=True)
+        return namespaces
+
+    def delete(self, namespace: str) -> bool:
+        """Delete all vectors in a namespace and forget it."""
+        try:
+            self.index.delete(delete_all=True, namespace=namespace)
+        except Exception as e:
+            logger.error(f"Error deleting namespace '{namespace}': {str(e)}")
+            return False
+        self.forget(namespace)
+        logger.info(f"Deleted namespace '{namespace}'")
+        return True
+
+    def expire_idle(self, max_idle_seconds: float = NAMESPACE_IDLE_SECONDS, keep: Iterable[str] = ()) -> List[str]:
+        """
+        Delete every registered namespace unused for max_idle_seconds, except
+        the default namespace, held namespaces and those in keep. Only
+        activity recorded on this host counts (see the class docstring).
+
+        Returns:
+            Names of the namespaces deleted
+        """
+        if max_idle_seconds <= 0:
+            raise ValueError("max_idle_seconds must be positive")
+        cutoff = time.time() - max_idle_seconds
+        with self._lock:
+            protected = {DEFAULT_NAMESPACE, *self._held, *keep}
+            idle = [name for (name,) in self._conn.execute(
+                "SELECT name FROM namespaces WHERE last_used < ?", (cutoff,)) if name not in protected]
+        if not idle:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(DELETE_CONCURRENCY, len(idle))) as executor:
+            deleted = [name for name, ok in zip(idle, executor.map(self.delete, idle)) if ok]
+        logger.info(f"Expired {len(deleted)} of {len(idle)} idle namespaces")
+        return deleted
+
+def _default_index() -> Any:
+    from pinecone_config import get_pinecone_config
+    return get_pinecone_config().get_index()
+
+# Global instance (created on first use)
+_namespace_manager: Optional[NamespaceManager] = None
+_namespace_manager_lock = threading.Lock()
+
+def get_namespace_manager() -> NamespaceManager:
+    """Get the global namespace manager instance."""
+    global _namespace_manager
+    with _namespace_manager_lock:
+        if _namespace_manager is None:
+            _namespace_manager = NamespaceManager()
+        return _namespace_manager
@@ -0,0 +1,278 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Pinecone rejects upsert requests over 2MB or 1000 vectors; stay under both with some headroom
+UPSERT_MAX_BYTES = int(os.environ.get("PINECONE_UPSERT_MAX_BYTES", str(1_800_000)))
+UPSERT_MAX_VECTORS = int(os.environ.get("PINECONE_UPSERT_MAX_VECTORS", "1000"))
+# Upsert requests in flight at once
+UPSERT_CONCURRENCY = int(os.environ.get("PINECONE_UPSERT_CONCURRENCY", "4"))
+UPSERT_MAX_RETRIES = int(os.environ.get("PINECONE_UPSERT_MAX_RETRIES", "3"))
+# Texts embedded per pipeline step; upserts of one step run while the next is embedded
+UPLOAD_EMBED_SLICE = int(os.environ.get("PINECONE_UPLOAD_EMBED_SLICE", "256"))
+
+# Serialized size of one float in a JSON request body ("-0.012345678,"); gRPC needs 4
+BYTES_PER_VALUE = 12
+# Braces, keys and quoting around each vector
+VECTOR_OVERHEAD_BYTES = 64
+
+# Ids of chunks without a source file hash start with this instead
+TEXT_ID_PREFIX = "text"
+# Ids per fetch request when checking existence without list()
+FETCH_BATCH = 100
+# File-level metadata not covered by the vector id: the same content can be re-uploaded
+# under another name, so these are refreshed on skipped chunks. upload_batch is not:
+# a stored chunk keeps the batch that first uploaded it
+MUTABLE_METADATA_KEYS = ("file_name", "file_path")
+
+def chunk_vector_id(text: str, metadata: Dict[str, Any]) -> str:
+    """
+    Deterministic vector id: "<file hash>#<page>#<offset>#<text digest>".
+
+    The file hash prefix lets all chunks of a file be listed by prefix. The
+    digest of the chunk text makes an existing id imply identical content, so
+    a chunk found in the index never needs to be embedded again; only its
+    MUTABLE_METADATA_KEYS may need refreshing (see refresh_metadata).
+    """
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    file_hash = metadata.get("file_hash")
+    if not file_hash:
+        return f"{TEXT_ID_PREFIX}#{digest[:32]}"
+    return f"{file_hash[:32]}#{metadata.get('page_index', 0)}#{metadata.get('chunk_offset', 0)}#{digest[:12]}"
+
+def find_existing_ids(index: Any, ids: Iterable[str], namespace: str) -> Set[str]:
+    """
+    Which of the given ids are already stored. Ids of one source file are
+    checked by listing the file's id prefix (ids only, no vector values);
+    others, and indexes without list support, fall back to fetch.
+    """
+    wanted = set(ids)
+    existing: Set[str] = set()
+    to_fetch: Set[str] = set()
+
+    by_prefix: Dict[str, Set[str]] = {}
+    for vector_id in wanted:
+        prefix = vector_id.split("#", 1)[0]
+        if prefix == TEXT_ID_PREFIX:
+            to_fetch.add(vector_id)
+        else:
+            by_prefix.setdefault(prefix + "#", set()).add(vector_id)
+
+    for prefix, prefix_ids in by_prefix.items():
+        try:
+            for page in index.list(prefix=prefix, namespace=namespace):
+                existing.update(vector_id for vector_id in page if vector_id in prefix_ids)
+        except Exception as e:
+            # Pod-based indexes do not support list()
+            logger.debug(f"Listing ids by prefix failed ({str(e)}), fetching instead")
+            to_fetch |= prefix_ids
+
+    fetch_ids = sorted(to_fetch)
+    for i in range(0, len(fetch_ids), FETCH_BATCH):
+        response = index.fetch(ids=fetch_ids[i:i + FETCH_BATCH], namespace=namespace)
+        existing.update(response.vectors.keys())
+    return existing
+
+def refresh_metadata(index: Any, metadata_by_id: Dict[str, Dict[str, Any]], namespace: str) -> int:
+    """
+    Bring the mutable metadata (MUTABLE_METADATA_KEYS) of already stored
+    vectors in line with the given metadata.
+
+    The fields are the same for every chunk of a file, so one stored vector
+    per file is fetched to check them. Only files whose fields differ (the
+    same content uploaded under a new name) are rewritten: their vectors are
+    fetched and upserted back with the new metadata in batched requests.
+
+    Returns:
+        Number of vectors rewritten
+    """
+    def file_key(vector_id: str) -> str:
+        # Chunks without a file hash are checked one by one
+        prefix = vector_id.split("#", 1)[0]
+        return vector_id if prefix == TEXT_ID_PREFIX else prefix
+
+    by_file: Dict[str, List[str]] = {}
+    for vector_id in sorted(metadata_by_id):
+        by_file.setdefault(file_key(vector_id), []).append(vector_id)
+
+    def wanted_fields(vector_id: str) -> Dict[str, Any]:
+        wanted = metadata_by_id[vector_id]
+        return {key: wanted[key] for key in MUTABLE_METADATA_KEYS if key in wanted}
+
+    samples = [file_ids[0] for file_ids in by_file.values()]
+    stale_ids: List[str] = []
+    for i in range(0, len(samples), FETCH_BATCH):
+        response = index.fetch(ids=samples[i:i + FETCH_BATCH], namespace=namespace)
+        for vector_id, vector in response.vectors.items():
+            stored = getattr(vector, "metadata", None) or {}
+            if any(stored.get(key) != value for key, value in wanted_fields(vector_id).items()):
+                stale_ids.extend(by_file[file_key(vector_id)])
+    if not stale_ids:
+        return 0
+
+    def updated_vectors() -> Iterator[Dict[str, Any]]:
+        for i in range(0, len(stale_ids), FETCH_BATCH):
+            response = index.fetch(ids=stale_ids[i:i + FETCH_BATCH], namespace=namespace)
+            for vector_id, vector in response.vectors.items():
+                yield {"id": vector_id, "values": list(vector.values),
+                       "metadata": {**(getattr(vector, "metadata", None) or {}), **wanted_fields(vector_id)}}
+
+    # Upsert requests are filled across fetches, up to the request size limits
+    rewritten = 0
+    for batch in iter_upsert_batches(updated_vectors()):
+        index.upsert(vectors=batch, namespace=namespace)
+        rewritten += len(batch)
+    logger.info(f"Updated file metadata of {rewritten} existing vectors in namespace '{namespace}'")
+    return rewritten
+
+def estimate_vector_bytes(vector: Dict[str, Any]) -> int:
+    """Approximate request payload size of one vector."""
+    metadata = vector.get("metadata")
+    metadata_bytes = len(json.dumps(metadata, ensure_ascii=False).encode("utf-8")) if metadata else 0
+    return (len(vector["id"]) + len(vector["values"]) * BYTES_PER_VALUE + metadata_bytes
+            + VECTOR_OVERHEAD_BYTES)
+
+def iter_upsert_batches(vectors: Iterable[Dict[str, Any]], max_bytes: int = UPSERT_MAX_BYTES,
+                        max_vectors: int = UPSERT_MAX_VECTORS) -> Iterator[List[Dict[str, Any]]]:
+    """Group vectors into upsert requests bounded by payload size and vector count."""
+    batch: List[Dict[str, Any]] = []
+    batch_bytes = 0
+    for vector in vectors:
+        size = estimate_vector_bytes(vector)
+        if batch and (batch_bytes + size > max_bytes or len(batch) >= max_vectors):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(vector)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+def is_transient_error(error: Exception) -> bool:
+    """Whether an upsert failure is worth retrying (network errors, 429 and 5xx)."""
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    if isinstance(status, int) and 400 <= status < 500 and status != 429:
+        return False
+    return True
+
+@dataclass
+class UploadStats:
+    """Totals for one pipelined upload."""
+    vectors: int = 0
+    batches: int = 0
+    retries: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def vectors_per_second(self) -> float:
+        return self.vectors / self.seconds if self.seconds else 0.0
+
+class PipelinedUploader:
+    """
+    Embeds and upserts vectors as a pipeline.
+
+    Texts are embedded one slice at a time on the calling thread. Each slice
+    is packed into byte-bounded upsert requests, which are sent by a pool of
+    upload threads while the next slice is being embedded. At most
+    `concurrency` requests are in flight; the embedder waits when they are all
+    busy, so memory stays bounded. Failed requests are retried with
+    exponential backoff unless the error is a permanent client error.
+    """
+
+    def __init__(self, index: Any, namespace: str, concurrency: int = UPSERT_CONCURRENCY,
+                 max_retries: int = UPSERT_MAX_RETRIES, retry_backoff: float = 1.0,
+                 embed_slice: int = UPLOAD_EMBED_SLICE, max_bytes: int = UPSERT_MAX_BYTES,
+                 max_vectors: int = UPSERT_MAX_VECTORS):
+        self.index = index
+        self.namespace = namespace
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff = retry_backoff
+        self.embed_slice = max(1, embed_slice)
+        self.max_bytes = max_bytes
+        self.max_vectors = max_vectors
+
+    def _upsert(self, batch: List[Dict[str, Any]], stats: UploadStats, lock: threading.Lock) -> None:
+        """Send one request, retrying transient failures."""
+        attempt = 0
+        while True:
+            try:
+                self.index.upsert(vectors=batch, namespace=self.namespace)
+                return
+            except Exception as e:
+                if attempt >= self.max_retries or not is_transient_error(e):
+                    logger.error(f"Upsert of {len(batch)} vectors failed after {attempt + 1} attempts: {str(e)}")
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                attempt += 1
+                with lock:
+                    stats.retries += 1
+                logger.warning(f"Upsert failed ({str(e)}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def upload(self, texts: List[str], ids: List[str],
+               embed: Callable[[List[str]], List[List[float]]],
+               make_metadata: Callable[[int, str], Dict[str, Any]]) -> UploadStats:
+        """
+        Embed and upsert texts.
+
+        Args:
+            texts: Texts to embed
+            ids: Vector id per text
+            embed: Embeds a list of texts (e.g. embed_documents)
+            make_metadata: Metadata for the text at a given position
+
+        Returns:
+            Upload statistics; raises if any request ultimately fails
+        """
+        stats = UploadStats()
+        lock = threading.Lock()
+        slots = threading.BoundedSemaphore(self.concurrency)
+        futures: List[Future] = []
+        started = time.perf_counter()
+
+        def send(batch: List[Dict[str, Any]]) -> None:
+            try:
+                self._upsert(batch, stats, lock)
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                for start in range(0, len(texts), self.embed_slice):
+                    slice_texts = texts[start:start + self.embed_slice]
+                    vectors = [
+                        {"id": ids[start + i], "values": values, "metadata": make_metadata(start + i, text)}
+                        for i, (text, values) in enumerate(zip(slice_texts, embed(slice_texts)))
+                    ]
+                    for batch in iter_upsert_batches(vectors, self.max_bytes, self.max_vectors):
+                        # Fail fast instead of embedding the rest after a batch has given up
+                        for future in futures:
+                            if future.done() and future.exception() is not None:
+                                raise future.exception()
+                        slots.acquire()
+                        stats.batches += 1
+                        stats.vectors += len(batch)
+                        stats.bytes += sum(estimate_vector_bytes(vector) for vector in batch)
+                        futures.append(executor.submit(send, batch))
+                for future in futures:
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        stats.seconds = time.perf_counter() - started
+        logger.info(f"Upserted {stats.vectors} vectors in {stats.batches} requests "
+                    f"({stats.bytes / 1e6:.1f}MB, {stats.retries} retries) in {stats.seconds:.2f}s "
+                    f"({stats.vectors_per_second:.1f} vectors/sec)")
+        return stats
@@ -0,0 +1,138 @@
+import os
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Max cosine distance between query embeddings for a semantic hit (unset disables the tier)
+_semantic_distance = os.environ.get("QUERY_CACHE_SEMANTIC_DISTANCE")
+DEFAULT_SEMANTIC_DISTANCE = float(_semantic_distance) if _semantic_distance else None
+
+def normalize_query(query: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", query.lower()).strip().rstrip("?!. ")
+
+def _unit_vector(embedding: Optional[Sequence[float]]) -> Optional[np.ndarray]:
+    """Embedding scaled to unit length as float32, or None if it has no direction."""
+    if embedding is None:
+        return None
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else None
+
+class QueryCache:
+    """
+    Cache of search results in front of a vector store.
+
+    Exact tier: keyed on normalized query text. Semantic tier (optional): a new
+    query whose embedding lies within semantic_distance (cosine) of a cached
+    query reuses its results. Entries expire after ttl_seconds and are
+    invalidated as soon as the store's version changes.
+    """
+
+    def __init__(self, ttl_seconds: float = 600.0, max_entries: int = 512,
+                 semantic_distance: Optional[float] = DEFAULT_SEMANTIC_DISTANCE):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.semantic_distance = semantic_distance
+        # (normalized query, params) -> (created_at, store version, results, unit query embedding)
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, int, List, Optional[np.ndarray]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.semantic_distance is not None
+
+    def _is_valid(self, entry: Tuple, version: int, now: float) -> bool:
+        created_at, entry_version, _, _ = entry
+        return entry_version == version and now - created_at <= self.ttl_seconds
+
+    def get(self, query: str, params: Hashable, version: int) -> Optional[List[Any]]:
+        """Exact-tier lookup. Does not count a miss, so the semantic tier can still be tried."""
+        key = (normalize_query(query), params)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not self._is_valid(entry, version, now):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def get_similar(self, embedding: Sequence[float], params: Hashable, version: int) -> Optional[List[Any]]:
+        """
+        Semantic-tier lookup against cached query embeddings.
+
+        Candidate embeddings are snapshotted under the lock and compared with
+        one matrix product outside it, so lookups do not block each other.
+        """
+        if not self.semantic_enabled:
+            return None
+        query = _unit_vector(embedding)
+        if query is None:
+            return None
+        now = time.time()
+        with self._lock:
+            candidates = [(key, entry[3]) for key, entry in self._entries.items()
+                          if key[1] == params and entry[3] is not None and self._is_valid(entry, version, now)]
+        if not candidates:
+            return None
+
+        distances = 1.0 - np.stack([vector for _, vector in candidates]) @ query
+        best = int(np.argmin(distances))
+        if distances[best] > self.semantic_distance:
+            return None
+
+        key = candidates[best][0]
+        with self._lock:
+            entry = self._entries.get(key)
+            # The entry may have been evicted or replaced while the lock was released
+            if entry is None or entry[3] is not candidates[best][1]:
+                return None
+            self._entries.move_to_end(key)
+            self.semantic_hits += 1
+            return entry[2]
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def put(self, query: str, params: Hashable, version: int, results: List[Any],
+            embedding: Optional[Sequence[float]] = None) -> None:
+        """Store results for a query, evicting the least recently used entry when full."""
+        key = (normalize_query(query), params)
+        vector = _unit_vector(embedding)
+        with self._lock:
+            self._entries[key] = (time.time(), version, results, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit counters for the exact and semantic tiers."""
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+                "ttl_seconds": self.ttl_seconds,
+            }
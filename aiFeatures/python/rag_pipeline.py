@@ -1,12 +1,26 @@
 import os
-import faiss
+import time
+import uuid
+import queue
+import threading
 from langchain_community.vectorstores import FAISS
-from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_ollama import OllamaEmbeddings
-from pypdf import PdfReader
-from typing import List, Dict, Tuple, Union, Optional
+from typing import List, Dict, Tuple, Union, Optional, Iterable, Iterator, Any, Deque
+from dataclasses import dataclass, field
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 import logging
+from embedding_client import get_embeddings
+from embedding_models import get_embedding_dimension
+from faiss_index_factory import optimize_faiss_store, new_faiss_store, to_cosine_distance
+from faiss_persistence import save_faiss_store, load_faiss_store, is_mmap_format
+from reranker import get_reranker, RERANK_ENABLED, RERANK_CANDIDATES
+from diversity import mmr_select
+from retrieval_results import RetrievalResult, RetrievedChunk
+from search_filters import SearchFilter
+from pdf_extraction import file_sha256, extract_pages, iter_pages, count_pages
+from pdf_ocr import get_ocr_fallback
+from chunking import DocumentChunker, CHUNKER
 
 # Import the hybrid vector store
 try:
@@ -19,16 +33,89 @@ except ImportError:
     class VectorStore:
         pass
 
+# Minimum cosine similarity for a chunk to count as relevant (0 disables the cutoff)
+MIN_RELEVANCE_SCORE = float(os.environ.get("RAG_MIN_SIMILARITY", "0"))
+NO_RESULTS_MESSAGE = "No relevant information found."
+
+# Diversify results with MMR, suppressing near-duplicate (e.g. overlapping) chunks
+MMR_ENABLED = os.environ.get("RAG_MMR", "true").lower() == "true"
+# Candidates fetched per requested result for MMR to choose from
+MMR_FETCH_MULTIPLIER = 4
+
+# How often a blocked prefetch producer checks whether its consumer has gone away
+PREFETCH_POLL_SECONDS = 0.1
+# Pages sampled per file to estimate corpus text size before streaming ingestion
+ESTIMATE_SAMPLE_PAGES = 3
+# Text bytes assumed per page when the sampled pages have no text layer
+ESTIMATED_BYTES_PER_PAGE = 2000
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def extract_text_from_pdf(pdf_path: str) -> List[Tuple[str, Dict]]:
+def _extract_page_range(pdf_path: str, start: int, end: Optional[int] = None,
+                        file_hash: Optional[str] = None) -> Tuple[List[Tuple[str, Dict]], List[Dict], float]:
+    """
+    Extracts text from pages [start, end) of a PDF file.
+    
+    Top-level so it can be shipped to worker processes. Pages already in the
+    page text cache are served without opening the file.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        start: Index of the first page to extract
+        end: Index one past the last page to extract (None for the last page)
+        file_hash: Content hash of the file if already known
+        
+    Returns:
+        Tuple of ((text, metadata) list, metadata of pages without text, elapsed seconds)
+    """
+    started = time.perf_counter()
+    file_hash = file_hash or file_sha256(pdf_path)
+    pages, total_pages = extract_pages(pdf_path, start, end, file_hash=file_hash)
+    file_name = os.path.basename(pdf_path)
+    texts_with_metadata = []
+    blank_pages = []
+    
+    for page_idx, text in pages:
+        metadata = {
+            "file_name": file_name,
+            "file_path": pdf_path,
+            "page_index": page_idx,
+            "total_pages": total_pages,
+            "file_hash": file_hash
+        }
+        if text and text.strip():  # Check if text is not empty or just whitespace
+            texts_with_metadata.append((text, metadata))
+        else:
+            blank_pages.append(metadata)
+    
+    return texts_with_metadata, blank_pages, time.perf_counter() - started
+
+def _add_ocr_pages(pdf_path: str, texts_with_metadata: List[Tuple[str, Dict]],
+                   blank_pages: List[Dict]) -> List[Tuple[str, Dict]]:
+    """
+    Runs the OCR fallback on a document's pages without text and merges the
+    recognized pages back in page order (marked with metadata "ocr": True).
+    """
+    if not blank_pages:
+        return texts_with_metadata
+    
+    ocr_texts = get_ocr_fallback().ocr_pages(pdf_path, [metadata["page_index"] for metadata in blank_pages])
+    if not ocr_texts:
+        return texts_with_metadata
+    
+    ocr_pages = [(ocr_texts[metadata["page_index"]], {**metadata, "ocr": True})
+                 for metadata in blank_pages if metadata["page_index"] in ocr_texts]
+    return sorted(texts_with_metadata + ocr_pages, key=lambda item: item[1]["page_index"])
+
+def extract_text_from_pdf(pdf_path: str, file_hash: Optional[str] = None) -> List[Tuple[str, Dict]]:
     """
     Extracts text from a given PDF file with metadata.
     
     Args:
         pdf_path: Path to the PDF file
+        file_hash: Content hash of the file if already known
         
     Returns:
         List of tuples containing (text, metadata)
@@ -36,62 +123,117 @@ def extract_text_from_pdf(pdf_path: str) -> List[Tuple[str, Dict]]:
     logger.info(f"Extracting text from {os.path.basename(pdf_path)}")
     
     try:
-        reader = PdfReader(pdf_path)
-        texts_with_metadata = []
-        
-        for page_idx, page in enumerate(reader.pages):
-            text = page.extract_text()
-            if text and text.strip():  # Check if text is not empty or just whitespace
-                metadata = {
-                    "file_name": os.path.basename(pdf_path),
-                    "file_path": pdf_path,
-                    "page_index": page_idx,
-                    "total_pages": len(reader.pages)
-                }
-                texts_with_metadata.append((text, metadata))
-        
-        logger.info(f"Extracted {len(texts_with_metadata)} pages with text from {os.path.basename(pdf_path)}")
+        texts_with_metadata, blank_pages, elapsed = _extract_page_range(pdf_path, 0, file_hash=file_hash)
+        texts_with_metadata = _add_ocr_pages(pdf_path, texts_with_metadata, blank_pages)
+        logger.info(f"Extracted {len(texts_with_metadata)} pages with text from {os.path.basename(pdf_path)} "
+                    f"in {elapsed:.2f}s")
         return texts_with_metadata
         
     except Exception as e:
         logger.error(f"Error extracting text from {pdf_path}: {str(e)}")
         return []
 
-def index_pdfs(pdf_inputs: Union[str, List[str]], chunk_size: int = 1000, chunk_overlap: int = 200, 
-               model: str = "mxbai-embed-large:latest") -> Optional[Union[FAISS, VectorStore]]:
+def extract_texts_parallel(pdf_paths: List[str], max_workers: Optional[int] = None,
+                           pages_per_task: int = 50) -> List[Tuple[str, Dict]]:
     """
-    Unified function to index PDFs with hybrid storage (local FAISS vs Pinecone)
+    Extracts text from several PDFs using a process pool.
+    
+    Files are fanned out across workers, and files longer than pages_per_task
+    are split into page ranges. Results are returned in input order (file order,
+    then page order), identical to calling extract_text_from_pdf on each file.
+    A file is left out entirely if any of its page ranges fails. Pages
+    without text are passed to the OCR fallback once a file's ranges are all
+    extracted.
     
     Args:
-        pdf_inputs: Can be a single PDF path, a list of PDF paths, or a folder path
-        chunk_size: Size of text chunks for splitting
-        chunk_overlap: Overlap between chunks
-        model: Embedding model to use
+        pdf_paths: List of PDF file paths
+        max_workers: Number of worker processes (None uses the CPU count)
+        pages_per_task: Maximum number of pages handled by a single task
         
     Returns:
-        Vector store (FAISS for legacy compatibility, or hybrid store)
+        List of tuples containing (text, metadata)
     """
+    # Plan page-range tasks; page counts of previously extracted files come from the cache
+    tasks = []
+    for pdf_path in pdf_paths:
+        try:
+            file_hash = file_sha256(pdf_path)
+            total_pages = count_pages(pdf_path, file_hash)
+        except Exception as e:
+            logger.error(f"Error reading {pdf_path}: {str(e)}")
+            continue
+        for start in range(0, total_pages, pages_per_task):
+            tasks.append((pdf_path, start, start + pages_per_task, file_hash))
+    
+    if not tasks:
+        return []
+    
+    logger.info(f"Extracting {len(pdf_paths)} PDFs as {len(tasks)} tasks "
+                f"with up to {max_workers or os.cpu_count()} workers")
+    started = time.perf_counter()
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_extract_page_range, *task) for task in tasks]
+        
+        # Collect in submission order so output is deterministic
+        file_texts: Dict[str, List[Tuple[str, Dict]]] = {}
+        file_blank_pages: Dict[str, List[Dict]] = {}
+        file_stats: Dict[str, List[float]] = {}
+        failed_files = set()
+        for task, future in zip(tasks, futures):
+            pdf_path = task[0]
+            try:
+                texts_with_metadata, blank_pages, elapsed = future.result()
+            except Exception as e:
+                logger.error(f"Error extracting pages {task[1]}-{task[2] - 1} of {pdf_path}: {str(e)}")
+                failed_files.add(pdf_path)
+                continue
+            file_texts.setdefault(pdf_path, []).extend(texts_with_metadata)
+            file_blank_pages.setdefault(pdf_path, []).extend(blank_pages)
+            stats = file_stats.setdefault(pdf_path, [0, 0.0])
+            stats[0] += len(texts_with_metadata)
+            stats[1] += elapsed
+    
+    # A file missing some of its page ranges would be indexed with silent gaps, so drop it entirely
+    for pdf_path in failed_files:
+        logger.error(f"Skipping {os.path.basename(pdf_path)}: not all of its pages could be extracted")
+        file_texts.pop(pdf_path, None)
+        file_stats.pop(pdf_path, None)
+    
+    for pdf_path, (pages, elapsed) in file_stats.items():
+        logger.info(f"Extracted {pages} pages with text from {os.path.basename(pdf_path)} "
+                    f"in {elapsed:.2f}s (worker time)")
+    
     all_texts_with_metadata = []
+    for pdf_path, texts_with_metadata in file_texts.items():
+        all_texts_with_metadata.extend(_add_ocr_pages(pdf_path, texts_with_metadata, file_blank_pages[pdf_path]))
+    logger.info(f"Parallel extraction finished in {time.perf_counter() - started:.2f}s")
+    
+    return all_texts_with_metadata
+
+def _collect_pdf_paths(pdf_inputs: Union[str, List[str]]) -> Optional[List[str]]:
+    """
+    Resolves a PDF path, a list of PDF paths, or a folder path into a list of PDF files.
     
-    # Process different input types
+    Returns:
+        List of PDF paths, or None if the input is invalid
+    """
     if isinstance(pdf_inputs, str):
         if os.path.isdir(pdf_inputs):
             # It's a folder path
             logger.info(f"Indexing all PDFs in folder: {pdf_inputs}")
-            pdf_files = [os.path.join(pdf_inputs, f) for f in os.listdir(pdf_inputs) 
+            pdf_files = [os.path.join(pdf_inputs, f) for f in sorted(os.listdir(pdf_inputs))
                          if f.lower().endswith(".pdf")]
             
             if not pdf_files:
                 logger.warning(f"No PDF files found in folder: {pdf_inputs}")
                 return None
-                
-            for pdf in pdf_files:
-                all_texts_with_metadata.extend(extract_text_from_pdf(pdf))
+            return pdf_files
         
         elif os.path.isfile(pdf_inputs) and pdf_inputs.lower().endswith(".pdf"):
             # It's a single PDF file
             logger.info(f"Indexing single PDF: {pdf_inputs}")
-            all_texts_with_metadata = extract_text_from_pdf(pdf_inputs)
+            return [pdf_inputs]
         
         else:
             logger.error(f"Invalid input: {pdf_inputs} is not a PDF file or folder")
@@ -100,15 +242,45 @@ def index_pdfs(pdf_inputs: Union[str, List[str]], chunk_size: int = 1000, chunk_
     elif isinstance(pdf_inputs, list):
         # It's a list of PDF paths
         logger.info(f"Indexing {len(pdf_inputs)} PDF files")
+        pdf_files = []
         for pdf in pdf_inputs:
             if os.path.isfile(pdf) and pdf.lower().endswith(".pdf"):
-                all_texts_with_metadata.extend(extract_text_from_pdf(pdf))
+                pdf_files.append(pdf)
             else:
                 logger.warning(f"Skipping invalid file: {pdf}")
+        return pdf_files
     
     else:
         logger.error("Invalid input type. Expected a string path or list of paths")
         return None
+
+def index_pdfs(pdf_inputs: Union[str, List[str]], chunk_size: int = 1000, chunk_overlap: int = 200, 
+               model: str = "mxbai-embed-large:latest",
+               max_workers: Optional[int] = 1) -> Optional[Union[FAISS, VectorStore]]:
+    """
+    Unified function to index PDFs with hybrid storage (local FAISS vs Pinecone)
+    
+    Args:
+        pdf_inputs: Can be a single PDF path, a list of PDF paths, or a folder path
+        chunk_size: Size of text chunks for splitting
+        chunk_overlap: Overlap between chunks
+        model: Embedding model to use
+        max_workers: Worker processes for text extraction (1 extracts serially,
+                     None uses the CPU count)
+        
+    Returns:
+        Vector store (FAISS for legacy compatibility, or hybrid store)
+    """
+    pdf_files = _collect_pdf_paths(pdf_inputs)
+    if pdf_files is None:
+        return None
+    
+    if max_workers == 1:
+        all_texts_with_metadata = []
+        for pdf in pdf_files:
+            all_texts_with_metadata.extend(extract_text_from_pdf(pdf))
+    else:
+        all_texts_with_metadata = extract_texts_parallel(pdf_files, max_workers=max_workers)
     
     # Check if we have any texts to index
     if not all_texts_with_metadata:
@@ -123,6 +295,253 @@ def index_pdfs(pdf_inputs: Union[str, List[str]], chunk_size: int = 1000, chunk_
         logger.info(f"Creating legacy FAISS index with {len(all_texts_with_metadata)} text segments")
         return create_faiss_index(all_texts_with_metadata, chunk_size, chunk_overlap, model)
 
+def iter_pdf_pages(pdf_paths: List[str]) -> Iterator[Tuple[str, Dict]]:
+    """
+    Lazily yields (text, metadata) for every page with text, one page at a time.
+    
+    Pages without text are sent to the OCR fallback as they are found, while
+    extraction continues; recognized pages are yielded in their place, so the
+    stream stays in page order. A page still being recognized holds back the
+    pages after it until it finishes or the document's OCR budget runs out.
+    
+    Args:
+        pdf_paths: List of PDF file paths
+        
+    Yields:
+        Tuples containing (text, metadata), same shape as extract_text_from_pdf
+    """
+    ocr = get_ocr_fallback()
+    for pdf_path in pdf_paths:
+        started = time.perf_counter()
+        pages_with_text = 0
+        # Pages in order: (text, metadata, OCR future or None)
+        pending: Deque[Tuple[Optional[str], Dict, Optional[Future]]] = deque()
+        deadline = None
+        ocr_submitted = ocr_recovered = ocr_skipped = 0
+        
+        def release(wait: bool) -> Iterator[Tuple[str, Dict]]:
+            nonlocal pages_with_text, ocr_recovered, ocr_skipped
+            while pending and (wait or pending[0][2] is None or pending[0][2].done()):
+                text, metadata, future = pending.popleft()
+                if future is not None:
+                    text = ocr.result(pdf_path, metadata["page_index"], future, deadline)
+                    if text is None:
+                        ocr_skipped += 1
+                        continue
+                    if not text.strip():
+                        continue
+                    ocr_recovered += 1
+                    metadata["ocr"] = True
+                pages_with_text += 1
+                yield text, metadata
+        
+        try:
+            file_name = os.path.basename(pdf_path)
+            file_hash = file_sha256(pdf_path)
+            for page_idx, text, total_pages in iter_pages(pdf_path, file_hash=file_hash):
+                metadata = {
+                    "file_name": file_name,
+                    "file_path": pdf_path,
+                    "page_index": page_idx,
+                    "total_pages": total_pages,
+                    "file_hash": file_hash
+                }
+                if text and text.strip():
+                    pending.append((text, metadata, None))
+                else:
+                    if deadline is None:
+                        deadline = ocr.deadline()
+                    future = ocr.submit(pdf_path, page_idx)
+                    if future is not None:
+                        ocr_submitted += 1
+                        pending.append((None, metadata, future))
+                yield from release(wait=False)
+            yield from release(wait=True)
+        except Exception as e:
+            logger.error(f"Error extracting text from {pdf_path}: {str(e)}")
+            for _, _, future in pending:
+                if future is not None:
+                    future.cancel()
+            continue
+        if ocr_submitted:
+            ocr.log_summary(pdf_path, ocr_submitted, ocr_recovered, ocr_skipped)
+        logger.info(f"Streamed {pages_with_text} pages with text from {os.path.basename(pdf_path)} "
+                    f"in {time.perf_counter() - started:.2f}s")
+
+def iter_chunks(pages: Iterable[Tuple[str, Dict]], chunk_size: int = 1000,
+                chunk_overlap: int = 200) -> Iterator[Tuple[str, Dict]]:
+    """
+    Splits a stream of (text, metadata) pages into a stream of (chunk, metadata).
+    
+    With the structured chunker (default) each document's pages are chunked
+    together at headings and sentence boundaries; RAG_CHUNKER=recursive
+    splits every page on its own into character windows.
+    Each chunk gets its own copy of the page metadata so stores may safely mutate it.
+    """
+    if CHUNKER == "structured":
+        yield from DocumentChunker(chunk_size, chunk_overlap).split_pages(pages)
+        return
+    
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, 
+        chunk_overlap=chunk_overlap
+    )
+    for text, metadata in pages:
+        offset = 0
+        for chunk in text_splitter.split_text(text):
+            # Character offset within the page, so chunks have stable identities
+            found = text.find(chunk, offset)
+            offset = found if found >= 0 else offset
+            yield chunk, {**metadata, "chunk_offset": offset}
+
+def iter_batches(items: Iterable, batch_size: int) -> Iterator[List]:
+    """Groups a stream into lists of at most batch_size items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def prefetch(items: Iterable, max_buffered: int) -> Iterator:
+    """
+    Runs the upstream generator in a background thread behind a bounded queue.
+    
+    Lets PDF extraction and splitting proceed while the consumer is embedding,
+    without ever holding more than max_buffered items in memory. If the
+    consumer stops early (raises or closes this generator), the producer
+    notices within PREFETCH_POLL_SECONDS and closes the upstream generator,
+    releasing its open PDFs.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=max_buffered)
+    done = object()
+    errors = []
+    stop = threading.Event()
+    
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=PREFETCH_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def producer():
+        try:
+            for item in items:
+                if not put(item):
+                    break
+        except Exception as e:
+            errors.append(e)
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+            put(done)
+    
+    threading.Thread(target=producer, daemon=True).start()
+    
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                break
+            yield item
+    finally:
+        stop.set()
+    
+    if errors:
+        raise errors[0]
+
+def _estimate_corpus_size(pdf_paths: List[str]) -> Tuple[int, int]:
+    """
+    Cheaply estimates (text bytes, page count) for the hybrid store decision.
+    
+    Only the first ESTIMATE_SAMPLE_PAGES pages of each file are extracted (and
+    land in the page text cache for the real pass); their average text size is
+    scaled to the file's page count. File size on disk is not used, since
+    scanned and image-heavy PDFs are far larger than their text.
+    """
+    total_size = 0
+    total_pages = 0
+    for pdf_path in pdf_paths:
+        try:
+            pages, page_count = extract_pages(pdf_path, 0, ESTIMATE_SAMPLE_PAGES)
+        except Exception as e:
+            logger.warning(f"Could not inspect {pdf_path}: {str(e)}")
+            continue
+        sampled_bytes = sum(len(text.encode("utf-8")) for _, text in pages if text)
+        if pages and sampled_bytes:
+            total_size += sampled_bytes * page_count // len(pages)
+        else:
+            # No text layer in the sample (e.g. a scan that will be OCR'd)
+            total_size += ESTIMATED_BYTES_PER_PAGE * page_count
+        total_pages += page_count
+    return total_size, total_pages
+
+def index_pdfs_streaming(pdf_inputs: Union[str, List[str]], chunk_size: int = 1000, chunk_overlap: int = 200,
+                         model: str = "mxbai-embed-large:latest", batch_size: int = 64,
+                         max_buffered_batches: int = 4) -> Optional[Union[FAISS, VectorStore]]:
+    """
+    Indexes PDFs as an extract -> split -> embed -> add generator pipeline.
+    
+    Chunks are added to the store in batches as soon as they are produced, so the
+    store grows incrementally and peak memory is bounded by
+    batch_size * max_buffered_batches chunks regardless of corpus size.
+    
+    Args:
+        pdf_inputs: Can be a single PDF path, a list of PDF paths, or a folder path
+        chunk_size: Size of text chunks for splitting
+        chunk_overlap: Overlap between chunks
+        model: Embedding model to use
+        batch_size: Number of chunks embedded and added per store call
+        max_buffered_batches: Number of batches the extraction thread may run ahead
+        
+    Returns:
+        Vector store (FAISS for legacy compatibility, or hybrid store)
+    """
+    pdf_files = _collect_pdf_paths(pdf_inputs)
+    if not pdf_files:
+        return None
+    
+    embeddings = get_embeddings(model)
+    embedding_dim = get_embedding_dimension(model, embeddings)
+    logger.info(f"Using embedding model {model} with dimension {embedding_dim}")
+    
+    hybrid_store = None
+    if HYBRID_STORE_AVAILABLE:
+        hybrid_store = HybridVectorStore(embeddings, embedding_dim)
+        vector_store = hybrid_store.create_store_for_size(*_estimate_corpus_size(pdf_files))
+    else:
+        vector_store = new_faiss_store(embeddings, embedding_dim)
+    
+    chunks = iter_chunks(iter_pdf_pages(pdf_files), chunk_size, chunk_overlap)
+    batches = prefetch(iter_batches(chunks, batch_size), max_buffered_batches)
+    
+    total_chunks = 0
+    started = time.perf_counter()
+    for batch in batches:
+        texts = [text for text, _ in batch]
+        metadatas = [metadata for _, metadata in batch]
+        vector_store.add_texts(texts, metadatas=metadatas)
+        total_chunks += len(batch)
+        logger.info(f"Indexed {total_chunks} chunks so far")
+    
+    if total_chunks == 0:
+        logger.warning("No text content extracted from any PDFs")
+        return None
+    
+    logger.info(f"Streamed {total_chunks} text chunks into the index in {time.perf_counter() - started:.2f}s")
+    
+    if hybrid_store is not None:
+        vector_store.store_type = hybrid_store.get_store_type()
+        vector_store.hybrid_manager = hybrid_store
+    
+    return vector_store
+
 def create_hybrid_index(texts_with_metadata: List[Tuple[str, Dict]], 
                        chunk_size: int = 1000, 
                        chunk_overlap: int = 200,
@@ -141,27 +560,17 @@ def create_hybrid_index(texts_with_metadata: List[Tuple[str, Dict]],
         Hybrid vector store or None if creation failed
     """
     try:
-        # Initialize text splitter
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size, 
-            chunk_overlap=chunk_overlap
-        )
-        
         # Process text chunks with metadata
-        documents = []
-        metadata_list = []
-        
-        for text, metadata in texts_with_metadata:
-            chunks = text_splitter.split_text(text)
-            documents.extend(chunks)
-            metadata_list.extend([metadata] * len(chunks))
+        chunks = list(iter_chunks(texts_with_metadata, chunk_size, chunk_overlap))
+        documents = [chunk for chunk, _ in chunks]
+        metadata_list = [metadata for _, metadata in chunks]
         
         logger.info(f"Created {len(documents)} text chunks after splitting")
         
         # Initialize embedding model
-        embeddings = OllamaEmbeddings(model=model)
-        # Test the embedding function
-        embedding_dim = len(embeddings.embed_query("test"))
+        embeddings = get_embeddings(model)
+        # Dimension comes from the model registry; only unknown models are probed
+        embedding_dim = get_embedding_dimension(model, embeddings)
         logger.info(f"Using embedding model {model} with dimension {embedding_dim}")
         
         # Create hybrid vector store
@@ -200,108 +609,371 @@ def create_faiss_index(texts_with_metadata: List[Tuple[str, Dict]],
     Returns:
         FAISS vector store
     """
-    # Initialize text splitter
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size, 
-        chunk_overlap=chunk_overlap
-    )
-    
     # Process text chunks with metadata
-    documents = []
-    metadata_list = []
-    
-    for text, metadata in texts_with_metadata:
-        chunks = text_splitter.split_text(text)
-        documents.extend(chunks)
-        metadata_list.extend([metadata] * len(chunks))
+    chunks = list(iter_chunks(texts_with_metadata, chunk_size, chunk_overlap))
+    documents = [chunk for chunk, _ in chunks]
+    metadata_list = [metadata for _, metadata in chunks]
     
     logger.info(f"Created {len(documents)} text chunks after splitting")
     
     # Initialize embedding model
     try:
-        embeddings = OllamaEmbeddings(model=model)
-        # Test the embedding function
-        embedding_dim = len(embeddings.embed_query("test"))
+        embeddings = get_embeddings(model)
+        # Dimension comes from the model registry; only unknown models are probed
+        embedding_dim = get_embedding_dimension(model, embeddings)
         logger.info(f"Using embedding model {model} with dimension {embedding_dim}")
     except Exception as e:
         logger.error(f"Error initializing embedding model: {str(e)}")
         raise
     
     # Create FAISS index
-    index = faiss.IndexFlatL2(embedding_dim)
-    vector_store = FAISS(
-        embedding_function=embeddings,
-        index=index,
-        docstore=InMemoryDocstore(),
-        index_to_docstore_id={},
-    )
+    # Normalized vectors with inner-product search, so scores are cosine similarities
+    vector_store = new_faiss_store(embeddings, embedding_dim)
     
     # Add documents to vector store
     vector_store.add_texts(documents, metadatas=metadata_list)
-    logger.info(f"Successfully indexed {len(documents)} text chunks")
+    # Move to an approximate index (HNSW/IVF/IVF-PQ) if the corpus is large enough
+    index_type = optimize_faiss_store(vector_store)
+    logger.info(f"Successfully indexed {len(documents)} text chunks ({index_type} index)")
     
     return vector_store
 
-def retrieve_answer(query: str, vector_store, k: int = 3) -> str:
+@dataclass
+class IndexedDocument:
+    """Bookkeeping for one PDF that has been added to an incremental index."""
+    file_name: str
+    content_hash: str
+    chunk_ids: List[str] = field(default_factory=list)
+    upload_batch: Optional[str] = None
+    indexed_at: float = field(default_factory=time.time)
+
+class IncrementalIndexer:
+    """
+    Append-only indexing into a single long-lived vector store.
+    
+    Each PDF is extracted, split and embedded on its own, so adding a document
+    costs time proportional to that document. Files whose content hash is
+    already indexed are skipped, and a document's chunks can be removed by file.
+    """
+    
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200,
+                 model: str = "mxbai-embed-large:latest", namespace: Optional[str] = None):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.model = model
+        self.namespace = namespace  # Pinecone namespace for this index's documents
+        self.vector_store: Optional[Union[FAISS, VectorStore]] = None
+        self.documents: Dict[str, IndexedDocument] = {}
+        self._embeddings = None
+        self._lock = threading.Lock()
+    
+    def _ensure_store(self, texts_with_metadata: List[Tuple[str, Dict]]) -> Union[FAISS, VectorStore]:
+        """Create the vector store on first use, sized from the first upload."""
+        if self.vector_store is not None:
+            return self.vector_store
+        
+        self._embeddings = get_embeddings(self.model)
+        embedding_dim = get_embedding_dimension(self.model, self._embeddings)
+        
+        if HYBRID_STORE_AVAILABLE:
+            hybrid_store = HybridVectorStore(self._embeddings, embedding_dim, self.namespace)
+            vector_store = hybrid_store.create_store(texts_with_metadata)
+            vector_store.store_type = hybrid_store.get_store_type()
+            vector_store.hybrid_manager = hybrid_store
+        else:
+            vector_store = new_faiss_store(self._embeddings, embedding_dim)
+        
+        self.vector_store = vector_store
+        return vector_store
+    
+    def _find_by_hash(self, content_hash: str) -> Optional[IndexedDocument]:
+        for document in self.documents.values():
+            if document.content_hash == content_hash:
+                return document
+        return None
+    
+    def add_pdfs(self, pdf_inputs: Union[str, List[str]]) -> Dict[str, List[str]]:
+        """
+        Adds PDFs to the index, skipping files whose content is already indexed.
+        
+        A file that reuses the name of an indexed document with different
+        content replaces that document's chunks; the old chunks are deleted
+        only after the new ones have been added.
+        
+        Args:
+            pdf_inputs: Can be a single PDF path, a list of PDF paths, or a folder path
+            
+        Returns:
+            Dictionary with "added", "replaced" and "skipped" file names
+        """
+        summary: Dict[str, List[str]] = {"added": [], "replaced": [], "skipped": []}
+        pdf_files = _collect_pdf_paths(pdf_inputs)
+        if not pdf_files:
+            return summary
+        
+        upload_batch = uuid.uuid4().hex[:12]
+        
+        with self._lock:
+            for pdf_path in pdf_files:
+                file_name = os.path.basename(pdf_path)
+                content_hash = file_sha256(pdf_path)
+                
+                duplicate = self._find_by_hash(content_hash)
+                if duplicate is not None:
+                    logger.info(f"Skipping {file_name}: content already indexed as {duplicate.file_name}")
+                    summary["skipped"].append(file_name)
+                    continue
+                
+                texts_with_metadata = extract_text_from_pdf(pdf_path, file_hash=content_hash)
+                if not texts_with_metadata:
+                    summary["skipped"].append(file_name)
+                    continue
+                
+                for _, metadata in texts_with_metadata:
+                    metadata["file_hash"] = content_hash
+                    metadata["upload_batch"] = upload_batch
+                
+                started = time.perf_counter()
+                vector_store = self._ensure_store(texts_with_metadata)
+                chunks = list(iter_chunks(texts_with_metadata, self.chunk_size, self.chunk_overlap))
+                chunk_ids = vector_store.add_texts([text for text, _ in chunks],
+                                                   metadatas=[metadata for _, metadata in chunks])
+                
+                # Old chunks go only once the new version is stored, so a failed add loses nothing
+                previous = self.documents.get(file_name)
+                if previous is not None:
+                    current = set(chunk_ids)
+                    stale_ids = [chunk_id for chunk_id in previous.chunk_ids if chunk_id not in current]
+                    if stale_ids:
+                        vector_store.delete(stale_ids)
+                    logger.info(f"Replaced {len(stale_ids)} chunks of the previous version of {file_name}")
+                    summary["replaced"].append(file_name)
+                else:
+                    summary["added"].append(file_name)
+                
+                self.documents[file_name] = IndexedDocument(
+                    file_name=file_name,
+                    content_hash=content_hash,
+                    chunk_ids=list(chunk_ids),
+                    upload_batch=upload_batch,
+                )
+                logger.info(f"Indexed {len(chunks)} chunks from {file_name} "
+                            f"in {time.perf_counter() - started:.2f}s")
+        
+        return summary
+    
+    def _remove_locked(self, file_name: str) -> bool:
+        document = self.documents.pop(file_name, None)
+        if document is None or self.vector_store is None:
+            return False
+        if document.chunk_ids:
+            self.vector_store.delete(document.chunk_ids)
+        logger.info(f"Removed {len(document.chunk_ids)} chunks of {file_name} from the index")
+        return True
+    
+    def remove_document(self, file_name: str) -> bool:
+        """
+        Deletes all chunks of a previously indexed file.
+        
+        Returns:
+            True if the document was indexed and has been removed
+        """
+        with self._lock:
+            return self._remove_locked(file_name)
+    
+    def list_documents(self) -> List[Dict[str, Any]]:
+        """Indexed documents with their chunk counts."""
+        return [
+            {
+                "file_name": document.file_name,
+                "chunks": len(document.chunk_ids),
+                "upload_batch": document.upload_batch,
+                "indexed_at": document.indexed_at,
+            }
+            for document in self.documents.values()
+        ]
+    
+    def reset(self) -> None:
+        """Forget all documents and drop the vector store."""
+        with self._lock:
+            hybrid_manager = getattr(self.vector_store, 'hybrid_manager', None)
+            if hybrid_manager is not None:
+                hybrid_manager.clear_store()
+            self.vector_store = None
+            self.documents = {}
+
+def _diverse_search(query: str, vector_store, k: int, keyword_search: bool,
+                    embedding: Optional[List[float]] = None,
+                    search_filter: Optional[SearchFilter] = None) -> List[Tuple[Any, float]]:
+    """
+    Over-fetch candidates together with their stored vectors and pick k with
+    MMR. The vectors come back with the search, so no extra embedding calls
+    are made. With keyword search the candidates are fused first, so MMR
+    weighs keyword hits by their fused score rather than by dense similarity.
+    """
+    if embedding is None:
+        embedding = vector_store.embeddings.embed_query(query)
+    fetch_k = max(k * MMR_FETCH_MULTIPLIER, 20)
+    hits = vector_store.similarity_search_with_vectors(embedding, k=fetch_k, search_filter=search_filter)
+    vectors = {getattr(doc, 'id', None): vector for doc, _, vector in hits}
+    docs = [(doc, score) for doc, score, _ in hits]
+    
+    if keyword_search and getattr(vector_store, 'sparse_index', None) is not None:
+        docs = vector_store.hybrid_search_with_score(query, k=fetch_k, fetch_k=fetch_k, dense=docs,
+                                                     search_filter=search_filter)
+    return mmr_select(docs, vectors, k)
+
+def _search(query: str, vector_store, k: int, keyword_search: bool,
+            embedding: Optional[List[float]] = None, mmr: bool = False,
+            search_filter: Optional[SearchFilter] = None) -> List[Tuple[Any, float]]:
+    """
+    Run the search, returning (document, distance) pairs: cosine distance, or
+    the fusion distance of hybrid_search_with_score when keyword hits are fused.
+    """
+    if mmr and hasattr(vector_store, 'similarity_search_with_vectors'):
+        return _diverse_search(query, vector_store, k, keyword_search, embedding, search_filter)
+    
+    # Raw langchain FAISS stores can only post-filter their candidates
+    if isinstance(vector_store, FAISS):
+        if search_filter is not None:
+            docs = vector_store.similarity_search_with_score(
+                query, k=k, filter=lambda metadata: search_filter.matches(metadata))
+        else:
+            docs = vector_store.similarity_search_with_score(query, k=k)
+        return [(doc, to_cosine_distance(vector_store, score)) for doc, score in docs]
+    
+    # Hybrid stores return distances already and filter inside the index
+    if keyword_search and getattr(vector_store, 'sparse_index', None) is not None:
+        return vector_store.hybrid_search_with_score(query, k=k, embedding=embedding, search_filter=search_filter)
+    if embedding is not None:
+        return vector_store.similarity_search_by_vector_with_score(embedding, k=k, search_filter=search_filter)
+    return vector_store.similarity_search_with_score(query, k=k, search_filter=search_filter)
+
+def _cached_search(query: str, vector_store, k: int, keyword_search: bool,
+                  mmr: bool = False, search_filter: Optional[SearchFilter] = None) -> List[Tuple[Any, float]]:
+    """
+    Search through the store's query cache when it has one. Exact repeats are
+    served without embedding the query; with the semantic tier enabled, the
+    query embedding is computed once and reused for the search on a miss.
+    """
+    cache = getattr(vector_store, 'query_cache', None)
+    if cache is None:
+        return _search(query, vector_store, k, keyword_search, mmr=mmr, search_filter=search_filter)
+    
+    params = (k, keyword_search, mmr, search_filter)
+    version = vector_store.version
+    docs = cache.get(query, params, version)
+    if docs is not None:
+        logger.info("Query cache hit")
+        return docs
+    
+    embedding = None
+    if cache.semantic_enabled:
+        embedding = vector_store.embeddings.embed_query(query)
+        docs = cache.get_similar(embedding, params, version)
+        if docs is not None:
+            logger.info("Query cache hit (semantic)")
+            return docs
+    
+    cache.record_miss()
+    docs = _search(query, vector_store, k, keyword_search, embedding, mmr, search_filter)
+    cache.put(query, params, version, docs, embedding)
+    return docs
+
+def retrieve(query: str, vector_store, k: int = 3, min_score: Optional[float] = None,
+             keyword_search: bool = True, rerank: Optional[bool] = None,
+             mmr: Optional[bool] = None, search_filter: Optional[SearchFilter] = None) -> RetrievalResult:
     """
-    Retrieves the most relevant documents based on the query, with metadata.
+    Retrieves the most relevant chunks for the query, with their sources.
     Works with both FAISS and hybrid vector stores.
     
     Args:
         query: The search query
         vector_store: Vector store to search in (FAISS or hybrid)
         k: Number of results to return
+        min_score: Minimum cosine similarity a result needs to be kept, or
+                   minimum normalized fusion score for keyword-fused results
+                   (defaults to RAG_MIN_SIMILARITY)
+        keyword_search: Fuse BM25 keyword hits with vector hits when the store
+                        keeps a sparse index
+        rerank: Over-fetch RERANK_CANDIDATES results and rescore them with a
+                cross-encoder (defaults to RAG_RERANK)
+        mmr: Pick diverse results with maximal marginal relevance, dropping
+             near-duplicate chunks (defaults to RAG_MMR)
+        search_filter: Only search chunks from these files / pages / upload batches
         
     Returns:
-        Formatted string with search results
+        RetrievalResult; when empty, its message says why (NO_RESULTS_MESSAGE
+        if nothing relevant was found)
     """
     if not vector_store:
-        return "No vector store available."
+        return RetrievalResult(query, message="No vector store available.")
+    
+    if min_score is None:
+        min_score = MIN_RELEVANCE_SCORE
     
     logger.info(f"Searching for: '{query}'")
     
     try:
-        # Handle both FAISS and hybrid vector stores
-        if hasattr(vector_store, 'similarity_search_with_score'):
-            docs = vector_store.similarity_search_with_score(query, k=k)
-        else:
+        if not hasattr(vector_store, 'similarity_search_with_score'):
             logger.error("Vector store does not support similarity search")
-            return "Search not supported for this vector store type."
+            return RetrievalResult(query, message="Search not supported for this vector store type.")
         
-        if not docs:
-            return "No relevant information found."
+        reranker = get_reranker() if (RERANK_ENABLED if rerank is None else rerank) else None
+        fetch_k = max(k, RERANK_CANDIDATES) if reranker else k
+        docs = _cached_search(query, vector_store, fetch_k, keyword_search,
+                              MMR_ENABLED if mmr is None else mmr, search_filter)
         
-        results = []
-        for i, (doc, score) in enumerate(docs):
-            metadata = doc.metadata if hasattr(doc, 'metadata') else {}
-            content = doc.page_content if hasattr(doc, 'page_content') else str(doc)
-            
-            # Handle different metadata formats
-            file_name = metadata.get('file_name', 'Unknown')
-            page_num = metadata.get('page_index', 0) + 1 if 'page_index' in metadata else 'Unknown'
-            total_pages = metadata.get('total_pages', 'Unknown')
-            
-            results.append(
-                f"Result {i+1} (Similarity: {1 - score:.4f}):\n"
-                f"File: {file_name}, Page: {page_num}/{total_pages}\n"
-                f"Content: {content.strip()}\n"
-            )
+        if min_score > 0:
+            docs = [(doc, score) for doc, score in docs if 1 - score >= min_score]
         
-        return "\n".join(results)
+        if reranker:
+            docs = reranker.rerank(query, docs, k)
+        
+        if not docs:
+            return RetrievalResult(query, message=NO_RESULTS_MESSAGE)
+        
+        return RetrievalResult(query, [RetrievedChunk.from_scored_document(doc, score) for doc, score in docs])
         
     except Exception as e:
         logger.error(f"Error during retrieval: {str(e)}")
-        return f"Error retrieving information: {str(e)}"
+        return RetrievalResult(query, message=f"Error retrieving information: {str(e)}")
 
-def save_index(vector_store: FAISS, path: str) -> None:
-    """Save the FAISS index to disk"""
-    vector_store.save_local(path)
+def retrieve_answer(query: str, vector_store, k: int = 3, **kwargs) -> str:
+    """
+    Retrieves the most relevant documents as one formatted string.
+    
+    Kept for callers that want text; see retrieve() for the arguments and for
+    structured results.
+    
+    Returns:
+        Formatted string with search results, or NO_RESULTS_MESSAGE if nothing
+        relevant was found
+    """
+    return retrieve(query, vector_store, k, **kwargs).format()
+
+def save_index(vector_store: Union[FAISS, VectorStore], path: str) -> None:
+    """Save a local FAISS index to disk in the memory-mappable format"""
+    if isinstance(vector_store, FAISS):
+        save_faiss_store(vector_store, path)
+    else:
+        vector_store.save_local(path)
     logger.info(f"Index saved to {path}")
 
-def load_index(path: str, model: str = "mxbai-embed-large:latest") -> FAISS:
-    """Load a FAISS index from disk"""
-    embeddings = OllamaEmbeddings(model=model)
-    vector_store = FAISS.load_local(path, embeddings)
+def load_index(path: str, model: str = "mxbai-embed-large:latest", mmap: bool = True) -> FAISS:
+    """
+    Load a FAISS index from disk.
+    
+    Indexes written by save_index are memory-mapped and read chunks lazily, so
+    reopening is fast regardless of size; legacy pickle saves are still supported.
+    Such a store is read-only: call faiss_persistence.make_writable on it
+    before adding or deleting chunks.
+    """
+    embeddings = get_embeddings(model)
+    if is_mmap_format(path):
+        vector_store = load_faiss_store(path, embeddings, mmap=mmap)
+    else:
+        vector_store = FAISS.load_local(path, embeddings)
     logger.info(f"Index loaded from {path}")
     return vector_store
 
@@ -0,0 +1,107 @@
+import os
+import math
+import time
+import logging
+import threading
+from typing import Any, List, Optional, Tuple
+
+# Try to import sentence_transformers (cross-encoder reranking is skipped without it)
+try:
+    from sentence_transformers import CrossEncoder
+    RERANKER_AVAILABLE = True
+except ImportError:
+    RERANKER_AVAILABLE = False
+    logging.warning("sentence_transformers not available. Cross-encoder reranking will be disabled.")
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Reranking is opt-in: the first call loads a model into memory
+RERANK_ENABLED = os.environ.get("RAG_RERANK", "false").lower() == "true"
+RERANK_MODEL = os.environ.get("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", "30"))
+RERANK_BATCH_SIZE = int(os.environ.get("RERANK_BATCH_SIZE", "16"))
+RERANK_BUDGET_MS = float(os.environ.get("RERANK_BUDGET_MS", "500"))
+# Cross-encoder relevance (0-1, sigmoid of the model logit) a candidate needs to be kept
+RERANK_MIN_SCORE = float(os.environ.get("RERANK_MIN_SCORE", "0.01"))
+
+def _sigmoid(logit: float) -> float:
+    """Map a cross-encoder logit to a 0-1 relevance score."""
+    if logit >= 0:
+        return 1.0 / (1.0 + math.exp(-logit))
+    exp = math.exp(logit)
+    return exp / (1.0 + exp)
+
+class CrossEncoderReranker:
+    """
+    Rescores first-pass retrieval candidates with a local cross-encoder on CPU.
+
+    Candidates are scored in batches; if the latency budget runs out before all
+    batches are scored, the original vector order is kept instead.
+    """
+
+    def __init__(self, model_name: str = RERANK_MODEL, batch_size: int = RERANK_BATCH_SIZE,
+                 budget_ms: float = RERANK_BUDGET_MS, min_score: float = RERANK_MIN_SCORE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.min_score = min_score
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        """Load the cross-encoder on first use."""
+        with self._lock:
+            if self._model is None:
+                started = time.perf_counter()
+                self._model = CrossEncoder(self.model_name, device="cpu")
+                logger.info(f"Loaded reranker {self.model_name} in {time.perf_counter() - started:.2f}s")
+            return self._model
+
+    def rerank(self, query: str, candidates: List[Tuple[Any, float]], k: int = 3) -> List[Tuple[Any, float]]:
+        """
+        Reorder (document, distance) candidates by cross-encoder relevance.
+
+        Returns:
+            The best k candidates scoring at least min_score, with their original
+            vector distances; or the first k candidates in vector order if the
+            model fails or the latency budget is exceeded
+        """
+        if not candidates:
+            return []
+        try:
+            model = self._get_model()
+        except Exception as e:
+            logger.error(f"Failed to load reranker, keeping vector order: {str(e)}")
+            return candidates[:k]
+
+        pairs = [(query, doc.page_content) for doc, _ in candidates]
+        started = time.perf_counter()
+        scores: List[float] = []
+        for i in range(0, len(pairs), self.batch_size):
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if i and elapsed_ms > self.budget_ms:
+                logger.warning(f"Rerank budget of {self.budget_ms:.0f}ms exceeded after {i}/{len(pairs)} "
+                               f"candidates, keeping vector order")
+                return candidates[:k]
+            # ms-marco cross-encoders output raw logits, so squash them before thresholding
+            scores.extend(_sigmoid(float(score)) for score in model.predict(pairs[i:i + self.batch_size],
+                                                                            batch_size=self.batch_size))
+
+        ranked = sorted(zip(scores, candidates), key=lambda item: item[0], reverse=True)
+        kept = [candidate for score, candidate in ranked if score >= self.min_score][:k]
+        logger.info(f"Reranked {len(candidates)} candidates in {(time.perf_counter() - started) * 1000:.0f}ms, "
+                    f"kept {len(kept)}")
+        return kept
+
+# Global instance
+_reranker: Optional[CrossEncoderReranker] = None
+
+def get_reranker() -> Optional[CrossEncoderReranker]:
+    """Get the global reranker, or None if sentence_transformers is not installed."""
+    global _reranker
+    if not RERANKER_AVAILABLE:
+        return None
+    if _reranker is None:
+        _reranker = CrossEncoderReranker()
+    return _reranker
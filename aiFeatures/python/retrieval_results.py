@@ -0,0 +1,86 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+@dataclass
+class RetrievedChunk:
+    """One retrieved chunk with its source location."""
+    chunk_id: Optional[str]
+    text: str
+    score: float  # Cosine similarity to the query (higher is better)
+    file_name: str = "Unknown"
+    page: Optional[int] = None  # 1-based page number
+    last_page: Optional[int] = None  # 1-based; set when the chunk runs onto later pages
+    total_pages: Optional[int] = None
+    metadata: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_scored_document(cls, doc: Any, distance: float) -> "RetrievedChunk":
+        """Build from a (document, cosine distance) search hit."""
+        metadata = getattr(doc, 'metadata', None) or {}
+        content = doc.page_content if hasattr(doc, 'page_content') else str(doc)
+        return cls(
+            chunk_id=getattr(doc, 'id', None),
+            text=content.strip(),
+            score=1.0 - distance,
+            file_name=metadata.get('file_name', 'Unknown'),
+            page=metadata['page_index'] + 1 if 'page_index' in metadata else None,
+            last_page=metadata['page_end'] + 1 if 'page_end' in metadata else None,
+            total_pages=metadata.get('total_pages'),
+            metadata=metadata,
+        )
+
+    def format(self, position: int) -> str:
+        """Prompt block for this chunk, numbered from 1."""
+        page = self.page if self.page is not None else 'Unknown'
+        if self.last_page is not None and self.page is not None and self.last_page > self.page:
+            page = f"{self.page}-{self.last_page}"
+        total_pages = self.total_pages if self.total_pages is not None else 'Unknown'
+        return (
+            f"Result {position} (Similarity: {self.score:.4f}):\n"
+            f"File: {self.file_name}, Page: {page}/{total_pages}\n"
+            f"Content: {self.text}\n"
+        )
+
+    def to_dict(self, snippet_chars: int = 300) -> Dict[str, Any]:
+        """Compact citation for the frontend, with the text cut to a snippet."""
+        snippet = self.text if len(self.text) <= snippet_chars else self.text[:snippet_chars].rstrip() + "..."
+        return {
+            "id": self.chunk_id,
+            "file": self.file_name,
+            "page": self.page,
+            "lastPage": self.last_page,
+            "score": round(self.score, 4),
+            "snippet": snippet,
+        }
+
+@dataclass
+class RetrievalResult:
+    """
+    Chunks retrieved for a query. Empty results carry a message explaining why
+    (no store, nothing relevant, or an error); formatting is done on demand.
+    """
+    query: str
+    chunks: List[RetrievedChunk] = field(default_factory=list)
+    message: Optional[str] = None
+
+    def __bool__(self) -> bool:
+        return bool(self.chunks)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def __iter__(self) -> Iterator[RetrievedChunk]:
+        return iter(self.chunks)
+
+    def format(self) -> str:
+        """Numbered prompt context, or the message when nothing was retrieved."""
+        if not self.chunks:
+            return self.message or ""
+        return "\n".join(chunk.format(i) for i, chunk in enumerate(self.chunks, 1))
+
+    def __str__(self) -> str:
+        return self.format()
+
+    def to_payload(self, snippet_chars: int = 300) -> List[Dict[str, Any]]:
+        """Citations sent to the browser."""
+        return [chunk.to_dict(snippet_chars) for chunk in self.chunks]
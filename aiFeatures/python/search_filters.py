@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+@dataclass(frozen=True)
+class SearchFilter:
+    """
+    Metadata restriction for a search: any of the given files, a page range
+    and/or any of the given upload batches. Unset fields do not restrict.
+    A chunk matches the page range if any of its pages (page_index through
+    page_end) falls inside it. Frozen, so it can be part of a query cache key.
+    """
+    file_names: Optional[Tuple[str, ...]] = None
+    pages: Optional[Tuple[int, int]] = None  # 1-based, inclusive
+    upload_batches: Optional[Tuple[str, ...]] = None
+
+    # Metadata fields a filter looks at; stores index chunks by these
+    KEYS = ("file_name", "page_index", "page_end", "upload_batch")
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional["SearchFilter"]:
+        """
+        Parse a request filter such as
+        {"file_names": ["notes.pdf"], "pages": [3, 10], "upload_batches": ["a1b2"]}.
+        Returns None when nothing is restricted.
+        """
+        if not data:
+            return None
+        file_names = data.get("file_names") or ([data["file_name"]] if data.get("file_name") else None)
+        pages = data.get("pages")
+        upload_batches = data.get("upload_batches") or ([data["upload_batch"]] if data.get("upload_batch") else None)
+        if pages is not None:
+            if len(pages) != 2 or int(pages[0]) > int(pages[1]):
+                raise ValueError("pages must be [first, last] with first <= last")
+            pages = (int(pages[0]), int(pages[1]))
+        search_filter = cls(
+            file_names=tuple(file_names) if file_names else None,
+            pages=pages,
+            upload_batches=tuple(upload_batches) if upload_batches else None,
+        )
+        return None if search_filter.is_empty else search_filter
+
+    @property
+    def is_empty(self) -> bool:
+        return self.file_names is None and self.pages is None and self.upload_batches is None
+
+    def matches(self, metadata: Dict[str, Any]) -> bool:
+        """Whether a chunk with this metadata passes the filter."""
+        if self.file_names is not None and metadata.get("file_name") not in self.file_names:
+            return False
+        if self.pages is not None:
+            page_index = metadata.get("page_index")
+            if page_index is None:
+                return False
+            page_end = metadata.get("page_end")
+            if page_end is None:
+                page_end = page_index
+            if page_index + 1 > self.pages[1] or page_end + 1 < self.pages[0]:
+                return False
+        if self.upload_batches is not None and metadata.get("upload_batch") not in self.upload_batches:
+            return False
+        return True
+
+    def to_pinecone(self) -> Dict[str, Any]:
+        """Equivalent Pinecone metadata filter (page_index and page_end are stored 0-based)."""
+        conditions: List[Dict[str, Any]] = []
+        if self.file_names is not None:
+            conditions.append({"file_name": {"$in": list(self.file_names)}})
+        if self.pages is not None:
+            conditions.append({"page_index": {"$lte": self.pages[1] - 1}})
+            # Pinecone has no coalesce; page_end >= page_index, so this is coalesce(page_end, page_index) >= first
+            conditions.append({"$or": [{"page_end": {"$gte": self.pages[0] - 1}},
+                                       {"page_index": {"$gte": self.pages[0] - 1}}]})
+        if self.upload_batches is not None:
+            conditions.append({"upload_batch": {"$in": list(self.upload_batches)}})
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"$and": conditions} if conditions else {}
+
+    def to_sql(self, column: str = "metadata") -> Tuple[str, List[Any]]:
+        """WHERE clause and parameters over a JSON metadata column."""
+        clauses, params = [], []
+        if self.file_names is not None:
+            clauses.append(f"json_extract({column}, '$.file_name') IN ({', '.join('?' * len(self.file_names))})")
+            params.extend(self.file_names)
+        if self.pages is not None:
+            clauses.append(f"json_extract({column}, '$.page_index') <= ? AND "
+                           f"coalesce(json_extract({column}, '$.page_end'), json_extract({column}, '$.page_index')) >= ?")
+            params.extend([self.pages[1] - 1, self.pages[0] - 1])
+        if self.upload_batches is not None:
+            clauses.append(f"json_extract({column}, '$.upload_batch') IN ({', '.join('?' * len(self.upload_batches))})")
+            params.extend(self.upload_batches)
+        return " AND ".join(clauses) or "1", params
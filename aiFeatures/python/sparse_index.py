@@ -0,0 +1,157 @@
+import re
+import math
+import heapq
+import logging
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Words, identifiers (snake_case, dotted names like np.dot) and section numbers like 3.2.1
+TOKEN_PATTERN = re.compile(r"[a-z0-9_]+(?:\.[a-z0-9_]+)*")
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case keyword tokens; dotted names are also indexed part by part."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if "." in token:
+            tokens.extend(part for part in token.split(".") if part)
+    return tokens
+
+class BM25Index:
+    """
+    Okapi BM25 keyword index over chunk ids.
+
+    Postings are stored per term as two parallel typed arrays (document slot,
+    term frequency), so the index costs a few bytes per posting. Chunk text is
+    not kept; callers resolve ids back to documents through their store.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._doc_ids: List[Optional[str]] = []  # slot -> chunk id (None once deleted)
+        self._slots: Dict[str, int] = {}
+        self._doc_lengths = array("I")
+        self._postings: Dict[str, Tuple[array, array]] = {}  # term -> (slots, term frequencies)
+        self._live_docs = 0
+        self._total_length = 0
+        self._dead_slots = 0
+
+    def __len__(self) -> int:
+        return self._live_docs
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> None:
+        """Index texts under their chunk ids."""
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                if doc_id in self._slots:
+                    continue
+                tokens = tokenize(text)
+                slot = len(self._doc_ids)
+                self._doc_ids.append(doc_id)
+                self._slots[doc_id] = slot
+                self._doc_lengths.append(len(tokens))
+                self._live_docs += 1
+                self._total_length += len(tokens)
+
+                counts: Dict[str, int] = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for term, tf in counts.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = (array("I"), array("H"))
+                    postings[0].append(slot)
+                    postings[1].append(min(tf, 65535))
+
+    def delete(self, ids: Iterable[str]) -> None:
+        """Remove chunk ids; postings are compacted once a third of slots are dead."""
+        with self._lock:
+            for doc_id in ids:
+                slot = self._slots.pop(doc_id, None)
+                if slot is None:
+                    continue
+                self._doc_ids[slot] = None
+                self._live_docs -= 1
+                self._total_length -= self._doc_lengths[slot]
+                self._dead_slots += 1
+
+            if self._dead_slots > len(self._doc_ids) // 3:
+                self._compact_locked()
+
+    def clear(self) -> None:
+        """Remove everything."""
+        with self._lock:
+            self._reset()
+
+    def _compact_locked(self) -> None:
+        """Drop postings of deleted chunks and renumber slots."""
+        remap = array("i", [-1]) * len(self._doc_ids)
+        doc_ids: List[Optional[str]] = []
+        doc_lengths = array("I")
+        for slot, doc_id in enumerate(self._doc_ids):
+            if doc_id is not None:
+                remap[slot] = len(doc_ids)
+                doc_ids.append(doc_id)
+                doc_lengths.append(self._doc_lengths[slot])
+
+        postings: Dict[str, Tuple[array, array]] = {}
+        for term, (slots, tfs) in self._postings.items():
+            new_slots, new_tfs = array("I"), array("H")
+            for slot, tf in zip(slots, tfs):
+                if remap[slot] >= 0:
+                    new_slots.append(remap[slot])
+                    new_tfs.append(tf)
+            if new_slots:
+                postings[term] = (new_slots, new_tfs)
+
+        self._doc_ids = doc_ids
+        self._slots = {doc_id: slot for slot, doc_id in enumerate(doc_ids)}
+        self._doc_lengths = doc_lengths
+        self._postings = postings
+        self._dead_slots = 0
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Return up to k (chunk id, BM25 score) pairs, best first."""
+        with self._lock:
+            if not self._live_docs:
+                return []
+            n_docs = self._live_docs
+            avg_length = self._total_length / n_docs or 1.0
+            scores: Dict[int, float] = {}
+
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                slots, tfs = postings
+                idf = math.log(1 + (n_docs - len(slots) + 0.5) / (len(slots) + 0.5))
+                for slot, tf in zip(slots, tfs):
+                    if self._doc_ids[slot] is None:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[slot] / avg_length)
+                    scores[slot] = scores.get(slot, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(self._doc_ids[slot], score) for slot, score in best]
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Merge ranked id lists with reciprocal rank fusion (score = sum of 1 / (k + rank)).
+
+    Returns:
+        (id, fused score) pairs, best first
+    """
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark script for the approximate FAISS index types used by LocalFAISSStore.
+Reports recall@k against the exact flat index, plus build time and query latency.
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import faiss
+
+# Add the aiFeatures/python directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'aiFeatures', 'python'))
+
+from faiss_index_factory import IndexParams, build_trained_index
+
+def make_corpus(n_vectors: int, dim: int, n_clusters: int = 200, seed: int = 0) -> np.ndarray:
+    """Clustered random vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype("float32")
+    labels = rng.integers(0, n_clusters, n_vectors)
+    vectors = centers[labels] + 0.3 * rng.standard_normal((n_vectors, dim)).astype("float32")
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    faiss.normalize_L2(vectors)  # Embeddings are unit length, searched by cosine
+    return vectors
+
+def recall_at_k(approx: np.ndarray, exact: np.ndarray) -> float:
+    """Fraction of the exact top-k found in the approximate top-k."""
+    hits = sum(len(set(a) & set(e)) for a, e in zip(approx, exact))
+    return hits / exact.size
+
+def benchmark(n_vectors: int, dim: int, n_queries: int, k: int, params: IndexParams):
+    print(f"Corpus: {n_vectors} vectors x {dim} dims, {n_queries} queries, k={k}")
+    # Queries are held-out points from the same distribution as the corpus
+    data = make_corpus(n_vectors + n_queries, dim)
+    corpus, queries = data[:n_vectors], data[n_vectors:]
+
+    flat = build_trained_index(corpus, "flat", params)
+    started = time.perf_counter()
+    _, exact = flat.search(queries, k)
+    flat_ms = (time.perf_counter() - started) * 1000 / n_queries
+
+    print(f"{'index':<8}{'build s':>10}{'query ms':>10}{'recall@k':>10}")
+    print(f"{'flat':<8}{0.0:>10.2f}{flat_ms:>10.3f}{1.0:>10.3f}")
+
+    for index_type in ("hnsw", "ivf", "ivfpq"):
+        started = time.perf_counter()
+        index = build_trained_index(corpus, index_type, params)
+        build_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        _, approx = index.search(queries, k)
+        query_ms = (time.perf_counter() - started) * 1000 / n_queries
+
+        print(f"{index_type:<8}{build_s:>10.2f}{query_ms:>10.3f}{recall_at_k(approx, exact):>10.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall/latency benchmark for FAISS index types")
+    parser.add_argument("--vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--ef-search", type=int, default=64)
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(1)  # Per-query latency, as seen by one request
+    params = IndexParams(nprobe=args.nprobe, ef_search=args.ef_search)
+    benchmark(args.vectors, args.dim, args.queries, args.k, params)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark script for Pinecone uploads: the previous embed-everything-then-upsert
+loop against the pipelined uploader used by PineconeStore.add_texts.
+
+Runs against a local stand-in index that simulates request latency, bandwidth
+and transient failures, so no Pinecone account or embedding model is needed.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+
+# Add the aiFeatures/python directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'aiFeatures', 'python'))
+
+from pinecone_upload import PipelinedUploader, estimate_vector_bytes
+
+class TransientError(Exception):
+    """Stand-in for a 503 from the index."""
+    status = 503
+
+class LocalStandInIndex:
+    """In-memory index with the upsert signature of a Pinecone index and simulated network cost."""
+
+    def __init__(self, rtt_ms: float, mb_per_second: float, failure_rate: float, seed: int = 0):
+        self.rtt = rtt_ms / 1000
+        self.bytes_per_second = mb_per_second * 1e6
+        self.failure_rate = failure_rate
+        self.vectors = {}
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors, namespace=None):
+        payload = sum(estimate_vector_bytes(vector) for vector in vectors)
+        time.sleep(self.rtt + payload / self.bytes_per_second)
+        with self._lock:
+            self.requests += 1
+            if self._random.random() < self.failure_rate:
+                raise TransientError("Service Unavailable")
+            for vector in vectors:
+                self.vectors[(namespace, vector["id"])] = vector
+
+class FakeEmbedder:
+    """Embeds with a fixed cost per text, like a local model at steady throughput."""
+
+    def __init__(self, dim: int, ms_per_text: float):
+        self.dim = dim
+        self.seconds_per_text = ms_per_text / 1000
+
+    def embed_documents(self, texts):
+        time.sleep(len(texts) * self.seconds_per_text)
+        return [[random.random() for _ in range(self.dim)] for _ in texts]
+
+def make_texts(n: int, chars: int):
+    words = "gradient descent minimizes the loss by following the negative gradient step by step".split()
+    return [" ".join(random.choice(words) for _ in range(chars // 6))[:chars] for _ in range(n)]
+
+def upload_sequential(index, embedder, texts, ids, metadata):
+    """The previous add_texts: one embedding call, then 100-vector upserts one after another."""
+    embeddings = embedder.embed_documents(texts)
+    vectors = [{"id": ids[i], "values": embeddings[i], "metadata": metadata(i, text)}
+               for i, text in enumerate(texts)]
+    for i in range(0, len(vectors), 100):
+        # The old loop had no retries; retry here so both runs store everything
+        while True:
+            try:
+                index.upsert(vectors=vectors[i:i + 100], namespace="bench")
+                break
+            except TransientError:
+                continue
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput benchmark for Pinecone uploads")
+    parser.add_argument("--chunks", type=int, default=4000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--embed-ms", type=float, default=1.0, help="Embedding cost per chunk")
+    parser.add_argument("--rtt-ms", type=float, default=80.0, help="Round trip per upsert request")
+    parser.add_argument("--mbps", type=float, default=20.0, help="Upload bandwidth per request, MB/s")
+    parser.add_argument("--failure-rate", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    random.seed(0)
+    texts = make_texts(args.chunks, args.chunk_chars)
+    ids = [f"chunk-{i}" for i in range(len(texts))]
+    metadata = lambda i, text: {"file_name": "bench.pdf", "page_index": i // 3, "text": text}
+    embedder = FakeEmbedder(args.dim, args.embed_ms)
+    print(f"{args.chunks} chunks x {args.dim} dims, {args.rtt_ms:.0f}ms RTT, {args.mbps:.0f}MB/s, "
+          f"{args.failure_rate:.0%} transient failures")
+    print(f"{'uploader':<12}{'seconds':>10}{'vectors/s':>12}{'requests':>10}{'stored':>8}")
+
+    index = LocalStandInIndex(args.rtt_ms, args.mbps, args.failure_rate)
+    started = time.perf_counter()
+    upload_sequential(index, embedder, texts, ids, metadata)
+    elapsed = time.perf_counter() - started
+    print(f"{'sequential':<12}{elapsed:>10.2f}{len(texts) / elapsed:>12.1f}{index.requests:>10}{len(index.vectors):>8}")
+
+    index = LocalStandInIndex(args.rtt_ms, args.mbps, args.failure_rate)
+    uploader = PipelinedUploader(index, "bench", concurrency=args.concurrency, retry_backoff=0.05)
+    started = time.perf_counter()
+    uploader.upload(texts, ids, embedder.embed_documents, metadata)
+    elapsed = time.perf_counter() - started
+    print(f"{'pipelined':<12}{elapsed:>10.2f}{len(texts) / elapsed:>12.1f}{index.requests:>10}{len(index.vectors):>8}")
+
+if __name__ == "__main__":
+    main()
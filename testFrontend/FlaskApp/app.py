@@ -1,6 +1,7 @@
 import os
 import re
 import sys
+import hmac
 from flask import Flask, request, jsonify, render_template, session
 from flask_cors import CORS
 import threading
@@ -8,14 +9,27 @@ import tempfile
 
 # Add aiFeatures/python to sys.path for module imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+# aiFeatures/python modules import their siblings by bare name (e.g. hybrid_vector_store)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../aiFeatures/python")))
 
 from aiFeatures.python.ai_response import generate_response_without_retrieval, generate_response_with_retrieval, ChatSessionManager
 from aiFeatures.python.speech_to_text import speech_to_text
 from aiFeatures.python.text_to_speech import say, stop_speech
 from aiFeatures.python.enhanced_web_search import enhanced_web_search, get_search_content_for_ai
-from aiFeatures.python.rag_pipeline import index_pdfs, retrieve_answer
+from aiFeatures.python.rag_pipeline import IncrementalIndexer, retrieve
+from aiFeatures.python.search_filters import SearchFilter
+# Bare module names, so these share the instances the RAG modules import by bare name
+from pinecone_namespaces import namespace_for, get_namespace_manager
+from embedding_cache import get_embedding_cache
 from aiFeatures.python.image_processing import process_image, analyze_image_for_education
 
+# Connect to Pinecone at startup so the first request does not pay for it
+try:
+    from pinecone_config import get_pinecone_config
+    get_pinecone_config().warmup()
+except ImportError:
+    get_pinecone_config = None
+
 app = Flask(__name__)
 app.secret_key = os.urandom(24)  # Add a secret key for sessions
 CORS(app)  # Enable CORS for frontend requests
@@ -24,6 +38,10 @@ CORS(app)  # Enable CORS for frontend requests
 vector_store = None
 session_manager = ChatSessionManager()
 default_session_id = "user_session_001"  # Default session ID
+# Append-only index shared by uploads in this session; Pinecone data lives in the session's namespace
+document_index = IncrementalIndexer(namespace=namespace_for(session_id=default_session_id))
+# Shared secret for the /namespaces admin routes; they are disabled without it
+NAMESPACE_ADMIN_TOKEN = os.environ.get("NAMESPACE_ADMIN_TOKEN", "")
 
 import re
 
@@ -58,20 +76,27 @@ def get_status():
     global vector_store
     
     try:
+        embedding_cache = get_embedding_cache()
+        embedding_cache_stats = embedding_cache.stats() if embedding_cache else None
         if not vector_store:
             return jsonify({
                 "vector_store": None,
                 "store_type": None,
+                "embedding_cache": embedding_cache_stats,
                 "message": "No vector store initialized"
             })
         
         store_type = getattr(vector_store, 'store_type', 'legacy_faiss')
         is_hybrid = hasattr(vector_store, 'hybrid_manager')
+        query_cache = getattr(vector_store, 'query_cache', None)
         
         return jsonify({
             "vector_store": "initialized",
             "store_type": store_type,
             "is_hybrid": is_hybrid,
+            "query_cache": query_cache.stats() if query_cache else None,
+            "embedding_cache": embedding_cache_stats,
+            "pinecone": get_pinecone_config().status() if get_pinecone_config else None,
             "message": f"Vector store active: {store_type}"
         })
     
@@ -84,19 +109,13 @@ def clear_session():
     global vector_store, session_manager
     
     try:
-        # Handle both FAISS and hybrid vector stores
         if vector_store:
-            # Try to clear hybrid store first
-            if hasattr(vector_store, 'hybrid_manager'):
-                try:
-                    hybrid_manager = getattr(vector_store, 'hybrid_manager', None)
-                    if hybrid_manager and hasattr(hybrid_manager, 'clear_store'):
-                        hybrid_manager.clear_store()
-                    store_type = getattr(vector_store, 'store_type', 'unknown')
-                    print(f"Cleared {store_type} vector store")
-                except Exception as e:
-                    print(f"Error clearing hybrid store: {e}")
-            # For legacy FAISS, just reset the reference
+            try:
+                store_type = getattr(vector_store, 'store_type', 'unknown')
+                document_index.reset()
+                print(f"Cleared {store_type} vector store")
+            except Exception as e:
+                print(f"Error clearing vector store: {e}")
             vector_store = None
         
         # Clear the session for this user
@@ -110,7 +129,7 @@ def clear_session():
 
 @app.route("/initialize-rag", methods=["POST"])
 def initialize_rag():
-    """Handles indexing PDFs from uploaded files or a folder path."""
+    """Adds PDFs from uploaded files or a folder path to the session's index."""
     global vector_store
     
     try:
@@ -125,27 +144,112 @@ def initialize_rag():
                         file.save(file_path)
                         file_paths.append(file_path)
 
-                if len(file_paths) == 1:
-                    vector_store = index_pdfs(file_paths[0])  # Using unified index_pdfs function
-                else:
-                    vector_store = index_pdfs(file_paths)  # Using unified index_pdfs function
+                # Only new or changed files are extracted and embedded
+                summary = document_index.add_pdfs(file_paths)
         
         elif 'folder' in request.form:
             folder_path = request.form.get('folder')
             if folder_path:
-                vector_store = index_pdfs(folder_path)  # Using unified index_pdfs function
+                summary = document_index.add_pdfs(folder_path)
             else:
                 return jsonify({"success": False, "message": "Invalid folder path"}), 400
         
         else:
             return jsonify({"success": False, "message": "No files or folder provided"}), 400
         
-        return jsonify({"success": True, "message": "RAG initialized successfully"})
+        vector_store = document_index.vector_store
+        return jsonify({"success": True, "message": "RAG initialized successfully", **summary})
     
     except Exception as e:
         print(f"RAG initialization error: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
 
+@app.route("/documents", methods=["GET"])
+def list_documents():
+    """Lists the documents currently indexed in this session."""
+    return jsonify({"documents": document_index.list_documents()})
+
+@app.route("/remove-document", methods=["POST"])
+def remove_document():
+    """Removes one indexed PDF's chunks from the vector store."""
+    data = request.json if request.json else {}
+    file_name = data.get("file_name")
+    
+    if not file_name:
+        return jsonify({"success": False, "message": "No file_name provided"}), 400
+    
+    try:
+        if document_index.remove_document(file_name):
+            return jsonify({"success": True, "message": f"Removed {file_name}"})
+        return jsonify({"success": False, "message": f"{file_name} is not indexed"}), 404
+    
+    except Exception as e:
+        print(f"Error removing document: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+def admin_token_error():
+    """
+    Error response unless the X-Admin-Token header matches NAMESPACE_ADMIN_TOKEN;
+    admin routes are disabled while that is unset.
+    """
+    if not NAMESPACE_ADMIN_TOKEN:
+        return jsonify({"success": False, "message": "Namespace administration is disabled"}), 403
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), NAMESPACE_ADMIN_TOKEN):
+        return jsonify({"success": False, "message": "Invalid admin token"}), 401
+    return None
+
+@app.route("/namespaces", methods=["GET"])
+def list_namespaces():
+    """
+    Lists Pinecone namespaces with their vector counts and last use.
+    
+    Admin only, like /namespaces/expire: namespace names identify sessions,
+    users and courses.
+    """
+    error = admin_token_error()
+    if error is not None:
+        return error
+    
+    try:
+        return jsonify({"namespaces": get_namespace_manager().list_namespaces()})
+    except Exception as e:
+        print(f"Error listing namespaces: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route("/namespaces/expire", methods=["POST"])
+def expire_namespaces():
+    """
+    Deletes Pinecone namespaces that have been idle for max_idle_hours.
+    
+    Admin only: requires the X-Admin-Token header to match NAMESPACE_ADMIN_TOKEN
+    (the route is disabled when that is unset). The current session's
+    namespace is never expired.
+    
+    Idle times come from this host's namespace registry, which only sees
+    activity on this host. When several app servers share one Pinecone index,
+    run expiry on a single host that serves all namespaces (or not at all),
+    or namespaces in use elsewhere may be deleted.
+    """
+    error = admin_token_error()
+    if error is not None:
+        return error
+    
+    data = request.json if request.json else {}
+    
+    try:
+        max_idle_hours = float(data.get("max_idle_hours", 72))
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "message": "max_idle_hours must be a number"}), 400
+    if not max_idle_hours > 0:
+        return jsonify({"success": False, "message": "max_idle_hours must be greater than 0"}), 400
+    
+    try:
+        expired = get_namespace_manager().expire_idle(max_idle_hours * 3600, keep=[document_index.namespace])
+        return jsonify({"success": True, "expired": expired})
+    except Exception as e:
+        print(f"Error expiring namespaces: {e}")
+        return jsonify({"success": False, "message": str(e)}), 500
+
 @app.route("/process-image", methods=["POST"])
 def process_image_endpoint():
     """Handles image processing and returns AI analysis of the image."""
@@ -329,6 +433,11 @@ def enhanced_search():
             "error": f"Search failed: {str(e)}"
         }), 500
 
+def get_token_usage(session_id):
+    """Input tokens spent by the last LLM calls of a session."""
+    chat_session = session_manager.get_session(session_id)
+    return chat_session.metadata.get("token_usage") if chat_session else None
+
 @app.route("/ask", methods=["POST"])
 def ask():
     """Handles text input and returns AI response with chat history management."""
@@ -340,15 +449,22 @@ def ask():
         return jsonify({"error": "No input provided"}), 400
 
     try:
-        # Get retrieved information if vector store exists
-        retrieved_info = retrieve_answer(user_query, vector_store) if vector_store else ""
+        # Optional restriction to some documents, e.g. {"file_names": ["notes.pdf"], "pages": [3, 10]}
+        search_filter = SearchFilter.from_dict(data.get("filter"))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid filter: {str(e)}"}), 400
+
+    try:
+        # Get retrieved chunks if vector store exists
+        retrieval = retrieve(user_query, vector_store, search_filter=search_filter) if vector_store else None
         
-        # Generate response based on whether retrieval was performed
-        if retrieved_info:
+        # Generate response based on whether retrieval found anything relevant;
+        # if not, skip the two-LLM retrieval chain
+        if retrieval:
             response = generate_response_with_retrieval(
                 default_session_id, 
                 user_query,
-                retrieved_info, 
+                retrieval, 
                 session_manager
             )
             
@@ -356,8 +472,9 @@ def ask():
 
             return jsonify({
                 "response": response,
-                "retrieved": retrieved_info,
-                "hasRetrieval": bool(retrieved_info)
+                "retrieved": retrieval.to_payload(),  # Citations only, not the full prompt context
+                "hasRetrieval": True,
+                "tokenUsage": get_token_usage(default_session_id)
             })
             
         else:
@@ -376,7 +493,8 @@ def ask():
                 "response": response,
                 "scraped": scraped_text,
                 "hasScraping": bool(scraped_text),
-                "showSourcesSeparately": True  # Flag to indicate sources should be shown separately
+                "showSourcesSeparately": True,  # Flag to indicate sources should be shown separately
+                "tokenUsage": get_token_usage(default_session_id)
             })
     
     except Exception as e:
@@ -847,7 +847,7 @@ function displayAIResponse(data) {
   if (data.hasRetrieval && data.retrieved) {
     let retrievalInfo = document.createElement("div");
     retrievalInfo.className = "retrieval-info modern-style";
-    retrievalInfo.innerHTML = createModernScrapedInfo(data.retrieved);
+    retrievalInfo.innerHTML = createRetrievedChunksInfo(data.retrieved);
     chatBox.appendChild(retrievalInfo);
   }
 
@@ -1618,6 +1618,54 @@ function createModernScrapedInfo(scrapedData) {
     `;
 }
 
+function createRetrievedChunksInfo(chunks) {
+  // chunks: [{id, file, page, lastPage, score, snippet}] from /ask
+  const items = chunks
+    .map(
+      (chunk, index) => `
+            <div class="source-item">
+                <div class="source-number">${index + 1}</div>
+                <div class="source-content">
+                    <div class="source-title">${escapeHtml(
+                      truncateText(chunk.file, 60)
+                    )}${
+                      chunk.page
+                        ? chunk.lastPage && chunk.lastPage > chunk.page
+                          ? `, pages ${chunk.page}-${chunk.lastPage}`
+                          : `, page ${chunk.page}`
+                        : ""
+                    }</div>
+                    <div class="source-domain">Similarity ${chunk.score.toFixed(
+                      2
+                    )}</div>
+                    <div class="summary-text">${escapeHtml(chunk.snippet)}</div>
+                </div>
+            </div>`
+    )
+    .join("");
+
+  return `
+        <div class="modern-scraped-container">
+            <div class="modern-scraped-header" onclick="toggleModernScrapedInfo(this)">
+                <div class="scraped-header-content">
+                    <span class="scraped-title">Document Excerpts</span>
+                    <div class="scraped-count">${chunks.length} excerpts</div>
+                </div>
+                <div class="scraped-toggle">
+                    <svg width="16" height="16" viewBox="0 0 24 24" fill="none" xmlns="http://www.w3.org/2000/svg">
+                        <polyline points="6,9 12,15 18,9" stroke="currentColor" stroke-width="2" fill="none"/>
+                    </svg>
+                </div>
+            </div>
+            <div class="modern-scraped-content">
+                <div class="scraped-sources">
+                    <div class="sources-list">${items}</div>
+                </div>
+            </div>
+        </div>
+    `;
+}
+
 function createSourceItem(source) {
   const favicon = `https://www.google.com/s2/favicons?domain=${source.domain}&sz=16`;
   const domainIcon = getDomainSpecificIcon(source.domain);
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script for the compact, interned chunk store that backs local FAISS indexes.
+"""
+
+import os
+import sys
+import logging
+from langchain_core.documents import Document
+
+# Add the aiFeatures/python directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'aiFeatures', 'python'))
+
+from chunk_store import CompactDocstore
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def file_chunks(file_name, pages=5, chunks_per_page=4, upload_batch="b1"):
+    """Chunks of one file, keyed by id, with file-, page- and chunk-level metadata."""
+    chunks = {}
+    for page in range(pages):
+        for i in range(chunks_per_page):
+            offset = (page * chunks_per_page + i) * 100
+            chunks[f"{file_name}-{offset}"] = Document(
+                page_content=f"{file_name} page {page} chunk {i}",
+                metadata={"file_name": file_name, "file_hash": f"hash-{file_name}", "upload_batch": upload_batch,
+                          "page_index": page, "page_end": page, "chunk_offset": offset})
+    return chunks
+
+def test_metadata_round_trips():
+    """Documents come back with exactly the metadata they were added with."""
+    store = CompactDocstore()
+    chunks = file_chunks("a.pdf")
+    store.add(chunks)
+    for doc_id, doc in chunks.items():
+        found = store.search(doc_id)
+        assert found.page_content == doc.page_content
+        assert found.metadata == doc.metadata, f"{found.metadata} != {doc.metadata}"
+    usage = store.memory_usage()
+    assert usage["file_records"] == 1 and usage["page_records"] == 5, usage
+    logger.info(f"✓ 20 chunks stored with {usage['page_records']} page records")
+
+def test_records_are_reclaimed():
+    """Replacing a file over and over does not grow the interned records."""
+    store = CompactDocstore()
+    store.add(file_chunks("keep.pdf"))
+    for round_number in range(50):
+        chunks = file_chunks("replaced.pdf", upload_batch=f"batch-{round_number}")
+        store.add(chunks)
+        store.delete(list(chunks))
+
+    usage = store.memory_usage()
+    assert usage["chunks"] == 20
+    assert usage["file_records"] == 1 and usage["page_records"] == 5, usage
+    assert len(store._files) <= 2 and len(store._pages) <= 10, "freed record ids were not reused"
+    assert store.search("keep.pdf-0").metadata["file_name"] == "keep.pdf"
+    logger.info("✓ 50 add/delete rounds left only the live file's records")
+
+def test_value_types_are_kept_apart():
+    """True, 1 and 1.0 are interned as different values."""
+    store = CompactDocstore()
+    store.add({
+        "bool": Document(page_content="x", metadata={"file_name": "f", "ocr": True}),
+        "int": Document(page_content="y", metadata={"file_name": "f", "ocr": 1}),
+        "float": Document(page_content="z", metadata={"file_name": "f", "ocr": 1.0}),
+    })
+    assert store.metadata("bool")["ocr"] is True
+    assert type(store.metadata("int")["ocr"]) is int
+    assert type(store.metadata("float")["ocr"]) is float
+    logger.info("✓ Metadata values keep their types")
+
+if __name__ == "__main__":
+    logger.info("=== Chunk Store Test ===")
+    tests = [test_metadata_round_trips, test_records_are_reclaimed, test_value_types_are_kept_apart]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"✗ {test.__name__}: {e}")
+
+    if failed:
+        logger.error(f"\n❌ {failed} of {len(tests)} tests failed.")
+        sys.exit(1)
+    logger.info(f"\n🎉 All {len(tests)} tests passed!")
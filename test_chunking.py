@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test script for the structure-aware chunker: chunks across page breaks and
+incremental splitting of long page streams.
+"""
+
+import os
+import sys
+import logging
+
+# Add the aiFeatures/python directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'aiFeatures', 'python'))
+
+from chunking import DocumentChunker
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def make_page(file_name, page_index, sentences=6):
+    text = " ".join(f"Sentence {i} on page {page_index} explains one more step of gradient descent."
+                    for i in range(sentences))
+    return text, {"file_name": file_name, "file_path": f"/docs/{file_name}", "page_index": page_index}
+
+def test_sentence_across_page_break_stays_whole():
+    """A sentence broken by a page break ends up in one chunk that records both pages."""
+    pages = [
+        ("Chapter 1 Optimization\nGradient descent updates the weights after every batch and the", make_page("a.pdf", 0)[1]),
+        ("learning rate controls how far each step moves. Momentum smooths the updates.", make_page("a.pdf", 1)[1]),
+    ]
+    chunks = DocumentChunker(chunk_size=1000, chunk_overlap=100).split_document(pages)
+    assert len(chunks) == 1
+    text, metadata = chunks[0]
+    assert "batch and the\nlearning rate controls" in text
+    assert metadata["page_index"] == 0 and metadata["page_end"] == 1, metadata
+    assert metadata["chunk_offset"] == 0
+    logger.info("✓ Sentence over the page break kept whole, pages 1-2 recorded")
+
+def test_pages_are_split_incrementally():
+    """Chunks are yielded long before the last page of a long document is read."""
+    consumed = []
+
+    def pages():
+        for page_index in range(500):
+            consumed.append(page_index)
+            yield make_page("long.pdf", page_index)
+        yield make_page("short.pdf", 0)
+
+    chunker = DocumentChunker(chunk_size=500, chunk_overlap=100)
+    stream = chunker.split_pages(pages())
+    first_text, first_metadata = next(stream)
+    pages_read = len(consumed)
+    assert pages_read < 10, f"first chunk needed {pages_read} pages"
+    assert first_metadata["chunk_offset"] == 0
+
+    chunks = [(first_text, first_metadata)] + list(stream)
+    documents = [make_page("long.pdf", page_index) for page_index in range(500)]
+    assert chunks[:-1] == chunker.split_document(documents), "streamed chunks differ from one-shot splitting"
+    assert chunks[-1][1]["file_name"] == "short.pdf"
+    offsets = [metadata["chunk_offset"] for _, metadata in chunks[:-1]]
+    assert offsets == sorted(offsets) and len(set(offsets)) == len(offsets)
+    logger.info(f"✓ First of {len(chunks)} chunks came after reading {pages_read} pages")
+
+if __name__ == "__main__":
+    logger.info("=== Chunking Test ===")
+    tests = [test_sentence_across_page_break_stays_whole, test_pages_are_split_incrementally]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"✗ {test.__name__}: {e}")
+
+    if failed:
+        logger.error(f"\n❌ {failed} of {len(tests)} tests failed.")
+        sys.exit(1)
+    logger.info(f"\n🎉 All {len(tests)} tests passed!")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test script for the persistent embedding cache and the batched embedding client.
+Uses a counting fake embedder, so no Ollama server is needed.
+"""
+
+import os
+import sys
+import logging
+import tempfile
+
+# Add the aiFeatures/python directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'aiFeatures', 'python'))
+
+from embedding_cache import EmbeddingCache
+from embedding_client import BatchedEmbeddings
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class CountingEmbeddings:
+    """Deterministic 4-dim embeddings that count how many texts were embedded."""
+
+    def __init__(self, model="mxbai-embed-large:latest"):
+        self.model = model
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return [[float(len(text)), float(sum(map(ord, text)) % 97), 1.0, 0.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def new_cache(**kwargs):
+    return EmbeddingCache(path=os.path.join(tempfile.mkdtemp(), "embeddings.sqlite3"), **kwargs)
+
+def test_hits_skip_the_embedder():
+    """Only texts missing from the cache are embedded, each once."""
+    cache = new_cache()
+    embedder = CountingEmbeddings()
+    client = BatchedEmbeddings(embedder, cache=cache)
+
+    first = client.embed_documents(["alpha", "beta", "alpha"])
+    assert embedder.embedded == 2, f"embedded {embedder.embedded} texts for 2 distinct ones"
+    second = client.embed_documents(["beta", "alpha", "gamma"])
+    assert embedder.embedded == 3, "cached texts were embedded again"
+    assert second[0] == first[1] and second[1] == first[0]
+
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 4, stats
+    logger.info(f"✓ Cache served repeats without embedding: {stats}")
+
+def test_latest_tag_shares_entries():
+    """"name" and "name:latest" address the same cache entries."""
+    cache = new_cache()
+    BatchedEmbeddings(CountingEmbeddings("mxbai-embed-large:latest"), cache=cache).embed_documents(["chunk"])
+    embedder = CountingEmbeddings("mxbai-embed-large")
+    BatchedEmbeddings(embedder, cache=cache).embed_documents(["chunk"])
+    assert embedder.embedded == 0, "the untagged model name missed the cache"
+    logger.info("✓ Model names with and without :latest share cache entries")
+
+def test_size_is_bounded():
+    """The cache evicts least-recently-used vectors once over its byte budget."""
+    cache = new_cache(max_size_mb=1024 / (1024 * 1024))  # 1KB = 64 four-dim vectors
+    vectors = [[float(i)] * 4 for i in range(200)]
+    cache.put_many("model", [f"text {i}" for i in range(200)], vectors)
+
+    stats = cache.stats()
+    assert stats["size_mb"] <= stats["max_size_mb"], stats
+    assert stats["evictions"] > 0
+    assert cache.get_many("model", ["text 199"])[0] == vectors[199], "most recent entry was evicted"
+    logger.info(f"✓ Cache stayed within budget after {stats['evictions']} evictions")
+
+if __name__ == "__main__":
+    logger.info("=== Embedding Cache Test ===")
+    tests = [test_hits_skip_the_embedder, test_latest_tag_shares_entries, test_size_is_bounded]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"✗ {test.__name__}: {e}")
+
+    if failed:
+        logger.error(f"\n❌ {failed} of {len(tests)} tests failed.")
+        sys.exit(1)
+    logger.info(f"\n🎉 All {len(tests)} tests passed!")
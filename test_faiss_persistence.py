@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test script for saving, memory-mapping and reloading local FAISS indexes.
+Uses deterministic bag-of-words embeddings, so no Ollama server is needed.
+"""
+
+import os
+import sys
+import hashlib
+import logging
+import tempfile
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Add the aiFeatures/python directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'aiFeatures', 'python'))
+
+from faiss_index_factory import IndexParams
+from hybrid_vector_store import LocalFAISSStore
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DIM = 32
+
+class WordEmbeddings(Embeddings):
+    """Sum of fixed random vectors per word: texts sharing words are similar."""
+
+    def _embed(self, text):
+        vector = np.zeros(DIM, dtype="float32")
+        for word in text.lower().split():
+            seed = int.from_bytes(hashlib.sha256(word.encode("utf-8")).digest()[:4], "little")
+            vector += np.random.default_rng(seed).standard_normal(DIM).astype("float32")
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+def make_texts(count, start=0):
+    return [f"chunk {i} topic{i % 7} word{i} filler text" for i in range(start, start + count)]
+
+def ivf_params():
+    return IndexParams(index_type="ivf", nlist=4, nprobe=4)
+
+def top_text(store, query):
+    return store.similarity_search_with_score(query, k=1)[0][0].page_content
+
+def test_ivf_round_trip_add_and_delete():
+    """A memory-mapped IVF index can be changed after loading without touching the saved copy."""
+    path = tempfile.mkdtemp()
+    store = LocalFAISSStore(WordEmbeddings(), DIM, ivf_params())
+    ids = store.add_texts(make_texts(300))
+    assert store.index_type == "ivf", f"expected an IVF index, got {store.index_type}"
+    store.save_local(path)
+
+    loaded = LocalFAISSStore.load_local(path, WordEmbeddings(), mmap=True, index_params=ivf_params())
+    assert loaded.index_type == "ivf"
+    assert top_text(loaded, "chunk 42 topic0 word42") == make_texts(1, 42)[0]
+
+    new_ids = loaded.add_texts(make_texts(20, start=300))
+    assert loaded.delete(ids[:50]), "delete after load failed"
+    assert len(loaded.vector_store.index_to_docstore_id) == loaded.vector_store.index.ntotal == 270
+
+    # Every search hit must resolve to a live chunk, including ones past the deleted range
+    for i in (60, 150, 299, 310):
+        assert top_text(loaded, f"chunk {i} topic{i % 7} word{i}") == make_texts(1, i)[0]
+    assert all(doc.page_content != make_texts(1, 10)[0]
+               for doc, _ in loaded.similarity_search_with_score("chunk 10 topic3 word10", k=5))
+
+    # The saved files still describe the original index
+    original = LocalFAISSStore.load_local(path, WordEmbeddings())
+    assert original.vector_store.index.ntotal == 300
+    assert top_text(original, "chunk 10 topic3 word10") == make_texts(1, 10)[0]
+
+    # Saving the changed store and reloading keeps it consistent
+    changed_path = tempfile.mkdtemp()
+    loaded.save_local(changed_path)
+    reloaded = LocalFAISSStore.load_local(changed_path, WordEmbeddings())
+    assert reloaded.vector_store.index.ntotal == 270
+    assert top_text(reloaded, "chunk 310 topic2 word310") == make_texts(1, 310)[0]
+    assert len(reloaded.get_documents(new_ids)) == 20
+    logger.info("✓ IVF index survived save -> mmap load -> add -> delete -> save -> reload")
+
+def test_flat_delete_keeps_positions_in_sync():
+    """Deleting from a loaded flat index renumbers positions without stale lookups."""
+    path = tempfile.mkdtemp()
+    store = LocalFAISSStore(WordEmbeddings(), DIM, IndexParams(index_type="flat"))
+    ids = store.add_texts(make_texts(40))
+    store.save_local(path)
+
+    loaded = LocalFAISSStore.load_local(path, WordEmbeddings())
+    assert loaded.delete(ids[5:10])
+    loaded.delete(ids[20:25])
+    for i in (0, 12, 30, 39):
+        assert top_text(loaded, f"chunk {i} topic{i % 7} word{i}") == make_texts(1, i)[0]
+    assert LocalFAISSStore.load_local(path, WordEmbeddings()).vector_store.index.ntotal == 40
+    logger.info("✓ Flat deletes after load kept positions and ids in step")
+
+def test_reloaded_store_keeps_keyword_search():
+    """BM25 keyword search is rebuilt for a reloaded index."""
+    path = tempfile.mkdtemp()
+    store = LocalFAISSStore(WordEmbeddings(), DIM, IndexParams(index_type="flat"))
+    store.add_texts(make_texts(30) + ["the backpropagation algorithm computes gradients"])
+    store.save_local(path)
+
+    loaded = LocalFAISSStore.load_local(path, WordEmbeddings())
+    assert loaded.sparse_index is not None and len(loaded.sparse_index) == 31
+    hits = loaded.sparse_index.search("backpropagation", 1)
+    assert loaded.get_documents([hits[0][0]])[0].page_content.startswith("the backpropagation")
+    logger.info("✓ Reloaded store rebuilt its keyword index")
+
+if __name__ == "__main__":
+    logger.info("=== FAISS Persistence Test ===")
+    tests = [test_ivf_round_trip_add_and_delete, test_flat_delete_keeps_positions_in_sync,
+             test_reloaded_store_keeps_keyword_search]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"✗ {test.__name__}: {e}")
+
+    if failed:
+        logger.error(f"\n❌ {failed} of {len(tests)} tests failed.")
+        sys.exit(1)
+    logger.info(f"\n🎉 All {len(tests)} tests passed!")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test script for hybrid (dense + BM25) search over a local FAISS store.
+Uses deterministic bag-of-words embeddings, so no Ollama server is needed.
+"""
+
+import os
+import sys
+import hashlib
+import logging
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Add the aiFeatures/python directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'aiFeatures', 'python'))
+
+from faiss_index_factory import IndexParams
+from hybrid_vector_store import LocalFAISSStore
+from diversity import mmr_select
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DIM = 32
+
+# Words embedded like another word, so chunks can be dense hits without sharing keywords
+ALIASES = {"adam": "optimizer", "sgd": "optimizer"}
+
+class WordEmbeddings(Embeddings):
+    """Sum of fixed random vectors per word: texts sharing words (or aliases) are similar."""
+
+    def _embed(self, text):
+        vector = np.zeros(DIM, dtype="float32")
+        for word in text.lower().split():
+            word = ALIASES.get(word, word)
+            seed = int.from_bytes(hashlib.sha256(word.encode("utf-8")).digest()[:4], "little")
+            vector += np.random.default_rng(seed).standard_normal(DIM).astype("float32")
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+QUERY = "gradient descent optimizer backpropagation"
+KEYWORD_TEXT = "backpropagation lecture notes for week three"
+
+def make_store():
+    store = LocalFAISSStore(WordEmbeddings(), DIM, IndexParams(index_type="flat"))
+    texts = [f"gradient descent optimizer step {i}" for i in range(30)]
+    texts += [f"unrelated filler about topic{i} and more filler" for i in range(30)]
+    ids = store.add_texts(texts + [KEYWORD_TEXT])
+    return store, ids[-1]
+
+def test_keyword_hits_keep_their_fused_score():
+    """A keyword-only hit is scored by its fused rank, not by the worst dense score."""
+    store, keyword_id = make_store()
+    dense = store.similarity_search_with_score(QUERY, k=3)
+    assert keyword_id not in [doc.id for doc, _ in dense], "keyword chunk should not be a dense hit"
+
+    results = store.hybrid_search_with_score(QUERY, k=5, fetch_k=3)
+    scores = {doc.id: score for doc, score in results}
+    assert keyword_id in scores, "keyword-only hit was not fused in"
+    assert [score for _, score in results] == sorted(scores.values()), "scores disagree with fused order"
+
+    # Ranked first by BM25, it beats the dense hits that only one search found
+    assert scores[keyword_id] < max(scores.values())
+    assert all(0.0 <= score < 1.0 for score in scores.values())
+    logger.info(f"✓ Keyword-only hit scored {scores[keyword_id]:.4f} by its fused rank")
+
+def test_exact_keyword_hit_survives_mmr():
+    """MMR over fused candidates keeps a keyword hit that dense search ranks nowhere."""
+    store = LocalFAISSStore(WordEmbeddings(), DIM, IndexParams(index_type="flat"))
+    texts = [f"adam sgd variant {i}" for i in range(20)]
+    texts += [f"unrelated filler about topic{i} and more filler" for i in range(30)]
+    keyword_id = store.add_texts(texts + [KEYWORD_TEXT])[-1]
+    query = "optimizer backpropagation"
+    embedding = store.embeddings.embed_query(query)
+
+    # The same steps as rag_pipeline._diverse_search
+    hits = store.similarity_search_with_vectors(embedding, k=10)
+    vectors = {doc.id: vector for doc, _, vector in hits}
+    dense = [(doc, score) for doc, score, _ in hits]
+    assert keyword_id not in vectors, "keyword chunk should not be a dense hit"
+    fused = store.hybrid_search_with_score(query, k=10, fetch_k=10, dense=dense)
+    selected = mmr_select(fused, vectors, 3)
+
+    ids = [doc.id for doc, _ in selected]
+    assert keyword_id in ids, "MMR dropped the exact keyword hit"
+    assert ids[0] == fused[0][0].id, "MMR did not start from the best fused hit"
+    logger.info(f"✓ Keyword hit selected at position {ids.index(keyword_id) + 1} of 3 after MMR")
+
+if __name__ == "__main__":
+    logger.info("=== Hybrid Search Test ===")
+    tests = [test_keyword_hits_keep_their_fused_score, test_exact_keyword_hit_survives_mmr]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"✗ {test.__name__}: {e}")
+
+    if failed:
+        logger.error(f"\n❌ {failed} of {len(tests)} tests failed.")
+        sys.exit(1)
+    logger.info(f"\n🎉 All {len(tests)} tests passed!")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script for the Pinecone namespace registry and idle-namespace expiry.
+Uses an in-memory fake index, so no account or network access is needed.
+"""
+
+import os
+import sys
+import time
+import logging
+import tempfile
+
+# Add the aiFeatures/python directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'aiFeatures', 'python'))
+
+from pinecone_namespaces import DEFAULT_NAMESPACE, NamespaceManager
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class FakeIndex:
+    """Records namespace deletions and reports a vector count per namespace."""
+
+    def __init__(self, counts):
+        self.counts = dict(counts)
+        self.deleted = []
+
+    def describe_index_stats(self):
+        return {"namespaces": {name: {"vector_count": count} for name, count in self.counts.items()}}
+
+    def delete(self, delete_all, namespace):
+        self.deleted.append(namespace)
+        self.counts.pop(namespace, None)
+
+def make_manager(index):
+    return NamespaceManager(index_provider=lambda: index,
+                            path=os.path.join(tempfile.mkdtemp(), "namespaces.sqlite3"))
+
+def age(manager, namespace, hours):
+    """Pretend a namespace was last used hours ago."""
+    manager._conn.execute("UPDATE namespaces SET last_used = ? WHERE name = ?",
+                          (time.time() - hours * 3600, namespace))
+    manager._conn.commit()
+
+def test_only_idle_unprotected_namespaces_expire():
+    """Idle namespaces are deleted; default, held and kept ones survive."""
+    names = [DEFAULT_NAMESPACE, "session-old", "session-held", "session-kept", "session-recent"]
+    index = FakeIndex({name: 10 for name in names})
+    manager = make_manager(index)
+    for name in names:
+        manager.create(name)
+        if name != "session-recent":
+            age(manager, name, 100)
+    manager.hold("session-held")
+
+    expired = manager.expire_idle(72 * 3600, keep=["session-kept"])
+    assert expired == ["session-old"] and index.deleted == ["session-old"], expired
+    listed = {item["namespace"] for item in manager.list_namespaces()}
+    assert "session-old" not in listed and "session-recent" in listed
+
+    manager.release("session-held")
+    assert manager.expire_idle(72 * 3600, keep=["session-kept"]) == ["session-held"]
+    logger.info("✓ Only idle, unheld namespaces outside keep were expired")
+
+def test_non_positive_idle_time_is_rejected():
+    """An idle time of zero would expire every namespace, so it is refused."""
+    manager = make_manager(FakeIndex({}))
+    for value in (0, -1):
+        try:
+            manager.expire_idle(value)
+            raise AssertionError(f"expire_idle({value}) was accepted")
+        except ValueError:
+            pass
+    logger.info("✓ Non-positive idle times rejected")
+
+if __name__ == "__main__":
+    logger.info("=== Pinecone Namespace Test ===")
+    tests = [test_only_idle_unprotected_namespaces_expire, test_non_positive_idle_time_is_rejected]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"✗ {test.__name__}: {e}")
+
+    if failed:
+        logger.error(f"\n❌ {failed} of {len(tests)} tests failed.")
+        sys.exit(1)
+    logger.info(f"\n🎉 All {len(tests)} tests passed!")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script for skipping chunks that are already stored in Pinecone.
+Uses an in-memory fake index, so no account or network access is needed.
+"""
+
+import os
+import sys
+import logging
+from types import SimpleNamespace
+
+# Add the aiFeatures/python directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'aiFeatures', 'python'))
+
+from pinecone_upload import chunk_vector_id, find_existing_ids, refresh_metadata
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+NAMESPACE = "course-1"
+
+class FakeIndex:
+    """Dict-backed index with list/fetch/upsert, counting the requests made."""
+
+    def __init__(self):
+        self.vectors = {}
+        self.calls = {"list": 0, "fetch": 0, "upsert": 0}
+        self.fetched_ids = 0
+
+    def list(self, prefix, namespace):
+        self.calls["list"] += 1
+        ids = sorted(vector_id for vector_id in self.vectors if vector_id.startswith(prefix))
+        for i in range(0, len(ids), 100):
+            yield ids[i:i + 100]
+
+    def fetch(self, ids, namespace):
+        self.calls["fetch"] += 1
+        self.fetched_ids += len(ids)
+        return SimpleNamespace(vectors={vector_id: SimpleNamespace(**self.vectors[vector_id])
+                                        for vector_id in ids if vector_id in self.vectors})
+
+    def upsert(self, vectors, namespace):
+        self.calls["upsert"] += 1
+        for vector in vectors:
+            self.vectors[vector["id"]] = {"values": vector["values"], "metadata": vector["metadata"]}
+
+    def update(self, **kwargs):
+        raise AssertionError("per-vector update() should not be used")
+
+def file_chunks(file_name, count=250, upload_batch="batch-1"):
+    """(id, metadata) of the chunks of one file, as add_texts derives them."""
+    chunks = []
+    for i in range(count):
+        metadata = {"file_name": file_name, "file_path": f"/uploads/{file_name}", "file_hash": "f" * 64,
+                    "upload_batch": upload_batch, "page_index": i // 10, "chunk_offset": i * 500}
+        chunks.append((chunk_vector_id(f"chunk {i}", metadata), metadata))
+    return chunks
+
+def stored_index(chunks):
+    index = FakeIndex()
+    for vector_id, metadata in chunks:
+        index.vectors[vector_id] = {"values": [0.5, 0.25, 0.125], "metadata": dict(metadata)}
+    return index
+
+def test_existing_ids_are_listed_not_fetched():
+    """Existence is checked by listing the file's id prefix."""
+    chunks = file_chunks("notes.pdf")
+    index = stored_index(chunks[:200])
+    existing = find_existing_ids(index, [vector_id for vector_id, _ in chunks], NAMESPACE)
+    assert existing == {vector_id for vector_id, _ in chunks[:200]}
+    assert index.calls["list"] == 1 and index.calls["fetch"] == 0, index.calls
+    logger.info("✓ 200 of 250 ids found with one prefix listing")
+
+def test_unchanged_file_is_not_rewritten():
+    """Re-adding a file under its stored name only fetches one sample vector, even with a new upload batch."""
+    index = stored_index(file_chunks("notes.pdf"))
+    readded = dict(file_chunks("notes.pdf", upload_batch="batch-2"))
+    assert refresh_metadata(index, readded, NAMESPACE) == 0
+    assert index.calls == {"list": 0, "fetch": 1, "upsert": 0}, index.calls
+    assert index.fetched_ids == 1
+    assert all(vector["metadata"]["upload_batch"] == "batch-1" for vector in index.vectors.values())
+    logger.info("✓ Unchanged file checked with a single one-id fetch")
+
+def test_renamed_file_is_rewritten_in_batches():
+    """The same content under a new name is upserted back in batches with the new name."""
+    index = stored_index(file_chunks("notes.pdf"))
+    renamed = dict(file_chunks("lecture-notes.pdf", upload_batch="batch-2"))
+    assert refresh_metadata(index, renamed, NAMESPACE) == 250
+    assert index.calls["upsert"] == 1, index.calls
+    assert index.calls["fetch"] == 1 + 3, index.calls
+    for vector in index.vectors.values():
+        assert vector["metadata"]["file_name"] == "lecture-notes.pdf"
+        assert vector["metadata"]["file_path"] == "/uploads/lecture-notes.pdf"
+        assert vector["metadata"]["upload_batch"] == "batch-1"
+        assert vector["values"] == [0.5, 0.25, 0.125]
+    logger.info(f"✓ Renamed file rewritten with {index.calls['upsert']} upsert request")
+
+if __name__ == "__main__":
+    logger.info("=== Pinecone Upload Test ===")
+    tests = [test_existing_ids_are_listed_not_fetched, test_unchanged_file_is_not_rewritten,
+             test_renamed_file_is_rewritten_in_batches]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"✗ {test.__name__}: {e}")
+
+    if failed:
+        logger.error(f"\n❌ {failed} of {len(tests)} tests failed.")
+        sys.exit(1)
+    logger.info(f"\n🎉 All {len(tests)} tests passed!")
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Test script for Pinecone warmup, pooled connections and health checks.
+Runs the real Pinecone client against a local fake Pinecone server, so no
+account or network access is needed.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the aiFeatures/python directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'aiFeatures', 'python'))
+
+os.environ.setdefault("PINECONE_API_KEY", "test-key")
+
+import pinecone_config
+from pinecone_config import PineconeConfig, PineconeNotReady
+
+# Set on the module: it may already have been imported (and read its environment) by another test
+pinecone_config.HEALTH_CHECK_INTERVAL = 0.5
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "ai-tutor-documents"
+
+class FakePinecone:
+    """
+    Minimal Pinecone control and data plane on one local port. Counts requests
+    per path and TCP connections, and can be made slow or failing.
+    """
+
+    def __init__(self):
+        self.requests = {}
+        self.connections = 0
+        self.latency = {}  # path -> seconds
+        self.failing = False
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _handle(self):
+                path = self.path.split("?", 1)[0]
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                with fake._lock:
+                    fake.requests[path] = fake.requests.get(path, 0) + 1
+                time.sleep(fake.latency.get(path, 0))
+                if fake.failing:
+                    return self._reply(503, {"error": {"code": "UNAVAILABLE", "message": "down"}})
+
+                if path == "/describe_index_stats":
+                    return self._reply(200, {"namespaces": {}, "dimension": 1024,
+                                             "indexFullness": 0.0, "totalVectorCount": 0})
+                if path == "/query":
+                    return self._reply(200, {"matches": [], "namespace": "default"})
+                if path == "/indexes":
+                    return self._reply(200, {"indexes": [fake.index_model()]})
+                if path == f"/indexes/{INDEX_NAME}":
+                    return self._reply(200, fake.index_model())
+                return self._reply(404, {"error": {"code": "NOT_FOUND", "message": path}})
+
+            do_GET = _handle
+            do_POST = _handle
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def index_model(self):
+        return {
+            "name": INDEX_NAME, "dimension": 1024, "metric": "cosine", "host": self.url,
+            "vector_type": "dense", "deletion_protection": "disabled",
+            "spec": {"serverless": {"cloud": "aws", "region": "us-east-1"}},
+            "status": {"ready": True, "state": "Ready"},
+        }
+
+    def count(self, path):
+        with self._lock:
+            return self.requests.get(path, 0)
+
+    def close(self):
+        self.server.shutdown()
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+@pytest.fixture(scope="module")
+def fake():
+    server = FakePinecone()
+    yield server
+    server.close()
+
+def make_config(fake, host=True):
+    config = PineconeConfig()
+    config.host = fake.url if host else ""
+    config.controller_host = fake.url
+    return config
+
+def test_warmup_before_first_request(fake):
+    """Warmup verifies the index up front; the request path then makes no extra calls."""
+    config = make_config(fake)
+    config.warmup()
+    assert wait_for(lambda: config.healthy), "warmup did not report the index healthy"
+
+    stats_calls = fake.count("/describe_index_stats")
+    started = time.perf_counter()
+    index = config.get_index()
+    index.query(vector=[0.0] * 1024, top_k=1, namespace="default")
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    config.stop()
+
+    assert fake.count("/describe_index_stats") - stats_calls <= 1, "request path called describe_index_stats"
+    assert fake.count("/indexes") == 0, "request path listed indexes"
+    logger.info(f"✓ First query after warmup took {elapsed_ms:.1f}ms")
+
+def test_connections_are_reused(fake):
+    """Sequential queries share one keep-alive connection from the pool."""
+    config = make_config(fake)
+    assert config.connect()
+    index = config.get_index()
+    index.query(vector=[0.0] * 1024, top_k=1)
+    connections = fake.connections
+    for _ in range(20):
+        index.query(vector=[0.0] * 1024, top_k=1)
+    opened = fake.connections - connections
+    assert opened == 0, f"{opened} new connections for 20 queries"
+    logger.info("✓ 20 queries reused the pooled connection")
+
+def test_request_path_never_waits_for_discovery(fake):
+    """Without a known host, get_index fails fast while discovery runs in the background."""
+    fake.latency["/indexes"] = 1.0
+    config = make_config(fake, host=False)
+    started = time.perf_counter()
+    try:
+        config.get_index()
+        raise AssertionError("get_index returned before the index was discovered")
+    except PineconeNotReady:
+        pass
+    elapsed = time.perf_counter() - started
+    assert elapsed < 0.2, f"get_index blocked for {elapsed:.2f}s"
+
+    assert wait_for(lambda: config.ready and config.healthy), "background discovery did not finish"
+    assert config.host == fake.url
+    config.get_index()
+    config.stop()
+    fake.latency.clear()
+    logger.info(f"✓ get_index returned in {elapsed * 1000:.1f}ms; discovery finished in the background")
+
+def test_health_checks_track_outages(fake):
+    """The background checker marks the index unhealthy during an outage and recovers after."""
+    config = make_config(fake)
+    config.warmup()
+    assert wait_for(lambda: config.healthy)
+
+    fake.failing = True
+    assert wait_for(lambda: config.healthy is False), "outage not detected"
+    assert not config.ready
+    fake.failing = False
+    assert wait_for(lambda: config.healthy), "recovery not detected"
+    config.stop()
+    logger.info("✓ Health checks detected the outage and the recovery")
+
+if __name__ == "__main__":
+    logger.info("=== Pinecone Warmup Test ===")
+    server = FakePinecone()
+    tests = [test_warmup_before_first_request, test_connections_are_reused,
+             test_request_path_never_waits_for_discovery, test_health_checks_track_outages]
+    failed = 0
+    try:
+        for test in tests:
+            try:
+                test(server)
+            except AssertionError as e:
+                failed += 1
+                logger.error(f"✗ {test.__name__}: {e}")
+    finally:
+        server.close()
+
+    if failed:
+        logger.error(f"\n❌ {failed} of {len(tests)} tests failed.")
+        sys.exit(1)
+    logger.info(f"\n🎉 All {len(tests)} tests passed!")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test script for the exact and semantic tiers of the search query cache.
+"""
+
+import os
+import sys
+import logging
+
+# Add the aiFeatures/python directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'aiFeatures', 'python'))
+
+from query_cache import QueryCache
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PARAMS = (3, True, False, None)
+
+def test_exact_hits_and_version_invalidation():
+    """Repeats are served from the cache until the store version changes."""
+    cache = QueryCache()
+    cache.put("What is a Gradient?", PARAMS, 1, ["result"])
+    assert cache.get("what is a gradient", PARAMS, 1) == ["result"]
+    assert cache.get("what is a gradient", (5, True, False, None), 1) is None, "params were ignored"
+    assert cache.get("what is a gradient", PARAMS, 2) is None, "stale version was served"
+    assert cache.get("what is a gradient", PARAMS, 1) is None, "stale entry was kept"
+    logger.info("✓ Exact tier hit on a repeat and dropped the entry after the store changed")
+
+def test_semantic_hits_pick_the_closest_entry():
+    """The nearest cached query within the distance threshold is reused."""
+    cache = QueryCache(semantic_distance=0.05)
+    cache.put("gradient descent", PARAMS, 1, ["descent"], [1.0, 0.0, 0.0])
+    cache.put("learning rate", PARAMS, 1, ["rate"], [0.9, 0.3, 0.0])
+    cache.put("backpropagation", PARAMS, 1, ["backprop"], [0.0, 1.0, 0.0])
+
+    assert cache.get_similar([2.0, 0.1, 0.0], PARAMS, 1) == ["descent"]
+    assert cache.get_similar([0.0, 0.0, 1.0], PARAMS, 1) is None, "distant query was served"
+    assert cache.get_similar([2.0, 0.1, 0.0], (5, True, False, None), 1) is None, "params were ignored"
+    assert cache.get_similar([2.0, 0.1, 0.0], PARAMS, 2) is None, "stale version was served"
+    assert cache.get_similar([0.0, 0.0, 0.0], PARAMS, 1) is None
+    assert cache.stats()["semantic_hits"] == 1
+    logger.info("✓ Semantic tier reused the closest query and nothing else")
+
+def test_semantic_tier_after_eviction():
+    """Evicted entries are never served by the semantic tier."""
+    cache = QueryCache(max_entries=2, semantic_distance=0.05)
+    cache.put("first", PARAMS, 1, ["first"], [1.0, 0.0])
+    cache.put("second", PARAMS, 1, ["second"], [0.0, 1.0])
+    cache.put("third", PARAMS, 1, ["third"], [-1.0, 0.0])
+    assert cache.get_similar([1.0, 0.0], PARAMS, 1) is None, "evicted entry was served"
+    assert cache.get_similar([0.0, 2.0], PARAMS, 1) == ["second"]
+    logger.info("✓ Semantic tier only saw live entries")
+
+if __name__ == "__main__":
+    logger.info("=== Query Cache Test ===")
+    tests = [test_exact_hits_and_version_invalidation, test_semantic_hits_pick_the_closest_entry,
+             test_semantic_tier_after_eviction]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"✗ {test.__name__}: {e}")
+
+    if failed:
+        logger.error(f"\n❌ {failed} of {len(tests)} tests failed.")
+        sys.exit(1)
+    logger.info(f"\n🎉 All {len(tests)} tests passed!")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test script for search filters: in-memory matching, the SQLite clause used by
+saved indexes and the Pinecone filter, especially for chunks spanning pages.
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import logging
+
+# Add the aiFeatures/python directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'aiFeatures', 'python'))
+
+from search_filters import SearchFilter
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Page numbers are 0-based in metadata and 1-based in filters
+CHUNKS = {
+    "single-p2": {"file_name": "a.pdf", "page_index": 1, "page_end": 1, "upload_batch": "b1"},
+    "spans-p3-p5": {"file_name": "a.pdf", "page_index": 2, "page_end": 4, "upload_batch": "b1"},
+    "legacy-p6": {"file_name": "a.pdf", "page_index": 5, "upload_batch": "b1"},
+    "other-file-p4": {"file_name": "b.pdf", "page_index": 3, "page_end": 3, "upload_batch": "b2"},
+}
+
+def matching_ids(search_filter):
+    return {doc_id for doc_id, metadata in CHUNKS.items() if search_filter.matches(metadata)}
+
+def sql_ids(search_filter):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE chunks (doc_id TEXT, metadata TEXT)")
+    conn.executemany("INSERT INTO chunks VALUES (?, ?)",
+                     [(doc_id, json.dumps(metadata)) for doc_id, metadata in CHUNKS.items()])
+    where, params = search_filter.to_sql()
+    return {row[0] for row in conn.execute(f"SELECT doc_id FROM chunks WHERE {where}", params)}
+
+def pinecone_ids(search_filter):
+    """Evaluate the Pinecone filter locally for the operators it uses."""
+    def check(condition, metadata):
+        for key, value in condition.items():
+            if key == "$and":
+                if not all(check(part, metadata) for part in value):
+                    return False
+            elif key == "$or":
+                if not any(check(part, metadata) for part in value):
+                    return False
+            else:
+                if key not in metadata:
+                    return False
+                for op, operand in value.items():
+                    field = metadata[key]
+                    if not {"$in": lambda: field in operand, "$gte": lambda: field >= operand,
+                            "$lte": lambda: field <= operand}[op]():
+                        return False
+        return True
+    condition = search_filter.to_pinecone()
+    return {doc_id for doc_id, metadata in CHUNKS.items() if check(condition, metadata)}
+
+def test_page_range_overlaps_multi_page_chunks():
+    """A chunk spanning pages 3-5 matches any range that touches one of them."""
+    for pages, expected in [
+        ((4, 4), {"spans-p3-p5", "other-file-p4"}),
+        ((5, 10), {"spans-p3-p5", "legacy-p6"}),
+        ((1, 2), {"single-p2"}),
+        ((6, 6), {"legacy-p6"}),
+        ((7, 9), set()),
+    ]:
+        search_filter = SearchFilter(pages=pages)
+        assert matching_ids(search_filter) == expected, f"matches, pages {pages}"
+        assert sql_ids(search_filter) == expected, f"to_sql, pages {pages}"
+        assert pinecone_ids(search_filter) == expected, f"to_pinecone, pages {pages}"
+    logger.info("✓ matches, to_sql and to_pinecone agree on page-range overlap")
+
+def test_fields_combine():
+    """File, page and batch restrictions all have to hold."""
+    search_filter = SearchFilter.from_dict({"file_names": ["a.pdf"], "pages": [4, 4], "upload_batch": "b1"})
+    assert matching_ids(search_filter) == sql_ids(search_filter) == pinecone_ids(search_filter) == {"spans-p3-p5"}
+    search_filter = SearchFilter.from_dict({"file_name": "b.pdf"})
+    assert search_filter.to_pinecone() == {"file_name": {"$in": ["b.pdf"]}}
+    assert matching_ids(search_filter) == sql_ids(search_filter) == {"other-file-p4"}
+    assert SearchFilter.from_dict({}) is None
+    logger.info("✓ Combined restrictions agree across all three forms")
+
+if __name__ == "__main__":
+    logger.info("=== Search Filter Test ===")
+    tests = [test_page_range_overlaps_multi_page_chunks, test_fields_combine]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            logger.error(f"✗ {test.__name__}: {e}")
+
+    if failed:
+        logger.error(f"\n❌ {failed} of {len(tests)} tests failed.")
+        sys.exit(1)
+    logger.info(f"\n🎉 All {len(tests)} tests passed!")